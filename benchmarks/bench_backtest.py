@@ -0,0 +1,82 @@
+"""Rolling-origin backtest of the spending and income predictors: accuracy against fit/predict cost.
+
+Replays a ledger month by month (finance_core.backtest): at each of the last --last origins
+every model is fitted on the monthly totals so far and forecasts the next --horizon months.
+Prints MAE, MAPE and bias per model and series next to the median and p95 fit time and the
+median predict time per fold. random_forest is the model behind predict_spending() and
+predict_income(), engine the fit forecast_all() uses and holt_winters the full refit of the
+online mode; seasonal_naive, last_month and mean_12 are baselines any model should beat.
+Folds run on --workers processes. Without --db the ledger is a seeded synthetic one (see
+synthetic.py) of --rows transactions.
+
+    python benchmarks/bench_backtest.py [--db finance.db | --rows 100000] [--models random_forest,engine]
+                                        [--horizon 1] [--last 36] [--workers 4] [--out folds.csv] [--json]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import finance_core as fc  # noqa: E402
+import synthetic  # noqa: E402
+
+
+def run(args):
+    started = time.perf_counter()
+    results = fc.backtest(args.models.split(',') if args.models else None, args.horizon, args.min_train,
+                          args.last or None, args.workers)
+    wall = time.perf_counter() - started
+    summary = fc.backtest_summary(results)
+    if results.empty:
+        sys.exit(f"nothing to replay: the ledger needs more than --min-train ({args.min_train}) months of history")
+    if args.out:
+        results.to_csv(args.out, index=False)
+    if args.json:
+        print(json.dumps({'wall_seconds': round(wall, 3), 'workers': args.workers, 'horizon': args.horizon,
+                          'summary': summary.to_dict('records')}, indent=2))
+        return
+    origins = results['origin'].nunique()
+    workers = args.workers or os.cpu_count()
+    print(f"{origins} origins ({results['origin'].min()} to {results['origin'].max()}), horizon {args.horizon}, "
+          f"{len(results):,} forecasts in {wall:.2f}s on {workers} worker{'s' if workers != 1 else ''}")
+    print(f"{'series':<9} {'model':<15} {'folds':>5} {'MAE':>10} {'MAPE %':>7} {'bias':>10} "
+          f"{'fit p50 ms':>10} {'fit p95 ms':>10} {'predict ms':>10}")
+    for row in summary.itertuples():
+        print(f"{row.series:<9} {row.model:<15} {row.folds:5d} {row.mae:10,.2f} {row.mape:7.2f} {row.bias:10,.2f} "
+              f"{row.fit_ms_p50:10.3f} {row.fit_ms_p95:10.3f} {row.predict_ms_p50:10.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--db', help="ledger to replay (default: a synthetic one)")
+    parser.add_argument('--rows', type=int, default=100_000, help="synthetic ledger size")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--models', help=f"comma-separated, from {', '.join(fc.BACKTEST_MODELS)} (default: all)")
+    parser.add_argument('--horizon', type=int, default=1, help="months forecast from each origin, 1-12")
+    parser.add_argument('--min-train', type=int, default=fc.BACKTEST_MIN_TRAIN, help="months before the first origin")
+    parser.add_argument('--last', type=int, default=36, help="latest origins to replay, 0 for all")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="worker processes (default: CPUs)")
+    parser.add_argument('--out', help="also write every forecast to this CSV file")
+    parser.add_argument('--json', action='store_true', help="print the summary as JSON")
+    args = parser.parse_args()
+
+    if args.db:
+        fc.configure_db(args.db)
+        fc.init_db()
+        run(args)
+        fc.close_db()
+        return
+    with tempfile.TemporaryDirectory() as tmp:
+        fc.configure_db(os.path.join(tmp, 'ledger.db'))
+        fc.init_db()
+        synthetic.generate(args.rows, args.seed)
+        run(args)
+        fc.close_db()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""Dashboard chart build time and payload: plotly.express figures against cached Plotly specs.
+
+For each ledger size (seeded synthetic ledgers, see synthetic.py) builds the expense pie, income
+bar and spending trend the way the dashboard used to (plotly.express over the aggregated frames)
+and as finance_core.charts specs, and reports for each: the time to build the figure, the time
+st.plotly_chart then spends validating and serializing it, and the JSON payload it sends. A spec
+cached against the data version skips the build on every rerun until the data changes. The
+spending trend covers all time, so it grows one point a month until CHART_MAX_POINTS, after which
+it is downsampled with LTTB and stays flat.
+
+    python benchmarks/bench_charts.py [--scales 10k,100k,1m] [--repeat 5]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import finance_core as fc  # noqa: E402
+import synthetic  # noqa: E402
+from bench_suite import parse_scale  # noqa: E402
+
+
+def _express_pie():
+    import plotly.express as px
+
+    totals = fc.snapshot_group_totals('expenses')
+    return px.pie(totals.rename(columns={'category': 'label', 'display_name': 'category'}), names='category',
+                  values='amount', color_discrete_sequence=px.colors.qualitative.Set3, hole=0.4)
+
+
+def _express_bar():
+    import plotly.express as px
+
+    totals = fc.snapshot_group_totals('income').groupby('display_name')['amount'].sum()
+    return px.bar(totals.rename_axis('source').reset_index(), x='source', y='amount', color='amount',
+                  color_continuous_scale='Viridis')
+
+
+def _express_trend():
+    import plotly.express as px
+
+    return px.line(fc.get_monthly_rollup('expenses'), x='month', y='amount', markers=True, line_shape='spline')
+
+
+CHARTS = {
+    'expense pie': (_express_pie, fc.expense_pie_figure),
+    'income bar': (_express_bar, fc.income_bar_figure),
+    'spending trend': (_express_trend, fc.spending_trend_figure),
+}
+
+
+def send(figure):
+    # What st.plotly_chart does with a figure before it goes to the browser.
+    import plotly.io
+    import plotly.tools
+
+    return plotly.io.to_json(plotly.tools.return_figure_from_figure_or_data(figure, validate_figure=True),
+                             validate=False)
+
+
+def timed(fn, repeat):
+    best, result = float('inf'), None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scales', default='10k,100k,1m', help="comma-separated row counts")
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    import plotly.express  # noqa: F401  imported up front, not timed with the first figure
+    import streamlit.elements.plotly_chart  # noqa: F401  registers the template the app sends
+
+    print(f"{'rows':>10} {'chart':<16} {'points':>6} {'express ms':>10} {'spec ms':>8} {'send ms':>8} "
+          f"{'express KiB':>11} {'spec KiB':>9}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in map(parse_scale, args.scales.split(',')):
+            fc.configure_db(os.path.join(tmp, f"ledger-{rows}.db"))
+            fc.init_db()
+            synthetic.generate(rows)
+            fc.get_snapshot('expenses'), fc.get_snapshot('income')
+            for name, (express, spec) in CHARTS.items():
+                express_ms, express_fig = timed(express, args.repeat)
+                spec_ms, spec_fig = timed(spec, args.repeat)
+                send_ms, payload = timed(lambda: send(spec_fig), args.repeat)
+                points = len(spec_fig['data'][0].get('values') or spec_fig['data'][0]['y'])
+                print(f"{rows:>10,} {name:<16} {points:6d} {express_ms:10.2f} {spec_ms:8.2f} {send_ms:8.2f} "
+                      f"{len(send(express_fig)) / 1024:11.1f} {len(payload) / 1024:9.1f}")
+            fc.close_db()
+            fc.clear_snapshots()
+
+
+if __name__ == '__main__':
+    main()
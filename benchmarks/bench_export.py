@@ -0,0 +1,113 @@
+"""Time and peak memory of the streaming export against the old pandas export path.
+
+Builds a ledger with --rows transactions (80% expenses, 20% income), then runs each export
+mode in its own subprocess so peak RSS is measured independently.
+
+    python benchmarks/bench_export.py [--rows 5000000] [--db existing.db] [--chunk-size 50000]
+"""
+import argparse
+import io
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import finance_core as fc  # noqa: E402
+import pandas as pd  # noqa: E402
+
+MODES = ['pandas-csv', 'stream-csv', 'stream-csv.gz', 'stream-parquet']
+
+
+def fill(rows, seed=42):
+    rng = random.Random(seed)
+    start = fc.to_day('2000-01-01')
+    span = fc.to_day('2025-12-31') - start
+    batch = 100_000
+    categories = list(fc.get_label_ids('expenses', ['🛒 Groceries', '🍽️ Dining', '🏠 Housing', '🚗 Transportation']).values())
+    sources = list(fc.get_label_ids('income', ['💼 Salary', '🏢 Freelance']).values())
+    with fc.get_connection() as conn:
+        for offset in range(0, rows, batch):
+            size = min(batch, rows - offset)
+            expenses = [(start + rng.randrange(span), rng.randint(100, 50_000), rng.choice(categories))
+                        for _ in range(size * 4 // 5)]
+            income = [(start + rng.randrange(span), rng.randint(10_000, 500_000), rng.choice(sources))
+                      for _ in range(size - len(expenses))]
+            conn.executemany("INSERT INTO expenses (day, amount_cents, category_id) VALUES (?, ?, ?)", expenses)
+            conn.executemany("INSERT INTO income (day, amount_cents, source_id) VALUES (?, ?, ?)", income)
+
+
+def pandas_export():
+    # The export path before streaming: both tables in full, copied, concatenated, rendered to one string.
+    expenses = fc.get_expenses().drop(columns='amount_cents')
+    income = fc.get_income().drop(columns='amount_cents')
+    expenses['Type'] = 'Expense'
+    expenses['source'] = expenses['category']
+    income['Type'] = 'Income'
+    income['category'] = income['source']
+    buffer = io.StringIO()
+    pd.concat([expenses, income], ignore_index=True).to_csv(buffer, index=False)
+    return len(buffer.getvalue().encode('utf-8'))
+
+
+def worker(mode, db_path, chunk_size, out_dir):
+    fc.configure_db(db_path)
+    baseline_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    if mode == 'pandas-csv':
+        size = pandas_export()
+    else:
+        fmt = mode.split('-', 1)[1]
+        path = os.path.join(out_dir, f"export.{fmt}")
+        if fmt == 'parquet':
+            fc.export_to_file(path, fmt, chunk_size)
+        else:
+            with open(path, 'wb') as f:
+                fc.export_to_file(f, fmt, chunk_size)
+        size = os.path.getsize(path)
+    elapsed = time.perf_counter() - start
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps({'mode': mode, 'seconds': elapsed, 'output_mb': size / 1e6,
+                      'peak_rss_mb': peak_kb / 1024, 'export_rss_mb': (peak_kb - baseline_kb) / 1024}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=5_000_000)
+    parser.add_argument('--db', help="reuse an existing database instead of generating one")
+    parser.add_argument('--chunk-size', type=int, default=fc.EXPORT_CHUNK_SIZE)
+    parser.add_argument('--modes', nargs='+', default=MODES, choices=MODES)
+    parser.add_argument('--worker', choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument('--out-dir', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(args.worker, args.db, args.chunk_size, args.out_dir)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = args.db
+        if not db_path:
+            db_path = os.path.join(tmp, 'bench.db')
+            fc.configure_db(db_path)
+            fc.init_db()
+            start = time.perf_counter()
+            fill(args.rows)
+            print(f"generated {args.rows:,} rows in {time.perf_counter() - start:.1f}s")
+        print(f"{'mode':<16} {'seconds':>9} {'output MB':>10} {'peak RSS MB':>12} {'export RSS MB':>14}")
+        for mode in args.modes:
+            output = subprocess.run(
+                [sys.executable, __file__, '--worker', mode, '--db', db_path, '--out-dir', tmp,
+                 '--chunk-size', str(args.chunk_size)], check=True, capture_output=True, text=True).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            print(f"{mode:<16} {result['seconds']:9.2f} {result['output_mb']:10.1f} {result['peak_rss_mb']:12.1f} "
+                  f"{result['export_rss_mb']:14.1f}")
+
+
+if __name__ == '__main__':
+    main()
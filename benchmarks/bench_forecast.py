@@ -0,0 +1,108 @@
+"""Compare the batched forecasting engine with the RandomForest predictors and the online mode.
+
+Fills a throwaway database with ten years of monthly transactions across every dashboard
+category and income source, then times a full refresh of each path (model cache bypassed),
+and for the online mode both its full refit and the update it makes instead after a write.
+
+    python benchmarks/bench_forecast.py [--years 10] [--per-month 30] [--repeat 20]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import finance_core as fc  # noqa: E402
+from sklearn.ensemble import RandomForestRegressor  # noqa: E402
+
+CATEGORIES = ["🛒 Groceries", "⚡ Utilities", "🎬 Entertainment", "✈️ Travel", "🏠 Housing", "🚗 Transportation",
+              "👕 Clothing", "🏥 Healthcare", "📚 Education", "🍽️ Dining", "📱 Technology", "🔧 Other"]
+SOURCES = ["💼 Salary", "🏢 Freelance", "📈 Investment", "🎁 Gift", "💸 Bonus", "🏠 Rental", "💰 Side Hustle",
+           "🔧 Other"]
+
+
+def fill(years, per_month, seed=42):
+    rng = random.Random(seed)
+    now = datetime.now()
+    expenses, income = [], []
+    for i in range(years * 12):
+        month = now.year * 12 + now.month - 1 - i
+        year, month = month // 12, month % 12 + 1
+        for _ in range(per_month):
+            day = rng.randint(1, 28)
+            expenses.append((fc.to_day(f"{year:04d}-{month:02d}-{day:02d}"),
+                             fc.to_cents(rng.lognormvariate(3.5, 0.8)), rng.choice(CATEGORIES)))
+        for source in SOURCES[:rng.randint(1, len(SOURCES))]:
+            income.append((fc.to_day(f"{year:04d}-{month:02d}-01"), fc.to_cents(rng.uniform(100, 5000)), source))
+    category_ids = fc.get_label_ids('expenses', CATEGORIES)
+    source_ids = fc.get_label_ids('income', SOURCES)
+    with fc.get_connection() as conn:
+        conn.executemany("INSERT INTO expenses (day, amount_cents, category_id) VALUES (?, ?, ?)",
+                         ((day, cents, category_ids[label]) for day, cents, label in expenses))
+        conn.executemany("INSERT INTO income (day, amount_cents, source_id) VALUES (?, ?, ?)",
+                         ((day, cents, source_ids[label]) for day, cents, label in income))
+    return len(expenses), len(income)
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return samples[len(samples) // 2] * 1000
+
+
+def rf_per_series():
+    # What the RandomForest path would cost to cover the same series as the engine.
+    for table in fc.TRANSACTION_TABLES:
+        by_category = fc.get_monthly_rollup(table, by_category=True)
+        for _, series in by_category.groupby('category'):
+            series = series.assign(year=series['month'].str[:4].astype(int),
+                                   month=series['month'].str[5:7].astype(int))
+            model = RandomForestRegressor(n_estimators=100, random_state=42)
+            model.fit(series[['year', 'month']], series['amount'])
+            model.predict(series[['year', 'month']].tail(1))
+
+
+def online_update():
+    # One new expense this month, then the next prediction of each total in online mode.
+    fc.add_expense(datetime.now().strftime("%Y-%m-%d"), 1.0, CATEGORIES[0])
+    for table in fc.TRANSACTION_TABLES:
+        fc.forecasts._online_forecast(table)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--years', type=int, default=10)
+    parser.add_argument('--per-month', type=int, default=30)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        fc.model_cache.cache_dir = os.path.join(tmp, 'models')
+        fc.configure_db(os.path.join(tmp, 'bench.db'))
+        fc.init_db()
+        n_expenses, n_income = fill(args.years, args.per_month)
+        n_series = len(fc.load_monthly_matrix())
+        print(f"{args.years} years, {n_expenses} expenses, {n_income} income rows, {n_series} series")
+
+        results = [
+            ("engine: all series, 12-month horizon", timed(lambda: fc.forecast_all(12), args.repeat)),
+            ("random forest: 2 totals, 1 month", timed(lambda: [fc.forecasts._fit_monthly_forecast(t) for t in
+                                                                fc.TRANSACTION_TABLES], max(args.repeat // 4, 1))),
+            ("random forest: all series, 1 month", timed(rf_per_series, 1)),
+            ("online: full refit, 2 totals", timed(fc.refit_online_forecasts, args.repeat)),
+            ("online: update after a write, 2 totals", timed(online_update, args.repeat)),
+        ]
+        for label, ms in results:
+            print(f"{label:<40} {ms:10.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""Cold-start import time of finance_assistant, broken down by top-level import.
+
+Runs ``python -X importtime -c "import finance_assistant"`` in fresh interpreters and reports
+the median against a cold-start budget, the direct imports that dominate it, and what each
+deferred stack (fa.HEAVY_MODULES) costs when it is first used. Exits non-zero when the
+budget is exceeded, so it can gate CI. --module finance_core measures the headless core,
+which batch jobs import without Streamlit.
+
+    python benchmarks/bench_import.py [--module finance_assistant] [--repeat 5] [--budget-ms 1500] [--top 10]
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+import finance_assistant as fa  # noqa: E402
+
+
+def importtime(code):
+    # [(depth, name, cumulative ms)] in the order -X importtime reports them (children first).
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=ROOT, capture_output=True,
+                            text=True, check=True)
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        entries.append(((len(name) - len(name.lstrip()) - 1) // 2, name.strip(), int(cumulative) / 1000))
+    return entries
+
+
+def top_level(entries, after=None):
+    # Depth-0 imports that happen after the import named `after` (or all of them).
+    names = [name for depth, name, _ in entries if depth == 0]
+    start = names.index(after) + 1 if after else 0
+    return [(name, ms) for depth, name, ms in entries if depth == 0][start:]
+
+
+def direct_imports(entries, module):
+    # The depth-1 entries reported between the previous top-level import and `module` itself.
+    children = []
+    for depth, name, ms in entries:
+        if depth == 0:
+            if name == module:
+                return children
+            children = []
+        elif depth == 1:
+            children.append((name, ms))
+    return []
+
+
+def median(samples):
+    samples = sorted(samples)
+    return samples[len(samples) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--module', default='finance_assistant', choices=['finance_assistant', 'finance_core'])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--budget-ms', type=float, default=1500.0)
+    parser.add_argument('--top', type=int, default=10)
+    args = parser.parse_args()
+
+    runs = [importtime(f"import {args.module}") for _ in range(args.repeat)]
+    totals = [dict(top_level(entries))[args.module] for entries in runs]
+    by_import = {}
+    for entries in runs:
+        for name, ms in direct_imports(entries, args.module):
+            by_import.setdefault(name, []).append(ms)
+
+    print(f"import {args.module}: {median(totals):.0f} ms median of {args.repeat} "
+          f"(budget {args.budget_ms:.0f} ms)")
+    print(f"{'direct import':<24} {'ms':>8}")
+    ranked = sorted(((median(samples), name) for name, samples in by_import.items()), reverse=True)
+    for ms, name in ranked[:args.top]:
+        print(f"{name:<24} {ms:8.1f}")
+
+    print(f"\n{'deferred (first use)':<24} {'ms':>8}")
+    for module in fa.HEAVY_MODULES:
+        samples = [sum(ms for _, ms in top_level(importtime(f"import {args.module}, {module}"),
+                                                  after=args.module))
+                   for _ in range(max(1, args.repeat // 2))]
+        print(f"{module:<24} {median(samples):8.1f}")
+
+    if median(totals) > args.budget_ms:
+        print(f"\nover budget by {median(totals) - args.budget_ms:.0f} ms")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,238 @@
+"""Concurrent-session load test: N simulated users driving the whole dashboard at once.
+
+Each session is its own AppTest: its own session state, sharing the process, caches and
+database as sessions do on one server. A session loads the page, then performs --actions
+interactions drawn from a realistic mix: logging expenses and income, setting a budget,
+asking the assistant, changing the chart period, exporting and reloading. Sessions pause
+--think ms between interactions. AppTest reruns the whole script for most interactions, so
+latencies are mostly full-page reruns, an upper bound on the fragment reruns a browser
+triggers (see bench_rerun.py). Writes rerun only their fragments, after which AppTest keeps
+just those fragments' elements; the session then reloads the page before its next
+interaction, as the browser would still show it, and that reload is left out of the
+latencies.
+
+Each concurrency level runs in a fresh process after a warm-up page load. It reports:
+- rerun latency percentiles and reruns per second;
+- writer lock waits: time writes spent queued for the writer thread, time the writer waited
+  for SQLite's write lock, and busy errors;
+- resident memory added per session.
+
+    python benchmarks/bench_load.py [--sessions 1,2,4,8,16] [--actions 20] [--rows 100000] [--think 0]
+                                    [--json results.json]
+"""
+import argparse
+import gc
+import json
+import os
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import finance_core as fc  # noqa: E402
+import synthetic  # noqa: E402
+
+APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'finance_assistant.py')
+QUESTIONS = ["how can I save more", "should I invest", "how do I make a budget", "what about my debt",
+             "how much should I spend on groceries", "tips for retirement"]
+
+
+def _log_expense(at, rng):
+    at.number_input(key='expense_amount').set_value(round(rng.lognormvariate(3.4, 0.8), 2))
+    at.selectbox(key='expense_category').select(rng.choice(fc.EXPENSE_CATEGORIES))
+    at.button(key='add_expense').click()
+
+
+def _log_income(at, rng):
+    at.number_input(key='income_amount').set_value(round(rng.lognormvariate(6.5, 0.7), 2))
+    at.selectbox(key='income_source').select(rng.choice(fc.INCOME_SOURCES))
+    at.button(key='add_income').click()
+
+
+def _set_budget(at, rng):
+    at.number_input(key='budget_limit').set_value(float(rng.randrange(1500, 5000, 50)))
+    at.button(key='set_budget').click()
+
+
+def _ask(at, rng):
+    at.text_input(key='ai_question').input(f"{rng.choice(QUESTIONS)} {rng.random():.4f}")
+
+
+def _change_period(at, rng):
+    period = at.selectbox(key='dashboard_period')
+    period.select(rng.choice(period.options))
+
+
+def _export(at, rng):
+    at.selectbox(key='export_format').select('csv')
+    at.button(key='download_csv').click()
+
+
+# action: (relative frequency, how a user applies it before the rerun)
+ACTIONS = {
+    'log expense': (30, _log_expense),
+    'log income': (8, _log_income),
+    'set budget': (4, _set_budget),
+    'ask assistant': (20, _ask),
+    'change period': (15, _change_period),
+    'export': (5, _export),
+    'reload': (18, lambda at, rng: None),
+}
+# The widgets the actions use, all on the page after a full run.
+PAGE_KEYS = {'expense_amount', 'expense_category', 'income_amount', 'income_source', 'budget_limit',
+             'ai_question', 'dashboard_period', 'export_format'}
+
+
+def _full_page(at):
+    keys = {widget.key for widgets in (at.number_input, at.selectbox, at.text_input) for widget in widgets}
+    return PAGE_KEYS <= keys
+
+
+def rss_bytes():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def percentile(samples, q):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, len(samples) * q // 100)] if samples else 0.0
+
+
+def run_level(sessions, actions, think, seed):
+    # One concurrency level, in this process: returns the level's results as a dict.
+    from streamlit.testing.v1 import AppTest
+
+    warm = AppTest.from_file(APP, default_timeout=600)
+    warm.run()  # imports, first reads, model fits and caches, outside the measurement
+    del warm
+    writes = fc.current_pool().writes
+    gc.collect()
+    rss_before = rss_bytes()
+    names = list(ACTIONS)
+    weights = [ACTIONS[name][0] for name in names]
+    started = threading.Barrier(sessions + 1)
+    apps, samples, errors = [None] * sessions, [], []
+    lock = threading.Lock()
+
+    def rerun(at, action):
+        begun = time.perf_counter()
+        at.run()
+        elapsed = (time.perf_counter() - begun) * 1000
+        with lock:
+            samples.append((action, elapsed))
+            errors.extend(f"{action}: {exc.value}" for exc in at.exception)
+
+    def session(index):
+        rng = random.Random(seed * 10_000 + index)
+        at = apps[index] = AppTest.from_file(APP, default_timeout=600)
+        rerun(at, 'page load')
+        started.wait()
+        for _ in range(actions):
+            if think:
+                time.sleep(rng.expovariate(1000 / think))
+            action = rng.choices(names, weights)[0]
+            try:
+                ACTIONS[action][1](at, rng)
+            except Exception as exc:  # the widget is missing, e.g. after an exception replaced the page
+                with lock:
+                    errors.append(f"{action}: {type(exc).__name__}: {exc}")
+                continue
+            rerun(at, action)
+            if not _full_page(at):
+                rerun(at, 'restore')
+
+    threads = [threading.Thread(target=session, args=(i,), name=f"session-{i}") for i in range(sessions)]
+    writes.reset_stats()
+    for thread in threads:
+        thread.start()
+    started.wait()  # every session has loaded the page
+    rss_loaded = rss_bytes()
+    begun = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - begun
+    writes.flush()
+    rss_after = rss_bytes()
+    stats = writes.stats()
+    by_action = {}
+    for action, ms in samples:
+        by_action.setdefault(action, []).append(ms)
+    page_loads = by_action.pop('page load')
+    by_action.pop('restore', None)
+    latencies = [ms for values in by_action.values() for ms in values]
+    return {
+        'sessions': sessions, 'reruns': len(latencies), 'wall_seconds': round(wall, 3),
+        'reruns_per_second': round(len(latencies) / wall, 2) if wall else 0.0,
+        'p50_ms': round(percentile(latencies, 50), 2), 'p95_ms': round(percentile(latencies, 95), 2),
+        'p99_ms': round(percentile(latencies, 99), 2), 'max_ms': round(max(latencies, default=0.0), 2),
+        'page_load_p50_ms': round(statistics.median(page_loads), 2),
+        'by_action_p50_ms': {action: round(statistics.median(values), 2) for action, values in by_action.items()},
+        'errors': errors[:20], 'error_count': len(errors),
+        'writes': stats['committed'] + stats['failed'], 'write_queue_wait_p99_ms': round(stats['queue_wait_ms_p99'], 2),
+        'lock_wait_p99_ms': round(stats['lock_wait_ms_p99'], 2),
+        'lock_wait_total_ms': round(stats['lock_wait_ms_total'], 2), 'busy_errors': stats['busy_errors'],
+        'rss_mib': round(rss_after / 2**20, 1),
+        'mib_per_session': round((rss_loaded - rss_before) / sessions / 2**20, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sessions', default='1,2,4,8,16', help="comma-separated concurrency levels")
+    parser.add_argument('--actions', type=int, default=20, help="interactions per session after the page load")
+    parser.add_argument('--think', type=float, default=0.0, help="mean pause between interactions, ms")
+    parser.add_argument('--rows', type=int, default=100_000, help="transactions in the synthetic ledger")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--json', help="also write the results to this file")
+    parser.add_argument('--level', type=int, help=argparse.SUPPRESS)  # internal: run one level, print JSON
+    args = parser.parse_args()
+
+    if args.level:
+        print(json.dumps(run_level(args.level, args.actions, args.think, args.seed)))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'load.db')
+        fc.configure_db(db_path)
+        fc.init_db()
+        synthetic.generate(args.rows, args.seed)
+        fc.close_db()
+        env = dict(os.environ, FINANCE_DB_PATH=db_path, FINANCE_MODEL_CACHE_DIR=os.path.join(tmp, 'models'))
+
+        print(f"{args.rows:,} transactions, {args.actions} interactions per session, think {args.think:g} ms")
+        print(f"{'sessions':>8} {'reruns/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>6} "
+              f"{'queue p99':>9} {'lock p99':>9} {'busy':>5} {'MiB/session':>11}")
+        levels = []
+        for sessions in map(int, args.sessions.split(',')):
+            # Each level in its own process, so memory and caches do not carry over between levels.
+            proc = subprocess.run([sys.executable, os.path.abspath(__file__), '--level', str(sessions),
+                                   '--actions', str(args.actions), '--think', str(args.think),
+                                   '--seed', str(args.seed)],
+                                  env=env, capture_output=True, text=True)
+            if proc.returncode:
+                sys.exit(f"level {sessions} failed:\n{proc.stderr[-2000:]}")
+            level = json.loads(proc.stdout.strip().splitlines()[-1])
+            levels.append(level)
+            print(f"{sessions:8d} {level['reruns_per_second']:9.2f} {level['p50_ms']:8.1f} {level['p95_ms']:8.1f} "
+                  f"{level['p99_ms']:8.1f} {level['error_count']:6d} {level['write_queue_wait_p99_ms']:9.2f} "
+                  f"{level['lock_wait_p99_ms']:9.2f} {level['busy_errors']:5d} {level['mib_per_session']:11.2f}")
+            for error in level['errors'][:3]:
+                print(f"         {error}")
+
+        if args.json:
+            with open(args.json, 'w') as f:
+                json.dump({'rows': args.rows, 'actions': args.actions, 'think_ms': args.think, 'seed': args.seed,
+                           'cpu_count': os.cpu_count(), 'levels': levels}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
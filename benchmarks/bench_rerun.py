@@ -0,0 +1,117 @@
+"""Rerun latency of dashboard interactions: full-app rerun against fragment-scoped rerun.
+
+Every interaction used to rerun the whole script; with the dashboard split into keyed
+fragments it reruns only the panel it belongs to (or, for a write, the panels reading the
+written tables), and typing into a sidebar form reruns nothing until it is submitted. Each
+interaction is timed both ways on the same app, driven through streamlit's AppTest.
+
+    python benchmarks/bench_rerun.py [--rows 200000] [--repeat 5]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import finance_assistant as fa  # noqa: E402
+import finance_core as fc  # noqa: E402
+from bench_export import fill  # noqa: E402
+from streamlit.runtime.scriptrunner.script_cache import ScriptCache  # noqa: E402
+from streamlit.testing.v1 import AppTest  # noqa: E402
+from streamlit.testing.v1 import local_script_runner  # noqa: E402
+
+APP = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'finance_assistant.py')
+
+# AppTest always reruns the whole script; the browser sends the fragment ids of the widget
+# that changed. Scoped runs inject those ids into the rerun request the same way.
+_scope = []
+_RerunData = local_script_runner.RerunData
+local_script_runner.RerunData = lambda **kwargs: _RerunData(fragment_id_queue=list(_scope), **kwargs)
+
+# The server compiles the script once; AppTest builds a new script cache (and recompiles)
+# for every run. Share one so the timings only include what a rerun costs on a server.
+_script_cache = ScriptCache()
+local_script_runner.ScriptCache = lambda: _script_cache
+
+# Latency is taken from the runner's own start/stop events, i.e. the time the server spends
+# executing the run (callbacks included), not AppTest's per-run thread setup and tree parsing.
+_events = []
+_runner_init = local_script_runner.LocalScriptRunner.__init__
+
+
+def _timed_runner_init(self, *args, **kwargs):
+    _runner_init(self, *args, **kwargs)
+    self.on_event.connect(lambda sender, event, **_: _events.append((event.name, time.perf_counter())), weak=False)
+
+
+local_script_runner.LocalScriptRunner.__init__ = _timed_runner_init
+
+# interaction: (fragments it reruns, or None if it triggers no rerun, and how to apply it)
+INTERACTIONS = {
+    'type in mood tracker': (None, lambda at, i: at.text_area(key='sentiment_text').input(f"feeling fine {i}")),
+    'change chart period': (['charts_panel'], lambda at, i: at.selectbox(key='dashboard_period').select(
+        fa.DASHBOARD_PERIODS[i % 2 + 1])),
+    'next history page': (['transactions_panel'], lambda at, i: at.button(key='history_next').click()),
+    'ask the assistant': (['assistant_panel'], lambda at, i: at.text_input(key='ai_question').input(f"how to save {i}")),
+    'log an expense': (['expense_form'], lambda at, i: (at.number_input(key='expense_amount').set_value(1.0 + i),
+                                                        at.button(key='add_expense').click())),
+}
+
+
+def timed_run(at, scope):
+    _scope[:] = at._fragment_storage.resolve_target(scope) if scope else []
+    _events.clear()
+    try:
+        at.run()
+    finally:
+        _scope.clear()
+    if at.exception:
+        raise RuntimeError(at.exception[0].value)
+    start = min(t for name, t in _events if name == 'SCRIPT_STARTED')
+    end = max(t for name, t in _events if name.endswith('STOPPED_WITH_SUCCESS'))
+    return (end - start) * 1000
+
+
+def median(samples):
+    samples = sorted(samples)
+    return samples[len(samples) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=200_000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        os.environ['FINANCE_DB_PATH'] = db_path
+        os.environ['FINANCE_MODEL_CACHE_DIR'] = os.path.join(tmp, 'models')
+        fc.configure_db(db_path)
+        fc.init_db()
+        fill(args.rows)
+
+        at = AppTest.from_file(APP, default_timeout=120)
+        at.run()  # cold start: migrations, first reads and model fits
+        print(f"{args.rows:,} rows, median of {args.repeat} runs")
+        print(f"{'interaction':<24} {'full app ms':>12} {'fragment ms':>12} {'speedup':>8}")
+        for name, (scope, interact) in INTERACTIONS.items():
+            full, scoped = [], []
+            for i in range(args.repeat):
+                interact(at, 2 * i)
+                full.append(timed_run(at, None))
+                interact(at, 2 * i + 1)
+                if scope is None:
+                    scoped.append(0.0)
+                    continue
+                scoped.append(timed_run(at, scope))
+                at.run()  # AppTest only keeps the rerun fragments' elements; restore the full tree
+            full_ms, scoped_ms = median(full), median(scoped)
+            speedup = f"{full_ms / scoped_ms:7.1f}x" if scoped_ms else "no rerun"
+            print(f"{name:<24} {full_ms:12.1f} {scoped_ms:12.1f} {speedup:>8}")
+
+
+if __name__ == '__main__':
+    main()
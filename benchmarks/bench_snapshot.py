@@ -0,0 +1,109 @@
+"""Per-session ledger copies against the shared columnar snapshot: memory, aggregation and refresh.
+
+Builds a ledger with --rows expenses, then holds --sessions sessions' worth of the expenses table
+both ways, each as a session would: its own typed DataFrame from get_expenses(), or views of the
+one process-wide snapshot. Memory is what tracemalloc sees allocated and still held. Also times
+category totals (SQL against the snapshot, all time and one month) and refreshing the snapshot
+after new rows (append past the rowid watermark) against rebuilding it.
+
+    python benchmarks/bench_snapshot.py [--rows 1000000] [--sessions 20] [--append 1000]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import finance_core as fc  # noqa: E402
+import pandas as pd  # noqa: E402
+
+
+def fill(rows, seed=42):
+    # A year of expenses per batch, in date order as a ledger grows.
+    rng = random.Random(seed)
+    start = fc.to_day('2000-01-01')
+    years = max(1, min(25, rows // 10_000))
+    for year in range(years):
+        size = rows // years + (year < rows % years)
+        days = sorted(start + year * 365 + rng.randrange(365) for _ in range(size))
+        fc.bulk_insert('expenses', pd.DataFrame({
+            'day': days,
+            'amount_cents': [rng.randint(100, 50_000) for _ in range(size)],
+            'label': [rng.choice(fc.EXPENSE_CATEGORIES) for _ in range(size)],
+            'content_hash': [f"{year}-{i}" for i in range(size)],
+        }))
+
+
+def held_bytes(make, sessions):
+    # Bytes still allocated after `sessions` calls to make(), with every result kept alive.
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    held = [make() for _ in range(sessions)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del held
+    return after - before
+
+
+def timed(fn, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--sessions', type=int, default=20)
+    parser.add_argument('--append', type=int, default=1000, help="rows added before the refresh timing")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        fc.configure_db(os.path.join(tmp, 'bench.db'))
+        fc.init_db()
+        fill(args.rows)
+
+        started = time.perf_counter()
+        snapshot = fc.get_snapshot('expenses')
+        build_ms = (time.perf_counter() - started) * 1000
+        shared = snapshot.nbytes
+        copies = held_bytes(fc.get_expenses, args.sessions)
+        views = held_bytes(lambda: fc.get_snapshot('expenses').columns(), args.sessions)
+        dtypes = ', '.join(f"{name} {dtype}" for name, dtype in snapshot.stats()['dtypes'].items())
+        print(f"{args.rows:,} expenses ({dtypes}), {args.sessions} sessions")
+        print(f"  per-session DataFrames  {copies / 2**20:9.1f} MiB total, {copies / args.sessions / 2**20:7.2f} MiB "
+              f"per session")
+        print(f"  shared snapshot         {(shared + views) / 2**20:9.1f} MiB total, "
+              f"{views / args.sessions / 2**10:7.2f} KiB per session (+ {shared / 2**20:.1f} MiB once)")
+        print(f"  saved per session       {(copies - views) / args.sessions / 2**20:9.2f} MiB")
+
+        month = fc.aggregates._month_range('2010-06')
+        print(f"\n{'category totals':<24} {'SQL ms':>9} {'snapshot ms':>12}")
+        for name, (start, end) in (('all time', (None, None)), ('one month', month)):
+            sql = timed(lambda: fc.get_group_totals('expenses', start=start, end=end))
+            snap = timed(lambda: fc.snapshot_group_totals('expenses', start, end))
+            print(f"{name:<24} {sql:9.2f} {snap:12.2f}")
+
+        for i in range(args.append):
+            fc.add_expense('2030-01-01', 1 + i % 50, '🛒 Groceries')
+        started = time.perf_counter()
+        fc.get_snapshot('expenses')
+        append_ms = (time.perf_counter() - started) * 1000
+        fc.clear_snapshots()
+        started = time.perf_counter()
+        fc.get_snapshot('expenses')
+        reload_ms = (time.perf_counter() - started) * 1000
+        print(f"\nsnapshot: first build {build_ms:.0f} ms; after {args.append:,} new rows append {append_ms:.2f} ms "
+              f"vs full reload {reload_ms:.0f} ms")
+        fc.close_db()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,227 @@
+"""Benchmark suite: the public data functions and a full dashboard render at several ledger sizes.
+
+For each scale a seeded synthetic ledger (see synthetic.py) is generated once into --data-dir
+and reused by later runs. Every benchmark gets one warm-up run, traced with
+finance_core.profiling for its SQL statement count and time, then --repeat timed runs.
+Results go to a JSON file (--out, by default benchmarks/results/<time>-<commit>.json) with
+the machine, Python version and git commit they came from. --compare prints the change
+against an earlier results file and exits with status 1 if any median slowed down by more
+than --threshold.
+
+    python benchmarks/bench_suite.py [--scales 10k,100k,1m] [--repeat 5] [--only render,predict]
+                                     [--compare old.json] [--threshold 1.25] [--out results.json]
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import finance_core as fc  # noqa: E402
+import synthetic  # noqa: E402
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP = os.path.join(ROOT, 'finance_assistant.py')
+MONTH = '2025-12'  # the last month of every synthetic ledger
+SCALE_SUFFIXES = {'k': 1_000, 'm': 1_000_000}
+
+
+def _clear_models(state):
+    fc.model_cache.clear()
+
+
+def _render(state):
+    # One run of the whole script, as a browser page load; `state` keeps the AppTest between runs.
+    from streamlit.testing.v1 import AppTest
+
+    at = state.get('app')
+    if at is None:
+        at = state['app'] = AppTest.from_file(APP, default_timeout=600)
+    at.run()
+    if at.exception:
+        raise RuntimeError(at.exception[0].value)
+
+
+def _render_cold(state):
+    import streamlit as st
+
+    st.cache_data.clear()
+    _clear_models(state)
+    fc.clear_snapshots()
+    state.pop('app', None)
+
+
+# name: (function of the per-scale state dict, setup run before each timed call or None)
+BENCHMARKS = {
+    'get_expenses': (lambda state: fc.get_expenses(), None),
+    'get_income': (lambda state: fc.get_income(), None),
+    'get_expenses one month': (lambda state: fc.get_expenses(start=f"{MONTH}-01"), None),
+    'get_dashboard_totals': (lambda state: fc.get_dashboard_totals(MONTH), None),
+    'get_category_totals all time': (lambda state: fc.get_category_totals(), None),
+    'get_category_totals one month': (lambda state: fc.get_category_totals(MONTH), None),
+    'snapshot_group_totals all time': (lambda state: fc.snapshot_group_totals('expenses'), None),
+    'get_monthly_rollup by category': (lambda state: fc.get_monthly_rollup('expenses', by_category=True), None),
+    'get_recent_transactions': (lambda state: fc.get_recent_transactions(10), None),
+    'get_transaction_page': (lambda state: fc.get_transaction_page(), None),
+    'get_budget': (lambda state: fc.get_budget(MONTH), None),
+    'get_savings_goals': (lambda state: fc.get_savings_goals(), None),
+    'predict_spending fit': (lambda state: fc.predict_spending(), _clear_models),
+    'predict_spending cached': (lambda state: fc.predict_spending(), None),
+    'predict_income fit': (lambda state: fc.predict_income(), _clear_models),
+    'predict_income cached': (lambda state: fc.predict_income(), None),
+    'forecast_all': (lambda state: fc.forecast_all(12, origin=MONTH), None),
+    'build_report': (lambda state: fc.build_report(MONTH), None),
+    'expense_pie_figure all time': (lambda state: fc.expense_pie_figure(), None),
+    'income_bar_figure all time': (lambda state: fc.income_bar_figure(), None),
+    'spending_trend_figure all time': (lambda state: fc.spending_trend_figure(), None),
+    'export_data csv': (lambda state: fc.export_data(), None),
+    'export_to_file parquet': (lambda state: fc.export_to_file(io.BytesIO(), 'parquet'), None),
+    'render dashboard cold': (_render, _render_cold),
+    'render dashboard rerun': (_render, None),
+}
+# AppTest runs the script on a thread of its own, outside the warm-up's trace.
+UNTRACED = {'render dashboard cold', 'render dashboard rerun'}
+
+
+def parse_scale(text):
+    text = text.strip().lower()
+    return int(float(text[:-1]) * SCALE_SUFFIXES[text[-1]]) if text[-1] in SCALE_SUFFIXES else int(text)
+
+
+def ledger(data_dir, rows, seed):
+    # The synthetic ledger for (rows, seed), generated on first use; returns (path, row counts).
+    path = os.path.join(data_dir, f"ledger-{rows}-seed{seed}.db")
+    counts_path = f"{path}.json"
+    fc.configure_db(path)
+    fc.init_db()
+    if not os.path.exists(counts_path):
+        started = time.perf_counter()
+        counts = synthetic.generate(rows, seed)
+        print(f"generated {rows:,} rows in {time.perf_counter() - started:.1f}s: {path}", file=sys.stderr)
+        with open(counts_path, 'w') as f:
+            json.dump(counts, f)
+    with open(counts_path) as f:
+        return path, json.load(f)
+
+
+def run_benchmark(name, state, repeat):
+    fn, setup = BENCHMARKS[name]
+    if setup:
+        setup(state)
+    with fc.trace(name, log=None) as run:
+        fn(state)
+    samples = []
+    for _ in range(repeat):
+        if setup:
+            setup(state)
+        started = time.perf_counter()
+        fn(state)
+        samples.append((time.perf_counter() - started) * 1000)
+    summary = run.summary()
+    traced = name not in UNTRACED
+    return {
+        'name': name, 'samples_ms': [round(sample, 3) for sample in samples],
+        'min_ms': round(min(samples), 3), 'median_ms': round(statistics.median(samples), 3),
+        'mean_ms': round(statistics.fmean(samples), 3), 'max_ms': round(max(samples), 3),
+        'sql_statements': summary['queries'] if traced else None,
+        'sql_ms': round(summary['sql_ms'], 3) if traced else None,
+        'sql_rows': summary['rows'] if traced else None,
+    }
+
+
+def environment():
+    def git(*args):
+        try:
+            return subprocess.run(['git', *args], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    return {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'git_commit': git('rev-parse', 'HEAD'),
+        'git_dirty': bool(git('status', '--porcelain', '--untracked-files=no')),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def compare(results, baseline_path, threshold):
+    # Prints median changes against an earlier results file; returns the regressions.
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    before = {(entry['rows'], entry['name']): entry['median_ms'] for entry in baseline['results']}
+    print(f"\nagainst {baseline_path} ({baseline['environment'].get('git_commit') or 'unknown'}):")
+    print(f"{'rows':>10} {'benchmark':<32} {'before ms':>10} {'after ms':>10} {'change':>8}")
+    regressions = []
+    for entry in results:
+        old = before.get((entry['rows'], entry['name']))
+        if old is None:
+            continue
+        ratio = entry['median_ms'] / old if old else float('inf')
+        flag = ""
+        if ratio > threshold:
+            flag = "  slower"
+            regressions.append(entry['name'])
+        print(f"{entry['rows']:>10,} {entry['name']:<32} {old:10.2f} {entry['median_ms']:10.2f} {ratio:7.2f}x{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scales', default='10k,100k,1m', help="comma-separated row counts, e.g. 10k,1m,10m")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--only', help="comma-separated substrings; run only benchmarks whose name contains one")
+    parser.add_argument('--data-dir', default=os.path.join(ROOT, 'benchmarks', 'data'))
+    parser.add_argument('--out', help="results file (default benchmarks/results/<time>-<commit>.json)")
+    parser.add_argument('--compare', help="earlier results file to compare medians against")
+    parser.add_argument('--threshold', type=float, default=1.25, help="slowdown ratio reported as a regression")
+    args = parser.parse_args()
+
+    names = [name for name in BENCHMARKS
+             if not args.only or any(part in name for part in args.only.split(','))]
+    os.makedirs(args.data_dir, exist_ok=True)
+    env = environment()
+    results, ledgers = [], {}
+    with tempfile.TemporaryDirectory() as models:
+        fc.model_cache.cache_dir = models
+        for rows in map(parse_scale, args.scales.split(',')):
+            path, counts = ledger(args.data_dir, rows, args.seed)
+            os.environ['FINANCE_DB_PATH'] = path
+            ledgers[rows] = counts
+            state = {}
+            print(f"\n{rows:,} rows ({', '.join(f'{count:,} {table}' for table, count in counts.items())}), "
+                  f"{args.repeat} runs")
+            print(f"{'benchmark':<32} {'median ms':>10} {'min ms':>10} {'max ms':>10} {'SQL':>6} {'SQL ms':>9}")
+            for name in names:
+                result = {'rows': rows, **run_benchmark(name, state, args.repeat)}
+                results.append(result)
+                sql = (f"{result['sql_statements']:6d} {result['sql_ms']:9.2f}" if result['sql_ms'] is not None
+                       else f"{'-':>6} {'-':>9}")
+                print(f"{name:<32} {result['median_ms']:10.2f} {result['min_ms']:10.2f} {result['max_ms']:10.2f} {sql}")
+            fc.close_db()
+
+    out = args.out or os.path.join(ROOT, 'benchmarks', 'results',
+                                   f"{datetime.now():%Y%m%d-%H%M%S}-{(env['git_commit'] or 'nogit')[:8]}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, 'w') as f:
+        json.dump({'environment': env, 'seed': args.seed, 'repeat': args.repeat,
+                   'ledgers': {str(rows): counts for rows, counts in ledgers.items()}, 'results': results}, f, indent=2)
+    print(f"\nresults: {out}")
+
+    if args.compare and compare(results, args.compare, args.threshold):
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,96 @@
+"""Tenant sharding: concurrent sessions on one shared database against one shard per tenant.
+
+Each thread is a user logging expenses, either directly (a transaction per write) or through
+the write queue. With one database every user's writes contend for the same lock or share one
+writer; with shards each tenant has its own file, lock and writer. Also times opening a shard
+(cold: create and migrate; warm: registry lookup) and the parallel cross-tenant admin totals.
+
+    python benchmarks/bench_tenants.py [--tenants 1000] [--sessions 32] [--writes 100] [--workers 4]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import finance_core as fc  # noqa: E402
+from finance_core.tenants import ShardRegistry  # noqa: E402
+
+
+def direct(i):
+    fc.add_expense('2025-01-01', 1 + i % 50, '🛒 Groceries')
+
+
+def queued(i):
+    fc.submit_write(fc.add_expense, '2025-01-01', 1 + i % 50, '🛒 Groceries').result(fc.WRITE_TIMEOUT)
+
+
+def sessions(pools, write, writes):
+    # One thread per pool, each waiting for every write to commit; returns writes/s and p99 ms.
+    latencies = []
+    lock = threading.Lock()
+
+    def session(pool):
+        mine = []
+        with fc.use_pool(pool):
+            for i in range(writes):
+                started = time.perf_counter()
+                write(i)
+                mine.append((time.perf_counter() - started) * 1000)
+        with lock:
+            latencies.extend(mine)
+
+    threads = [threading.Thread(target=session, args=(pool,)) for pool in pools]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return len(latencies) / elapsed, latencies[len(latencies) * 99 // 100]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tenants', type=int, default=1000)
+    parser.add_argument('--sessions', type=int, default=32)
+    parser.add_argument('--writes', type=int, default=100, help="writes per session")
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        registry = ShardRegistry(os.path.join(tmp, 'tenants'), max_open=args.tenants)
+        started = time.perf_counter()
+        for i in range(args.tenants):
+            with fc.use_pool(registry.pool(f"user{i}")):
+                fc.add_income('2025-01-01', 1000 + i, '💼 Salary')
+        cold_ms = (time.perf_counter() - started) * 1000 / args.tenants
+        started = time.perf_counter()
+        for i in range(args.tenants):
+            registry.pool(f"user{i}")
+        warm_us = (time.perf_counter() - started) * 1e6 / args.tenants
+        print(f"{args.tenants:,} tenants: open shard cold {cold_ms:.2f} ms (create + migrate), warm {warm_us:.1f} us")
+
+        shared = fc.configure_db(os.path.join(tmp, 'shared.db'), max_size=args.sessions)
+        fc.init_db()
+        print(f"\n{args.sessions} sessions x {args.writes} writes   {'mode':<7} {'writes/s':>10} {'p99 ms':>8}")
+        for name, pools in (('one shared database', [shared] * args.sessions),
+                            ('one shard per tenant', [registry.pool(f"user{i}") for i in range(args.sessions)])):
+            for mode, write in (('direct', direct), ('queued', queued)):
+                throughput, p99 = sessions(pools, write, args.writes)
+                print(f"{name:<31} {mode:<7} {throughput:10,.0f} {p99:8.2f}")
+
+        totals, stats = fc.admin_totals('2025-01', workers=args.workers, registry=registry)
+        print(f"\nadmin totals over {stats['databases']:,} shards on {stats['workers']} workers: "
+              f"{stats['wall_seconds']:.2f}s ({stats['databases_per_second']:,.0f} shards/s), "
+              f"income {totals['monthly_income'].sum():,.2f}")
+        registry.close_all()
+        fc.close_db()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""Concurrent write throughput and latency: a transaction per write against the write queue.
+
+Each thread stands in for a session logging expenses one at a time and waiting for each to be
+saved. Direct writes each take SQLite's write lock in their own transaction; queued writes are
+grouped by the single writer thread into one transaction per batch.
+
+    python benchmarks/bench_writes.py [--threads 1,4,16,64] [--writes 200]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import finance_core as fc  # noqa: E402
+
+
+def direct(i):
+    fc.add_expense('2025-01-01', 1 + i % 100, '🛒 Groceries')
+
+
+def queued(i):
+    fc.submit_write(fc.add_expense, '2025-01-01', 1 + i % 100, '🛒 Groceries').result(fc.WRITE_TIMEOUT)
+
+
+def run(write, threads, writes):
+    latencies, errors = [], []
+    lock = threading.Lock()
+
+    def session():
+        mine = []
+        for i in range(writes):
+            started = time.perf_counter()
+            try:
+                write(i)
+            except Exception as exc:
+                with lock:
+                    errors.append(exc)
+            mine.append((time.perf_counter() - started) * 1000)
+        with lock:
+            latencies.extend(mine)
+
+    workers = [threading.Thread(target=session) for _ in range(threads)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return (threads * writes / elapsed, latencies[len(latencies) // 2], latencies[len(latencies) * 99 // 100],
+            len(errors))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--threads', default='1,4,16,64')
+    parser.add_argument('--writes', type=int, default=200, help="writes per thread")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        fc.configure_db(os.path.join(tmp, 'bench.db'), max_size=64)
+        fc.init_db()
+        print(f"{'threads':>7} {'mode':<7} {'writes/s':>10} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7} "
+              f"{'mean batch':>10}")
+        for threads in map(int, args.threads.split(',')):
+            for mode, write in (('direct', direct), ('queued', queued)):
+                before = fc.write_queue_stats()
+                throughput, p50, p99, errors = run(write, threads, args.writes)
+                after = fc.write_queue_stats()
+                batches = after['batches'] - before['batches']
+                mean_batch = f"{(after['committed'] - before['committed']) / batches:10.1f}" if batches else f"{'-':>10}"
+                print(f"{threads:7d} {mode:<7} {throughput:10,.0f} {p50:8.2f} {p99:8.2f} {errors:7d} {mean_batch}")
+        fc.flush_writes()
+        stats = fc.write_queue_stats()
+        print(f"\nwrite queue: peak depth {stats['peak_depth']}, commit p95 {stats['commit_ms_p95']:.2f} ms, "
+              f"latency p99 {stats['latency_ms_p99']:.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,173 @@
+"""Seeded synthetic ledger: expenses, income, budgets, savings goals and mood entries.
+
+The same --rows and --seed always produce the same ledger. The ledger covers one year per
+1,825 rows (about five transactions a day), up to 30 years ending at --end, so larger scales
+mean a longer and then a busier history. Expense categories each have their own share of
+rows, lognormal amount and seasonality (housing is rare and large, groceries and dining are
+frequent and small, utilities peak in winter, travel in summer), with 3% a year inflation.
+Income is a monthly salary with yearly raises plus irregular freelance, investment and other
+payments. Every month gets a budget near that month's spending, and there are a few savings
+goals and a mood entry every few days.
+
+    python benchmarks/synthetic.py ledger.db [--rows 1000000] [--seed 42] [--end 2025-12-31]
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import finance_core as fc  # noqa: E402
+from finance_core.ingest import _content_hashes  # noqa: E402
+
+# category: (share of expense rows, median amount, lognormal sigma, seasonal amplitude, peak month)
+EXPENSE_PROFILES = {
+    "🛒 Groceries": (0.26, 45.0, 0.6, 0.05, 12),
+    "⚡ Utilities": (0.04, 120.0, 0.3, 0.35, 1),
+    "🎬 Entertainment": (0.07, 25.0, 0.8, 0.10, 12),
+    "✈️ Travel": (0.02, 400.0, 1.0, 0.50, 7),
+    "🏠 Housing": (0.02, 1500.0, 0.1, 0.0, 1),
+    "🚗 Transportation": (0.12, 35.0, 0.7, 0.05, 8),
+    "👕 Clothing": (0.05, 60.0, 0.7, 0.30, 11),
+    "🏥 Healthcare": (0.03, 80.0, 1.0, 0.15, 2),
+    "📚 Education": (0.02, 150.0, 0.9, 0.40, 9),
+    "🍽️ Dining": (0.27, 30.0, 0.6, 0.10, 12),
+    "📱 Technology": (0.03, 120.0, 1.1, 0.30, 11),
+    "🔧 Other": (0.07, 20.0, 1.0, 0.0, 1),
+}
+# source: (share of non-salary income rows, median amount, lognormal sigma)
+INCOME_PROFILES = {
+    "🏢 Freelance": (0.35, 800.0, 0.8),
+    "📈 Investment": (0.25, 150.0, 1.2),
+    "🎁 Gift": (0.08, 100.0, 0.9),
+    "💸 Bonus": (0.04, 2500.0, 0.6),
+    "🏠 Rental": (0.10, 1200.0, 0.1),
+    "💰 Side Hustle": (0.13, 200.0, 0.9),
+    "🔧 Other": (0.05, 50.0, 1.0),
+}
+INCOME_SHARE = 0.08  # of all rows
+SALARY = 4000.0
+INFLATION = 0.03
+GOALS = [("🏖️ Vacation", 5000.0, 0.6), ("🚗 New Car", 25000.0, 0.3), ("🏠 Down Payment", 60000.0, 0.15),
+         ("🛟 Emergency Fund", 15000.0, 0.9), ("💻 New Laptop", 2000.0, 1.0)]
+
+
+def ledger_span(rows, end):
+    years = min(30, max(1, rows // 1825))
+    end_day = fc.to_day(end)
+    return end_day - years * 365 + 1, end_day
+
+
+def _months(days):
+    # day numbers -> (months since 1970-01, calendar month 1-12)
+    months = days.astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+    return months, months % 12 + 1
+
+
+def _expenses(rng, count, first_day, last_day):
+    labels = list(EXPENSE_PROFILES)
+    share, median, sigma, amplitude, peak = (np.array(column) for column in zip(*EXPENSE_PROFILES.values()))
+    codes = rng.choice(len(labels), size=count, p=share / share.sum())
+    days = rng.integers(first_day, last_day + 1, size=count)
+    _, month = _months(days)
+    years = (days - first_day) / 365.25
+    amounts = (median[codes] * rng.lognormal(0.0, sigma[codes])
+               * (1 + amplitude[codes] * np.cos(2 * np.pi * (month - peak[codes]) / 12))
+               * (1 + INFLATION) ** years)
+    return days, np.maximum(np.rint(amounts * 100), 1).astype(np.int64), np.array(labels, dtype=object)[codes]
+
+
+def _income(rng, count, first_day, last_day):
+    # A salary on the 1st of every month (3% raise a year), the rest spread over other sources.
+    first_month, last_month = _months(np.array([first_day, last_day]))[0]
+    salary_months = np.arange(first_month, last_month + 1)[:count]
+    salary_days = np.maximum(salary_months.astype('datetime64[M]').astype('datetime64[D]').astype(np.int64),
+                             first_day)
+    salary = SALARY * (1 + INFLATION) ** ((salary_days - first_day) // 365) * rng.normal(1.0, 0.01, len(salary_days))
+
+    labels = list(INCOME_PROFILES)
+    share, median, sigma = (np.array(column) for column in zip(*INCOME_PROFILES.values()))
+    other = count - len(salary_days)
+    codes = rng.choice(len(labels), size=other, p=share / share.sum())
+    other_days = rng.integers(first_day, last_day + 1, size=other)
+    amounts = median[codes] * rng.lognormal(0.0, sigma[codes]) * (1 + INFLATION) ** ((other_days - first_day) / 365.25)
+
+    days = np.concatenate([salary_days, other_days])
+    cents = np.maximum(np.rint(np.concatenate([salary, amounts]) * 100), 1).astype(np.int64)
+    names = np.concatenate([np.full(len(salary_days), "💼 Salary", dtype=object),
+                            np.array(labels, dtype=object)[codes]])
+    return days, cents, names
+
+
+def _insert(table, days, cents, names, chunk_size):
+    # Content hashes are the 64-bit integers import_csv stores, so the table and its hash index
+    # are the size a real import makes them.
+    order = np.argsort(days, kind='stable')
+    days, cents, names = days[order], cents[order], names[order]
+    seen = {'counts': pd.Series(dtype='int64')}
+    for offset in range(0, len(days), chunk_size):
+        end = offset + chunk_size
+        frame = pd.DataFrame({'day': days[offset:end], 'amount_cents': cents[offset:end], 'label': names[offset:end]})
+        fc.bulk_insert(table, frame.assign(content_hash=_content_hashes(frame, seen)))
+
+
+def generate(rows, seed=42, end='2025-12-31', chunk_size=fc.IMPORT_CHUNK_SIZE):
+    # Fills the current database (configure_db and init_db first) and returns row counts per table.
+    rng = np.random.default_rng(seed)
+    first_day, last_day = ledger_span(rows, end)
+    income_rows = max(1, int(rows * INCOME_SHARE))
+    days, cents, names = _expenses(rng, rows - income_rows, first_day, last_day)
+    _insert('expenses', days, cents, names, chunk_size)
+
+    # Budgets track spending: each month's limit is that month's total, give or take 15%, to $10.
+    months, _ = _months(days)
+    spent = pd.Series(cents).groupby(months).sum() / 100
+    for month, total in spent.items():
+        limit = round(float(total) * rng.uniform(0.85, 1.15), -1)
+        fc.set_budget(str(np.datetime64(int(month), 'M')), limit)
+
+    _insert('income', *_income(rng, income_rows, first_day, last_day), chunk_size)
+
+    goals = GOALS[:int(rng.integers(2, len(GOALS) + 1))]
+    for name, target, progress in goals:
+        target_date = date.fromordinal(last_day + fc.EPOCH_ORDINAL + int(rng.integers(90, 1100)))
+        fc.add_savings_goal(name, target, target_date.isoformat())
+        fc.update_savings_goal(name, round(target * progress * rng.uniform(0.5, 1.0), 2))
+
+    mood_days = np.arange(first_day, last_day + 1, 3)
+    scores = np.clip(rng.normal(0.1, 0.35, len(mood_days)), -1, 1).round(3)
+    with fc.get_connection() as conn:
+        conn.executemany("INSERT INTO sentiment (date, sentiment_score, source) VALUES (?, ?, ?)",
+                         ((date.fromordinal(int(day) + fc.EPOCH_ORDINAL).isoformat(), float(score), "user")
+                          for day, score in zip(mood_days, scores)))
+    return {'expenses': len(days), 'income': income_rows, 'budget': len(spent),
+            'savings_goals': len(goals), 'sentiment': len(mood_days)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('db_path')
+    parser.add_argument('--rows', type=int, default=1_000_000, help="expense + income transactions")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--end', default='2025-12-31', help="last day of the ledger")
+    args = parser.parse_args()
+
+    if os.path.exists(args.db_path):
+        parser.error(f"{args.db_path} already exists")
+    fc.configure_db(args.db_path)
+    fc.init_db()
+    started = time.perf_counter()
+    counts = generate(args.rows, args.seed, args.end)
+    elapsed = time.perf_counter() - started
+    print(f"{args.db_path}: " + ", ".join(f"{count:,} {table}" for table, count in counts.items())
+          + f" in {elapsed:.1f}s")
+    fc.close_db()
+
+
+if __name__ == '__main__':
+    main()
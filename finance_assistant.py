@@ -1,236 +1,877 @@
-import sqlite3
 import pandas as pd
-import numpy as np
 import streamlit as st
-import plotly.express as px
-import plotly.graph_objects as go
 from datetime import datetime, timedelta
-from sklearn.ensemble import RandomForestRegressor
-from textblob import TextBlob
-import csv
-import io
+import threading
+import importlib
+import contextvars
+import sys
 import os
+import sqlite3
+import tempfile
+from contextlib import contextmanager
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from finance_core import (EXPENSE_CATEGORIES, EXPORT_FORMATS, HISTORY_PAGE_SIZE, INCOME_SOURCES, PROFILE_MEMORY,
+                          TRANSACTION_TABLES, WRITE_TIMEOUT, add_expense, add_income, add_savings_goal, add_sentiment,
+                          analyze_sentiment, check_export_format, check_tenant_id, current_pool, current_trace,
+                          expense_pie_figure, export_to_file, get_budget, get_category_totals, get_chatbot_response,
+                          get_dashboard_totals, get_db_path, get_expenses, get_group_totals, get_income, get_labels,
+                          get_monthly_rollup, get_monthly_total, get_recent_transactions, get_savings_goals,
+                          get_source_totals, get_table_versions, get_total, get_transaction_page, has_export_rows,
+                          import_csv, income_bar_figure, init_db, predict_income, predict_spending,
+                          rebuild_monthly_rollup, set_budget, set_pool_resolver, span, spending_trend_figure,
+                          submit_write, tenant_pool, trace, update_savings_goal, use_pool)
+
+# Deferred Imports
+# scikit-learn and TextBlob (NLTK) make up most of the import time but are only needed to fit
+# a model or analyse sentiment, so they are imported where used.
+# warm_imports() loads them on a background thread while the first page renders.
+HEAVY_MODULES = ('sklearn.ensemble', 'textblob')
+WARM_IMPORTS = os.environ.get('FINANCE_WARM_IMPORTS', '1') == '1'
+
+
+def _import_quietly(names):
+    for name in names:
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            pass  # reported by the code that needs it, on first use
+        except RuntimeError:
+            pass  # import lock deadlock with the page importing it at the same time; that import wins
+
+
+def warm_imports(modules=HEAVY_MODULES):
+    # Streamlit re-executes this module on every rerun, so the running thread is found by name.
+    pending = [name for name in modules if name not in sys.modules]
+    if not pending or any(thread.name == 'warm-imports' for thread in threading.enumerate()):
+        return None
+    thread = threading.Thread(target=_import_quietly, args=(pending,), name='warm-imports', daemon=True)
+    thread.start()
+    return thread
+
+
+# Tenants
+# ?tenant=<id> in the URL gives the session its own ledger shard (see finance_core.tenants);
+# without it the dashboard uses the default database. The resolver is consulted on every
+# storage call, so fragments, callbacks and cached reads all follow the session's tenant.
+def session_tenant():
+    tenant = st.query_params.get('tenant')
+    return check_tenant_id(tenant) if tenant else None
+
+
+def _session_pool():
+    if get_script_run_ctx(suppress_warning=True) is None:  # a background thread, not a session's script run
+        return None
+    tenant = st.query_params.get('tenant')
+    return tenant_pool(tenant) if tenant else None
+
+
+set_pool_resolver(_session_pool)
+
+
+# Cached Reads
+# Results are shared across reruns and sessions through st.cache_data. Each entry is keyed on
+# the write counters of the tables it reads, which the table_versions triggers bump on every
+# write, so a write from any session (or process) invalidates exactly the reads that depend on it.
+# The versions are read once per script or fragment run (the outermost section() scopes it) and
+# shared by every read in it; writes happen in widget callbacks, before the run reads anything.
+CACHE_MAX_ENTRIES = int(os.environ.get('FINANCE_CACHE_MAX_ENTRIES', '64'))
+
+# reader name -> (function, tables it reads); None means "the table passed as first argument"
+CACHED_READS = {fn.__name__: (fn, tables) for fn, tables in [
+    (get_expenses, ('expenses',)),
+    (get_income, ('income',)),
+    (get_budget, ('budget',)),
+    (get_savings_goals, ('savings_goals',)),
+    (get_dashboard_totals, ('expenses', 'income')),
+    (get_category_totals, ('expenses',)),
+    (get_source_totals, ('income',)),
+    (get_group_totals, None),
+    (get_monthly_rollup, None),
+    (get_monthly_total, None),
+    (get_recent_transactions, ('expenses', 'income')),
+    (get_transaction_page, ('expenses', 'income')),
+    (get_total, None),
+    (get_labels, None),
+    (expense_pie_figure, ('expenses',)),
+    (income_bar_figure, ('income',)),
+    (spending_trend_figure, ('expenses',)),
+]}
+
+
+# db path -> table versions, for the run in progress; None outside a section()
+_run_versions = contextvars.ContextVar('run_versions', default=None)
+
+
+def _table_versions():
+    run_versions = _run_versions.get()
+    if run_versions is None:
+        return get_table_versions()
+    db_path = get_db_path()
+    if db_path not in run_versions:
+        run_versions[db_path] = get_table_versions()
+    return run_versions[db_path]
+
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES, show_spinner=False)
+def _cached_read(name, db_path, versions, args, kwargs):
+    # db_path and versions are only part of the cache key
+    return CACHED_READS[name][0](*args, **dict(kwargs))
+
+
+def cached_read(fn, *args, **kwargs):
+    name = fn.__name__
+    if name not in CACHED_READS:
+        raise ValueError(f"{name} is not a cacheable read")
+    tables = CACHED_READS[name][1] or (args[0] if args else kwargs['table'],)
+    all_versions = _table_versions()
+    versions = tuple(all_versions.get(table, 0) for table in tables)
+    with span(f"cached_read.{name}"):
+        return _cached_read(name, get_db_path(), versions, args, tuple(sorted(kwargs.items())))
+
+
+def clear_read_cache():
+    _cached_read.clear()
+
+
+# Profiling
+# ?debug=1 traces every run and fragment rerun: a span per dashboard section and data function
+# plus every SQL statement with its row count, listed in a profiler panel at the bottom of the
+# sidebar. ?debug=memory also traces allocations per span. FINANCE_PROFILE=1 traces without the
+# URL parameter, and FINANCE_PROFILE_LOG=<file> appends every trace to that file as JSON lines.
+PROFILE = os.environ.get('FINANCE_PROFILE', '0') == '1'
+DEBUG_TRACES_KEPT = 20
+
+
+def debug_mode():
+    mode = st.query_params.get('debug')
+    if mode is None and PROFILE:
+        mode = 'memory' if PROFILE_MEMORY else '1'
+    if mode in ('1', 'true', 'time'):
+        return 'time'
+    return 'memory' if mode == 'memory' else None
+
+
+@contextmanager
+def section(name):
+    # A span within a traced run; a fragment rerunning on its own is traced as a run of its own.
+    if _run_versions.get() is None:
+        token = _run_versions.set({})
+        try:
+            with section(name):
+                yield
+        finally:
+            _run_versions.reset(token)
+        return
+    if current_trace() is not None:
+        with span(name):
+            yield
+        return
+    mode = debug_mode()
+    if mode is None:
+        yield
+        return
+    run = None
+    try:
+        with trace(name, memory=mode == 'memory', tenant=st.query_params.get('tenant')) as run:
+            yield
+    finally:
+        if run is not None:
+            traces = st.session_state.setdefault('_debug_traces', [])
+            traces.insert(0, run)
+            del traces[DEBUG_TRACES_KEPT:]
 
 
-# Database Setup
-def init_db():
-    with sqlite3.connect('finance.db') as conn:
-        c = conn.cursor()
-        c.execute(
-            '''CREATE TABLE IF NOT EXISTS expenses (id INTEGER PRIMARY KEY, date TEXT, amount REAL, category TEXT)''')
-        c.execute('''CREATE TABLE IF NOT EXISTS income (id INTEGER PRIMARY KEY, date TEXT, amount REAL, source TEXT)''')
-        c.execute(
-            '''CREATE TABLE IF NOT EXISTS sentiment (id INTEGER PRIMARY KEY, date TEXT, sentiment_score REAL, source TEXT)''')
-        c.execute('''CREATE TABLE IF NOT EXISTS budget (id INTEGER PRIMARY KEY, month TEXT, budget_limit REAL)''')
-        c.execute(
-            '''CREATE TABLE IF NOT EXISTS savings_goals (id INTEGER PRIMARY KEY, goal_name TEXT, target_amount REAL, current_amount REAL, target_date TEXT)''')
-        conn.commit()
-
-
-def add_expense(date, amount, category):
-    with sqlite3.connect('finance.db') as conn:
-        c = conn.cursor()
-        c.execute("INSERT INTO expenses (date, amount, category) VALUES (?, ?, ?)", (date, amount, category))
-        conn.commit()
-
-
-def add_income(date, amount, source):
-    with sqlite3.connect('finance.db') as conn:
-        c = conn.cursor()
-        c.execute("INSERT INTO income (date, amount, source) VALUES (?, ?, ?)", (date, amount, source))
-        conn.commit()
-
-
-def add_sentiment(date, sentiment_score, source):
-    with sqlite3.connect('finance.db') as conn:
-        c = conn.cursor()
-        c.execute("INSERT INTO sentiment (date, sentiment_score, source) VALUES (?, ?, ?)",
-                  (date, sentiment_score, source))
-        conn.commit()
-
-
-def set_budget(month, budget_limit):
-    with sqlite3.connect('finance.db') as conn:
-        c = conn.cursor()
-        c.execute(
-            "INSERT OR REPLACE INTO budget (id, month, budget_limit) VALUES ((SELECT id FROM budget WHERE month = ?), ?, ?)",
-            (month, month, budget_limit))
-        conn.commit()
-
-
-def add_savings_goal(goal_name, target_amount, target_date):
-    with sqlite3.connect('finance.db') as conn:
-        c = conn.cursor()
-        c.execute(
-            "INSERT INTO savings_goals (goal_name, target_amount, current_amount, target_date) VALUES (?, ?, 0, ?)",
-            (goal_name, target_amount, target_date))
-        conn.commit()
-
-
-def update_savings_goal(goal_name, amount):
-    with sqlite3.connect('finance.db') as conn:
-        c = conn.cursor()
-        c.execute("UPDATE savings_goals SET current_amount = current_amount + ? WHERE goal_name = ?",
-                  (amount, goal_name))
-        conn.commit()
-
-
-def get_expenses():
-    with sqlite3.connect('finance.db') as conn:
-        df = pd.read_sql_query("SELECT * FROM expenses", conn)
-    return df
-
-
-def get_income():
-    with sqlite3.connect('finance.db') as conn:
-        df = pd.read_sql_query("SELECT * FROM income", conn)
-    return df
-
-
-def get_budget(month):
-    with sqlite3.connect('finance.db') as conn:
-        c = conn.cursor()
-        c.execute("SELECT budget_limit FROM budget WHERE month = ?", (month,))
-        result = c.fetchone()
-    return result[0] if result else None
-
-
-def get_savings_goals():
-    with sqlite3.connect('finance.db') as conn:
-        df = pd.read_sql_query("SELECT * FROM savings_goals", conn)
-    return df
-
-
-# Enhanced Sentiment Analysis
-def analyze_sentiment(text):
-    if not text or not text.strip():
-        return 0.0
-    blob = TextBlob(text)
-    return blob.sentiment.polarity
-
-
-# Enhanced Spending Prediction
-def predict_spending():
-    df = get_expenses()
-    if df.empty or 'date' not in df.columns or 'amount' not in df.columns:
-        return 0.0
-    df['date'] = pd.to_datetime(df['date'])
-    df['month'] = df['date'].dt.month
-    df['year'] = df['date'].dt.year
-    monthly_expenses = df.groupby(['year', 'month'])['amount'].sum().reset_index()
-    if monthly_expenses.empty:
-        return 0.0
-    X = monthly_expenses[['year', 'month']]
-    y = monthly_expenses['amount']
-    model = RandomForestRegressor(n_estimators=100, random_state=42)
-    model.fit(X, y)
-    current_date = datetime.now()
-    next_month = pd.DataFrame({'year': [current_date.year], 'month': [(current_date.month % 12) + 1]})
-    return float(model.predict(next_month)[0])
-
-
-# Enhanced Income Prediction
-def predict_income():
-    df = get_income()
-    if df.empty or 'date' not in df.columns or 'amount' not in df.columns:
-        return 0.0
-    df['date'] = pd.to_datetime(df['date'])
-    df['month'] = df['date'].dt.month
-    df['year'] = df['date'].dt.year
-    monthly_income = df.groupby(['year', 'month'])['amount'].sum().reset_index()
-    if monthly_income.empty:
-        return 0.0
-    X = monthly_income[['year', 'month']]
-    y = monthly_income['amount']
-    model = RandomForestRegressor(n_estimators=100, random_state=42)
-    model.fit(X, y)
-    current_date = datetime.now()
-    next_month = pd.DataFrame({'year': [current_date.year], 'month': [(current_date.month % 12) + 1]})
-    return float(model.predict(next_month)[0])
-
-
-# Enhanced AI Chatbot with better responses
-def get_chatbot_response(user_input):
-    user_input = user_input.lower().strip()
-
-    # Savings advice
-    if any(word in user_input for word in ['save', 'saving', 'emergency fund']):
-        return "💡 Build an emergency fund first (3-6 months expenses), then save 20% of income. Automate transfers to savings accounts for consistency."
-
-    # Budget advice
-    elif any(word in user_input for word in ['budget', 'spending', 'expenses']):
-        return "📊 Follow the 50/30/20 rule: 50% needs, 30% wants, 20% savings. Track every expense and review monthly to identify spending patterns."
-
-    # Investment advice
-    elif 'invest' in user_input:
-        return "📈 Start with low-cost index funds or ETFs. Diversify across asset classes and invest consistently over time. Consider your risk tolerance and timeline."
-
-    # Debt management
-    elif any(word in user_input for word in ['debt', 'loan', 'credit']):
-        return "💳 Pay minimums on all debts, then focus extra payments on highest interest rate debt (avalanche method). Consider debt consolidation if beneficial."
-
-    # Retirement planning
-    elif any(word in user_input for word in ['retirement', '401k', 'pension']):
-        return "🏖️ Start early! Contribute enough to get employer match, then maximize tax-advantaged accounts. Aim to save 10-15% of income for retirement."
-
-    # General financial health
-    elif any(word in user_input for word in ['financial health', 'money management', 'financial tips']):
-        return "💪 Focus on: 1) Building emergency fund, 2) Paying off high-interest debt, 3) Budgeting effectively, 4) Investing for long-term goals, 5) Protecting with insurance."
-
-    return "🤖 I can help with saving strategies, budgeting tips, investment guidance, debt management, and retirement planning. What specific area interests you?"
-
-
-# Export enhanced data
-def export_data():
-    expenses = get_expenses()
-    income = get_income()
-    if expenses.empty and income.empty:
-        return "No data to export"
-
-    # Combine and enhance data
-    expenses_enhanced = expenses.copy()
-    if not expenses_enhanced.empty:
-        expenses_enhanced['Type'] = 'Expense'
-        expenses_enhanced['source'] = expenses_enhanced['category']
-
-    income_enhanced = income.copy()
-    if not income_enhanced.empty:
-        income_enhanced['Type'] = 'Income'
-        income_enhanced['category'] = income_enhanced['source']
-
-    combined = pd.concat([expenses_enhanced, income_enhanced], ignore_index=True)
-    csv_buffer = io.StringIO()
-    combined.to_csv(csv_buffer, index=False)
-    return csv_buffer.getvalue()
+# Create custom metric cards
+DASHBOARD_PERIODS = ["All Time", "This Month", "Last 3 Months", "Last 12 Months", "Year to Date"]
+
+
+def period_bounds(period, today=None):
+    # (start, end) for query_transactions: start inclusive, end left open
+    today = today or datetime.now().date()
+    first = today.replace(day=1)
+    if period == "This Month":
+        return first, None
+    if period == "Last 3 Months":
+        return (pd.Timestamp(first) - pd.DateOffset(months=2)).date(), None
+    if period == "Last 12 Months":
+        return (pd.Timestamp(first) - pd.DateOffset(months=11)).date(), None
+    if period == "Year to Date":
+        return today.replace(month=1, day=1), None
+    return None, None
 
 
-# Create custom metric cards
 def create_metric_card(title, value, delta=None, delta_color="normal"):
     delta_html = ""
     if delta:
         color = "#10B981" if delta_color == "normal" else "#EF4444"
         delta_html = f'<div style="color: {color}; font-size: 0.8rem; margin-top: 4px;">{delta}</div>'
 
-    return f"""
-    <div style="
-        background: linear-gradient(135deg, rgba(255,255,255,0.1) 0%, rgba(255,255,255,0.05) 100%);
-        backdrop-filter: blur(10px);
-        border: 1px solid rgba(255,255,255,0.2);
-        border-radius: 16px;
-        padding: 20px;
-        margin: 10px 0;
-        box-shadow: 0 8px 32px rgba(0,0,0,0.1);
-        transition: all 0.3s ease;
-    ">
-        <div style="color: #8B5CF6; font-size: 0.9rem; font-weight: 500; margin-bottom: 8px;">{title}</div>
-        <div style="color: white; font-size: 2rem; font-weight: 700;">{value}</div>
-        {delta_html}
-    </div>
-    """
+    return f"""
+    <div style="
+        background: linear-gradient(135deg, rgba(255,255,255,0.1) 0%, rgba(255,255,255,0.05) 100%);
+        backdrop-filter: blur(10px);
+        border: 1px solid rgba(255,255,255,0.2);
+        border-radius: 16px;
+        padding: 20px;
+        margin: 10px 0;
+        box-shadow: 0 8px 32px rgba(0,0,0,0.1);
+        transition: all 0.3s ease;
+    ">
+        <div style="color: #8B5CF6; font-size: 0.9rem; font-weight: 500; margin-bottom: 8px;">{title}</div>
+        <div style="color: white; font-size: 2rem; font-weight: 700;">{value}</div>
+        {delta_html}
+    </div>
+    """
+
+
+# Create a transaction list row
+def create_transaction_row(transaction):
+    is_income = transaction.type == 'Income'
+    amount_color = "#10B981" if is_income else "#EF4444"
+    amount_prefix = "+" if is_income else "-"
+    type_label = '💰 Income' if is_income else '💸 Expense'
+
+    return f"""
+        <div style="
+            display: flex;
+            justify-content: space-between;
+            align-items: center;
+            background: rgba(255,255,255,0.05);
+            border: 1px solid rgba(255,255,255,0.1);
+            border-radius: 12px;
+            padding: 1rem;
+            margin: 0.5rem 0;
+        ">
+            <div style="display: flex; align-items: center;">
+                <span style="margin-right: 1rem;">{type_label}</span>
+                <div>
+                    <div style="font-weight: 600; color: white;">{transaction.label}</div>
+                    <div style="font-size: 0.85rem; color: #9CA3AF;">{transaction.date.strftime('%B %d, %Y')}</div>
+                </div>
+            </div>
+            <div style="font-weight: 700; font-size: 1.1rem; color: {amount_color};">
+                {amount_prefix}${transaction.amount:,.2f}
+            </div>
+        </div>
+    """
+
+
+# Streamlit Dashboard with Premium UI
+# Dashboard Panels
+# Every panel is a keyed fragment: a widget inside a panel reruns only that panel, and a
+# sidebar form that writes reruns itself plus the panels reading the tables it wrote, so
+# typing in a form or paging history never re-executes the rest of the dashboard.
+PANEL_TABLES = {
+    'metrics_panel': ('expenses', 'income'),
+    'charts_panel': ('expenses', 'income', 'savings_goals'),
+    'budget_panel': ('expenses', 'income', 'budget'),
+    'predictions_panel': ('expenses', 'income', 'budget'),
+    'transactions_panel': ('expenses', 'income'),
+}
+
+
+def panels_reading(tables):
+    return [panel for panel, reads in PANEL_TABLES.items() if set(reads) & set(tables)]
+
+
+def _flash(fragment, kind, message):
+    # Shown on the fragment's next run; the form's on_click runs before the fragment renders.
+    st.session_state[f"{fragment}_flash"] = (kind, message)
+
+
+def _show_flash(fragment):
+    kind, message = st.session_state.pop(f"{fragment}_flash", (None, None))
+    if message:
+        getattr(st, kind)(message)
+
+
+def _after_write(fragment, tables):
+    # Only valid from a widget callback: reruns the form's own fragment and the panels that read `tables`.
+    st.rerun([fragment] + panels_reading(tables))
+
+
+def _queued_write(fragment, fn, *args):
+    # Writes from every session go through the shared write queue; this waits for the commit so
+    # the panels rerun against it, and flashes the error instead if the write failed or timed out.
+    try:
+        submit_write(fn, *args).result(WRITE_TIMEOUT)
+    except Exception as exc:
+        _flash(fragment, 'error', f"⚠️ Could not save: {exc or type(exc).__name__}")
+        return False
+    return True
+
+
+def _log_expense():
+    state = st.session_state
+    if not _queued_write('expense_form', add_expense, state.expense_date.strftime('%Y-%m-%d'), state.expense_amount,
+                         state.expense_category):
+        return
+    _flash('expense_form', 'success', "✅ Expense logged successfully!")
+    _after_write('expense_form', ('expenses',))
+
+
+@st.fragment(key='expense_form')
+@section('expense_form')
+def expense_form():
+    with st.expander("💸 Add Expense", expanded=False):
+        with st.form("expense_entry", border=False):
+            st.markdown("**Record a new expense**")
+            st.date_input("📅 Date", datetime.now(), key="expense_date")
+            st.number_input("💵 Amount ($)", min_value=0.0, format="%.2f", key="expense_amount")
+            st.selectbox("🏷️ Category", EXPENSE_CATEGORIES, key="expense_category")
+            st.form_submit_button("💾 Log Expense", key="add_expense", on_click=_log_expense)
+        _show_flash('expense_form')
+
+
+def _log_income():
+    state = st.session_state
+    if not _queued_write('income_form', add_income, state.income_date.strftime('%Y-%m-%d'), state.income_amount,
+                         state.income_source):
+        return
+    _flash('income_form', 'success', "✅ Income logged successfully!")
+    _after_write('income_form', ('income',))
+
+
+@st.fragment(key='income_form')
+@section('income_form')
+def income_form():
+    with st.expander("💰 Add Income", expanded=False):
+        with st.form("income_entry", border=False):
+            st.markdown("**Record new income**")
+            st.date_input("📅 Date", datetime.now(), key="income_date")
+            st.number_input("💵 Amount ($)", min_value=0.0, format="%.2f", key="income_amount")
+            st.selectbox("💼 Source", INCOME_SOURCES, key="income_source")
+            st.form_submit_button("💾 Log Income", key="add_income", on_click=_log_income)
+        _show_flash('income_form')
+
+
+def _set_budget():
+    if not _queued_write('budget_form', set_budget, st.session_state.budget_month, st.session_state.budget_limit):
+        return
+    _flash('budget_form', 'success', "✅ Budget set successfully!")
+    _after_write('budget_form', ('budget',))
+
+
+@st.fragment(key='budget_form')
+@section('budget_form')
+def budget_form():
+    with st.expander("🎯 Set Budget", expanded=False):
+        with st.form("budget_entry", border=False):
+            st.markdown("**Monthly budget planning**")
+            st.text_input("📆 Month (YYYY-MM)", datetime.now().strftime("%Y-%m"), key="budget_month")
+            st.number_input("🏦 Budget Limit ($)", min_value=0.0, format="%.2f", key="budget_limit")
+            st.form_submit_button("🎯 Set Budget", key="set_budget", on_click=_set_budget)
+        _show_flash('budget_form')
+
+
+def _create_goal():
+    state = st.session_state
+    if not (state.goal_name and state.target_amount > 0):
+        _flash('goals_form', 'error', "Please fill in all fields")
+        return
+    if not _queued_write('goals_form', add_savings_goal, state.goal_name, state.target_amount,
+                         state.target_date.strftime('%Y-%m-%d')):
+        return
+    _flash('goals_form', 'success', "✅ Goal created successfully!")
+    _after_write('goals_form', ('savings_goals',))
+
+
+def _add_to_goal():
+    state = st.session_state
+    if state.update_amount > 0 and _queued_write('goals_form', update_savings_goal, state.select_goal,
+                                                 state.update_amount):
+        _flash('goals_form', 'success', f"✅ Added ${state.update_amount:.2f} to {state.select_goal}!")
+        _after_write('goals_form', ('savings_goals',))
+
+
+@st.fragment(key='goals_form')
+@section('goals_form')
+def goals_form():
+    with st.expander("🎯 Savings Goals", expanded=False):
+        st.markdown("**Financial goal tracking**")
+
+        # Add new goal
+        with st.form("goal_entry", border=False):
+            st.markdown("**Create New Goal**")
+            st.text_input("🎯 Goal Name", placeholder="e.g., Emergency Fund", key="goal_name")
+            st.number_input("💰 Target Amount ($)", min_value=0.0, format="%.2f", key="target_amount")
+            st.date_input("📅 Target Date", datetime.now() + timedelta(days=365), key="target_date")
+            st.form_submit_button("🎯 Create Goal", key="add_goal", on_click=_create_goal)
+
+        # Update existing goal
+        goals_df = cached_read(get_savings_goals)
+        if not goals_df.empty:
+            with st.form("goal_update", border=False):
+                st.markdown("**Add to Existing Goal**")
+                st.selectbox("Select Goal", goals_df['goal_name'].tolist(), key="select_goal")
+                st.number_input("💵 Amount to Add ($)", min_value=0.0, format="%.2f", key="update_amount")
+                st.form_submit_button("➕ Add to Goal", key="add_to_goal", on_click=_add_to_goal)
+        _show_flash('goals_form')
+
+
+def _import_statement():
+    statement = st.session_state.import_file
+    if statement is None:
+        return
+    table = {"Expenses": "expenses", "Income": "income"}.get(st.session_state.import_target)
+    try:
+        report = import_csv(statement, table=table)
+    except ValueError as exc:
+        _flash('import_form', 'error', f"⚠️ {exc}")
+        return
+    except sqlite3.Error as exc:
+        # e.g. the write lock held past busy_timeout. Chunks commit one by one, so earlier ones may
+        # have landed; they are de-duplicated by content hash when the file is imported again.
+        _flash('import_form', 'error', f"⚠️ Could not import: {exc or type(exc).__name__}. Rows already saved are "
+                                       f"kept; importing the file again skips them.")
+        _after_write('import_form', [table] if table else TRANSACTION_TABLES)
+        return
+    _flash('import_form', 'success', f"✅ Imported {report['inserted']:,} rows "
+                                     f"({report['duplicates']:,} duplicates skipped, {report['rejected']:,} unreadable) "
+                                     f"at {report['rows_per_second']:,.0f} rows/s")
+    if report['inserted']:
+        _after_write('import_form', [table] if table else TRANSACTION_TABLES)
+
+
+@st.fragment(key='import_form')
+@section('import_form')
+def import_form():
+    with st.expander("📤 Import Statement", expanded=False):
+        with st.form("statement_import", border=False):
+            st.markdown("**Load a bank or card export (CSV)**")
+            st.file_uploader("📄 CSV file", type=["csv"], key="import_file")
+            st.selectbox("📥 Import as", ["Auto (Type column or amount sign)", "Expenses", "Income"],
+                         key="import_target")
+            st.form_submit_button("📤 Import", key="import_statement", on_click=_import_statement)
+        _show_flash('import_form')
+
+
+def _analyze_mood():
+    user_text = st.session_state.sentiment_text
+    if not user_text.strip():
+        return
+    sentiment = analyze_sentiment(user_text)
+    if not _queued_write('mood_tracker', add_sentiment, datetime.now().strftime('%Y-%m-%d'), sentiment, "user"):
+        return
+
+    # Enhanced sentiment feedback
+    if sentiment < -0.5:
+        _flash('mood_tracker', 'error',
+               f"😰 Very Negative Sentiment ({sentiment:.2f}) - Consider speaking with a financial advisor")
+    elif sentiment < -0.1:
+        _flash('mood_tracker', 'warning', f"😕 Negative Sentiment ({sentiment:.2f}) - Focus on small wins and budgeting")
+    elif sentiment < 0.1:
+        _flash('mood_tracker', 'info',
+               f"😐 Neutral Sentiment ({sentiment:.2f}) - Stay consistent with your financial habits")
+    elif sentiment < 0.5:
+        _flash('mood_tracker', 'success', f"😊 Positive Sentiment ({sentiment:.2f}) - Great mindset for financial growth!")
+    else:
+        _flash('mood_tracker', 'success', f"🎉 Very Positive Sentiment ({sentiment:.2f}) - Excellent financial confidence!")
+    _after_write('mood_tracker', ('sentiment',))
+
+
+@st.fragment(key='mood_tracker')
+@section('mood_tracker')
+def mood_tracker():
+    st.markdown("""
+        <div style="text-align: center; padding: 1rem 0; border-top: 1px solid rgba(139,92,246,0.3); margin-top: 1.5rem;">
+            <h3 style="color: #8B5CF6; margin: 0 0 0.5rem 0; font-weight: 600;">💭 Mood Tracker</h3>
+            <p style="color: #9CA3AF; font-size: 0.85rem; margin: 0;">How are you feeling about your finances?</p>
+        </div>
+    """, unsafe_allow_html=True)
+
+    with st.form("mood_entry", border=False):
+        st.text_area("✍️ Share your thoughts...",
+                     placeholder="e.g., Feeling stressed about my spending this month...",
+                     key="sentiment_text", height=100)
+        st.form_submit_button("🔍 Analyze Sentiment", key="analyze_sentiment", on_click=_analyze_mood)
+    _show_flash('mood_tracker')
+
+
+@st.fragment(key='metrics_panel')
+@section('metrics_panel')
+def metrics_panel():
+    # Calculate key metrics
+    totals = cached_read(get_dashboard_totals, datetime.now().strftime("%Y-%m"))
+    monthly_expenses = totals['monthly_expenses']
+    total_expenses = totals['total_expenses']
+    monthly_income = totals['monthly_income']
+    total_income = totals['total_income']
+
+    net_worth = total_income - total_expenses
+    monthly_savings = monthly_income - monthly_expenses
+
+    # Display key metrics
+    col1, col2, col3, col4 = st.columns(4)
+
+    with col1:
+        st.markdown(create_metric_card(
+            "💰 Monthly Income",
+            f"${monthly_income:,.2f}",
+            f"+${monthly_income - (monthly_income * 0.9):,.2f}" if monthly_income > 0 else None
+        ), unsafe_allow_html=True)
+
+    with col2:
+        st.markdown(create_metric_card(
+            "💸 Monthly Expenses",
+            f"${monthly_expenses:,.2f}",
+            f"+${monthly_expenses - (monthly_expenses * 0.9):,.2f}" if monthly_expenses > 0 else None,
+            "inverse" if monthly_expenses > monthly_income else "normal"
+        ), unsafe_allow_html=True)
+
+    with col3:
+        st.markdown(create_metric_card(
+            "💎 Monthly Savings",
+            f"${monthly_savings:,.2f}",
+            "🎯 Great job!" if monthly_savings > 0 else "⚠️ Overspending"
+        ), unsafe_allow_html=True)
+
+    with col4:
+        st.markdown(create_metric_card(
+            "🏦 Net Worth",
+            f"${net_worth:,.2f}",
+            "📈 Growing" if net_worth > 0 else "📉 Deficit"
+        ), unsafe_allow_html=True)
+
+
+@st.fragment(key='charts_panel')
+@section('charts_panel')
+def charts_panel():
+    # Figures are Plotly specs cached against the data they were built from (finance_core.charts),
+    # so a rerun with unchanged data only sends them again.
+    totals = cached_read(get_dashboard_totals, datetime.now().strftime("%Y-%m"))
+    period = st.selectbox("📆 Period", DASHBOARD_PERIODS, key="dashboard_period")
+    period_start, period_end = period_bounds(period)
+    start_month = period_start.strftime('%Y-%m') if period_start else None
+
+    # Charts Row 1
+    col1, col2 = st.columns(2)
+
+    with col1:
+        st.markdown('<div class="chart-container">', unsafe_allow_html=True)
+        if totals['expense_count']:
+            st.markdown("### 🍕 Expense Distribution")
+            fig_pie = cached_read(expense_pie_figure, period_start, period_end)
+            with span('plotly_chart'):
+                st.plotly_chart(fig_pie, use_container_width=True)
+        else:
+            st.info("💡 Add some expenses to see the distribution chart")
+        st.markdown('</div>', unsafe_allow_html=True)
+
+    with col2:
+        st.markdown('<div class="chart-container">', unsafe_allow_html=True)
+        if totals['income_count']:
+            st.markdown("### 💰 Income Sources")
+            fig_income = cached_read(income_bar_figure, period_start, period_end)
+            with span('plotly_chart'):
+                st.plotly_chart(fig_income, use_container_width=True)
+        else:
+            st.info("💡 Add some income to see the sources chart")
+        st.markdown('</div>', unsafe_allow_html=True)
+
+    # Charts Row 2
+    col1, col2 = st.columns(2)
+
+    with col1:
+        st.markdown('<div class="chart-container">', unsafe_allow_html=True)
+        fig_trend = cached_read(spending_trend_figure, start_month)
+        if fig_trend:
+            st.markdown("### 📈 Spending Trends")
+            with span('plotly_chart'):
+                st.plotly_chart(fig_trend, use_container_width=True)
+        else:
+            st.info("💡 Add expenses over time to see spending trends")
+        st.markdown('</div>', unsafe_allow_html=True)
+
+    with col2:
+        st.markdown('<div class="chart-container">', unsafe_allow_html=True)
+        st.markdown("### 🎯 Savings Goals Progress")
+        goals_df = cached_read(get_savings_goals)
+        if not goals_df.empty:
+            for _, goal in goals_df.iterrows():
+                progress = min(goal['current_amount'] / goal['target_amount'], 1.0) * 100
+                days_left = (pd.to_datetime(goal['target_date']) - datetime.now()).days
+
+                # Progress bar with custom styling
+                st.markdown(f"""
+                    <div style="margin: 1rem 0; padding: 1rem; background: rgba(255,255,255,0.05); border-radius: 12px; border: 1px solid rgba(139,92,246,0.2);">
+                        <div style="display: flex; justify-content: space-between; margin-bottom: 0.5rem;">
+                            <span style="font-weight: 600; color: #8B5CF6;">{goal['goal_name']}</span>
+                            <span style="color: #D1D5DB;">${goal['current_amount']:,.0f} / ${goal['target_amount']:,.0f}</span>
+                        </div>
+                        <div style="background: rgba(255,255,255,0.1); border-radius: 8px; height: 8px; overflow: hidden;">
+                            <div style="background: linear-gradient(135deg, #8B5CF6 0%, #3B82F6 100%); height: 100%; width: {progress}%; transition: width 0.3s ease;"></div>
+                        </div>
+                        <div style="margin-top: 0.5rem; font-size: 0.85rem; color: #9CA3AF;">
+                            {progress:.1f}% complete • {days_left} days remaining
+                        </div>
+                    </div>
+                """, unsafe_allow_html=True)
+        else:
+            st.info("💡 Set up savings goals to track your progress")
+        st.markdown('</div>', unsafe_allow_html=True)
+
+
+@st.fragment(key='budget_panel')
+@section('budget_panel')
+def budget_panel():
+    current_month = datetime.now().strftime("%Y-%m")
+    monthly_expenses = cached_read(get_dashboard_totals, current_month)['monthly_expenses']
+    budget_limit = cached_read(get_budget, current_month)
+    if budget_limit is not None:
+        budget_used = (monthly_expenses / budget_limit) * 100 if budget_limit > 0 else 0
+        remaining_budget = budget_limit - monthly_expenses
+
+        col1, col2, col3 = st.columns(3)
+
+        with col1:
+            st.markdown(create_metric_card(
+                "🏦 Monthly Budget",
+                f"${budget_limit:,.2f}",
+                "Set for this month"
+            ), unsafe_allow_html=True)
+
+        with col2:
+            color = "normal" if budget_used <= 80 else "inverse"
+            st.markdown(create_metric_card(
+                "📊 Budget Used",
+                f"{budget_used:.1f}%",
+                "🟢 On track" if budget_used <= 80 else "🔴 Over budget" if budget_used > 100 else "🟡 Close to limit"
+            ), unsafe_allow_html=True)
+
+        with col3:
+            st.markdown(create_metric_card(
+                "💰 Remaining Budget",
+                f"${remaining_budget:,.2f}",
+                "Available to spend" if remaining_budget > 0 else "Overspent!"
+            ), unsafe_allow_html=True)
+    else:
+        st.info("💡 Set a monthly budget to see detailed analysis and insights")
+
+
+@st.fragment(key='predictions_panel')
+@section('predictions_panel')
+def predictions_panel():
+    current_month = datetime.now().strftime("%Y-%m")
+    totals = cached_read(get_dashboard_totals, current_month)
+    monthly_expenses = totals['monthly_expenses']
+    monthly_income = totals['monthly_income']
+    monthly_savings = monthly_income - monthly_expenses
+    budget_limit = cached_read(get_budget, current_month)
+
+    col1, col2 = st.columns(2)
+
+    with col1:
+        predicted_spending = predict_spending()
+        predicted_income = predict_income()
+        predicted_savings = predicted_income - predicted_spending
+
+        st.markdown(create_metric_card(
+            "🔮 Predicted Spending (Next Month)",
+            f"${predicted_spending:,.2f}",
+            f"Based on {totals['expense_count']} transactions" if totals['expense_count'] else "Add more data for accuracy"
+        ), unsafe_allow_html=True)
+
+        st.markdown(create_metric_card(
+            "💰 Predicted Income (Next Month)",
+            f"${predicted_income:,.2f}",
+            f"Based on {totals['income_count']} records" if totals['income_count'] else "Add more data for accuracy"
+        ), unsafe_allow_html=True)
+
+    with col2:
+        st.markdown(create_metric_card(
+            "💎 Predicted Savings",
+            f"${predicted_savings:,.2f}",
+            "🎯 Excellent!" if predicted_savings > 0 else "⚠️ Consider reducing expenses"
+        ), unsafe_allow_html=True)
+
+        # AI Recommendations
+        st.markdown("""
+            <div style="
+                background: linear-gradient(135deg, rgba(139,92,246,0.1) 0%, rgba(59,130,246,0.1) 100%);
+                border: 1px solid rgba(139,92,246,0.3);
+                border-radius: 16px;
+                padding: 1.5rem;
+                margin: 1rem 0;
+            ">
+                <h4 style="color: #8B5CF6; margin: 0 0 1rem 0;">💡 AI Recommendations</h4>
+        """, unsafe_allow_html=True)
+
+        # Generate recommendations based on data
+        recommendations = []
+        if monthly_expenses > monthly_income:
+            recommendations.append("🔴 Reduce expenses by focusing on your largest spending categories")
+        if monthly_savings < monthly_income * 0.2:
+            recommendations.append("🟡 Try to save at least 20% of your income")
+        if budget_limit and monthly_expenses > budget_limit * 0.8:
+            recommendations.append("🟡 You're approaching your budget limit - monitor spending carefully")
+        if not recommendations:
+            recommendations.append("🟢 Your financial habits look healthy - keep it up!")
+
+        for rec in recommendations:
+            st.markdown(f"<p style='margin: 0.5rem 0; color: #D1D5DB;'>• {rec}</p>", unsafe_allow_html=True)
+
+        st.markdown("</div>", unsafe_allow_html=True)
+
+
+@st.fragment(key='assistant_panel')
+@section('assistant_panel')
+def assistant_panel():
+    user_question = st.text_input(
+        "💬 Ask your AI assistant anything about finance:",
+        placeholder="e.g., How can I save more money? What's the best way to pay off debt?",
+        key="ai_question"
+    )
+
+    if user_question:
+        with st.container():
+            response = get_chatbot_response(user_question)
+            st.markdown(f"""
+                <div style="
+                    background: linear-gradient(135deg, rgba(59,130,246,0.1) 0%, rgba(16,185,129,0.1) 100%);
+                    border: 1px solid rgba(59,130,246,0.3);
+                    border-radius: 16px;
+                    padding: 1.5rem;
+                    margin: 1rem 0;
+                ">
+                    <div style="display: flex; align-items: center; margin-bottom: 0.5rem;">
+                        <span style="font-size: 1.5rem; margin-right: 0.5rem;">🤖</span>
+                        <strong style="color: #3B82F6;">AI Assistant</strong>
+                    </div>
+                    <p style="margin: 0; color: #D1D5DB; line-height: 1.6;">{response}</p>
+                </div>
+            """, unsafe_allow_html=True)
+
+
+def _history_first():
+    st.session_state["history_cursors"] = [None]
+
+
+def _history_prev():
+    st.session_state["history_cursors"].pop()
+
+
+def _history_next(cursor):
+    st.session_state["history_cursors"].append(cursor)
+
+
+@st.fragment(key='transactions_panel')
+@section('transactions_panel')
+def transactions_panel():
+    # Newest transactions across both tables, straight from the (day, id) indexes
+    all_recent = cached_read(get_recent_transactions, 10)
+    if not all_recent.empty:
+        for transaction in all_recent.itertuples(index=False):
+            st.markdown(create_transaction_row(transaction), unsafe_allow_html=True)
+    else:
+        st.info("💡 Start by adding some income and expenses to see your transaction history")
+
+    # Full history, one keyset page at a time; the cursor stack lets "Previous" step back.
+    with st.expander("📜 Full Transaction History", expanded=False):
+        cursors = st.session_state.setdefault("history_cursors", [None])
+        page, next_cursor = cached_read(get_transaction_page, cursors[-1], HISTORY_PAGE_SIZE)
+        for transaction in page.itertuples(index=False):
+            st.markdown(create_transaction_row(transaction), unsafe_allow_html=True)
+
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.button("⏮️ Newest", key="history_first", disabled=len(cursors) == 1, on_click=_history_first)
+        with col2:
+            st.button("◀️ Previous", key="history_prev", disabled=len(cursors) == 1, on_click=_history_prev)
+        with col3:
+            st.button("Next ▶️", key="history_next", disabled=next_cursor is None, on_click=_history_next,
+                      args=(next_cursor,))
+        st.caption(f"Page {len(cursors)}")
+
+
+def _export_download(export_format, pool):
+    # Streamlit calls this when the download is clicked, on a server thread outside the session,
+    # so the session's ledger is bound explicitly. Rows stream into a temporary file, not memory;
+    # Streamlit then reads that file once into the download it serves.
+    def build():
+        spool = tempfile.TemporaryFile()
+        with use_pool(pool):
+            export_to_file(spool, export_format)
+        spool.seek(0)
+        return spool
+    return build
+
+
+@st.fragment(key='export_panel')
+@section('export_panel')
+def export_panel():
+    col1, col2 = st.columns(2)
+    with col1:
+        export_format = st.selectbox("📁 Format", list(EXPORT_FORMATS), key="export_format")
+        if st.button("📊 Download Financial Report", key="download_csv"):
+            extension, mime = EXPORT_FORMATS[export_format]
+            try:
+                check_export_format(export_format)
+                has_rows = has_export_rows()
+            except RuntimeError as exc:
+                has_rows = None
+                st.error(f"⚠️ {exc}")
+            if has_rows:
+                st.download_button(
+                    label=f"💾 Download {extension.upper()} File",
+                    data=_export_download(export_format, current_pool()),
+                    file_name=f"financial_report_{datetime.now().strftime('%Y%m%d')}.{extension}",
+                    mime=mime,
+                    key="csv_download",
+                    on_click="ignore"
+                )
+                st.success("✅ Report ready for download!")
+            elif has_rows is False:
+                st.warning("⚠️ No data available to export")
+
+    with col2:
+        st.info("💡 Export as CSV for Excel or Google Sheets, gzipped CSV for large histories, or Parquet/Arrow "
+                "for pandas and other analytics tools")
+
+
+@st.fragment(key='debug_panel')
+def debug_panel():
+    traces = st.session_state.get('_debug_traces', [])
+    with st.expander("🛠️ Profiler", expanded=False):
+        st.button("↻ Refresh", key="debug_refresh", help="Show traces of fragment reruns since this panel last drew")
+        if not traces:
+            st.caption("No traces yet")
+            return
+        labels = [f"{run.started_at[11:19]} · {run.name} · {run.summary()['ms']:,.0f} ms" for run in traces]
+        index = st.selectbox("Run", range(len(traces)), format_func=labels.__getitem__, key="debug_trace")
+        run = traces[min(index, len(traces) - 1)]
+        summary = run.summary()
+        peak = f" · peak {summary['peak_kib'] / 1024:,.1f} MiB" if 'peak_kib' in summary else ""
+        st.caption(f"{summary['ms']:,.1f} ms · {summary['queries']} SQL statements in {summary['sql_ms']:,.1f} ms, "
+                   f"{summary['rows']:,} rows{peak}")
+
+        spans = pd.DataFrame(run.spans).sort_values('start_ms')
+        spans['section'] = ['\u2003' * depth + name for depth, name in zip(spans['depth'], spans['name'])]
+        columns = ['section', 'ms', 'self_ms'] + [col for col in ('mem_kib', 'peak_kib', 'error') if col in spans]
+        st.dataframe(spans[columns], hide_index=True, width='stretch')
+
+        if run.queries:
+            queries = (pd.DataFrame(run.queries).groupby('sql', sort=False)
+                       .agg(calls=('ms', 'size'), ms=('ms', 'sum'), rows=('rows', 'sum'), span=('span', 'first'))
+                       .sort_values('ms', ascending=False).reset_index())
+            st.dataframe(queries, hide_index=True, width='stretch')
 
 
-# Streamlit Dashboard with Premium UI
 def main():
+    with section('main'):
+        dashboard()
+    if debug_mode():
+        with st.sidebar:
+            debug_panel()
+
+
+def dashboard():
+    try:
+        tenant = session_tenant()
+    except ValueError as exc:
+        st.error(f"⚠️ {exc}")
+        st.stop()
     init_db()
 
     st.set_page_config(
@@ -239,6 +880,8 @@ def main():
         layout="wide",
         initial_sidebar_state="expanded"
     )
+    if WARM_IMPORTS:
+        warm_imports()
 
     # Premium CSS styling
     st.markdown("""
@@ -472,165 +1115,23 @@ def main():
                 <p style="color: #9CA3AF; font-size: 0.9rem; margin: 0.5rem 0 0 0;">Manage your finances</p>
             </div>
         """, unsafe_allow_html=True)
+        if tenant:
+            st.caption(f"👤 Ledger: {tenant}")
 
-        # Add Expense Section
-        with st.expander("💸 Add Expense", expanded=False):
-            st.markdown("**Record a new expense**")
-            date_exp = st.date_input("📅 Date", datetime.now(), key="expense_date")
-            amount_exp = st.number_input("💵 Amount ($)", min_value=0.0, format="%.2f", key="expense_amount")
-            category_exp = st.selectbox("🏷️ Category",
-                                        ["🛒 Groceries", "⚡ Utilities", "🎬 Entertainment", "✈️ Travel", "🏠 Housing",
-                                         "🚗 Transportation", "👕 Clothing", "🏥 Healthcare", "📚 Education", "🍽️ Dining",
-                                         "📱 Technology", "🔧 Other"],
-                                        key="expense_category")
-
-            if st.button("💾 Log Expense", key="add_expense"):
-                add_expense(date_exp.strftime('%Y-%m-%d'), amount_exp, category_exp)
-                st.success("✅ Expense logged successfully!")
-
-        # Add Income Section
-        with st.expander("💰 Add Income", expanded=False):
-            st.markdown("**Record new income**")
-            date_inc = st.date_input("📅 Date", datetime.now(), key="income_date")
-            amount_inc = st.number_input("💵 Amount ($)", min_value=0.0, format="%.2f", key="income_amount")
-            source_inc = st.selectbox("💼 Source",
-                                      ["💼 Salary", "🏢 Freelance", "📈 Investment", "🎁 Gift", "💸 Bonus", "🏠 Rental",
-                                       "💰 Side Hustle", "🔧 Other"],
-                                      key="income_source")
-
-            if st.button("💾 Log Income", key="add_income"):
-                add_income(date_inc.strftime('%Y-%m-%d'), amount_inc, source_inc)
-                st.success("✅ Income logged successfully!")
-
-        # Budget Section
-        with st.expander("🎯 Set Budget", expanded=False):
-            st.markdown("**Monthly budget planning**")
-            month = st.text_input("📆 Month (YYYY-MM)", datetime.now().strftime("%Y-%m"), key="budget_month")
-            budget_limit = st.number_input("🏦 Budget Limit ($)", min_value=0.0, format="%.2f", key="budget_limit")
-
-            if st.button("🎯 Set Budget", key="set_budget"):
-                set_budget(month, budget_limit)
-                st.success("✅ Budget set successfully!")
-
-        # Savings Goals Section
-        with st.expander("🎯 Savings Goals", expanded=False):
-            st.markdown("**Financial goal tracking**")
-
-            # Add new goal
-            st.markdown("**Create New Goal**")
-            goal_name = st.text_input("🎯 Goal Name", placeholder="e.g., Emergency Fund", key="goal_name")
-            target_amount = st.number_input("💰 Target Amount ($)", min_value=0.0, format="%.2f", key="target_amount")
-            target_date = st.date_input("📅 Target Date", datetime.now() + timedelta(days=365), key="target_date")
-
-            if st.button("🎯 Create Goal", key="add_goal"):
-                if goal_name and target_amount > 0:
-                    add_savings_goal(goal_name, target_amount, target_date.strftime('%Y-%m-%d'))
-                    st.success("✅ Goal created successfully!")
-                else:
-                    st.error("Please fill in all fields")
-
-            # Update existing goal
-            st.markdown("**Add to Existing Goal**")
-            goals_df = get_savings_goals()
-            if not goals_df.empty:
-                goal_to_update = st.selectbox("Select Goal", goals_df['goal_name'].tolist(), key="select_goal")
-                amount_to_add = st.number_input("💵 Amount to Add ($)", min_value=0.0, format="%.2f",
-                                                key="update_amount")
-
-                if st.button("➕ Add to Goal", key="add_to_goal"):
-                    if amount_to_add > 0:
-                        update_savings_goal(goal_to_update, amount_to_add)
-                        st.success(f"✅ Added ${amount_to_add:.2f} to {goal_to_update}!")
+        expense_form()
+        income_form()
+        budget_form()
+        goals_form()
+        import_form()
 
         # Sentiment Analysis Section
-        st.markdown("""
-            <div style="text-align: center; padding: 1rem 0; border-top: 1px solid rgba(139,92,246,0.3); margin-top: 1.5rem;">
-                <h3 style="color: #8B5CF6; margin: 0 0 0.5rem 0; font-weight: 600;">💭 Mood Tracker</h3>
-                <p style="color: #9CA3AF; font-size: 0.85rem; margin: 0;">How are you feeling about your finances?</p>
-            </div>
-        """, unsafe_allow_html=True)
-
-        user_text = st.text_area("✍️ Share your thoughts...",
-                                 placeholder="e.g., Feeling stressed about my spending this month...",
-                                 key="sentiment_text", height=100)
-
-        if st.button("🔍 Analyze Sentiment", key="analyze_sentiment"):
-            if user_text.strip():
-                sentiment = analyze_sentiment(user_text)
-                add_sentiment(datetime.now().strftime('%Y-%m-%d'), sentiment, "user")
-
-                # Enhanced sentiment feedback
-                if sentiment < -0.5:
-                    st.error(
-                        f"😰 Very Negative Sentiment ({sentiment:.2f}) - Consider speaking with a financial advisor")
-                elif sentiment < -0.1:
-                    st.warning(f"😕 Negative Sentiment ({sentiment:.2f}) - Focus on small wins and budgeting")
-                elif sentiment < 0.1:
-                    st.info(f"😐 Neutral Sentiment ({sentiment:.2f}) - Stay consistent with your financial habits")
-                elif sentiment < 0.5:
-                    st.success(f"😊 Positive Sentiment ({sentiment:.2f}) - Great mindset for financial growth!")
-                else:
-                    st.success(f"🎉 Very Positive Sentiment ({sentiment:.2f}) - Excellent financial confidence!")
+        mood_tracker()
 
     # Main Dashboard Content
     st.markdown('<div class="slide-up">', unsafe_allow_html=True)
 
     # Key Metrics Row
-    expenses_df = get_expenses()
-    income_df = get_income()
-    current_month = datetime.now().strftime("%Y-%m")
-
-    # Calculate key metrics
-    if not expenses_df.empty:
-        monthly_expenses = expenses_df[pd.to_datetime(expenses_df['date']).dt.strftime("%Y-%m") == current_month][
-            'amount'].sum()
-        total_expenses = expenses_df['amount'].sum()
-    else:
-        monthly_expenses = 0
-        total_expenses = 0
-
-    if not income_df.empty:
-        monthly_income = income_df[pd.to_datetime(income_df['date']).dt.strftime("%Y-%m") == current_month][
-            'amount'].sum()
-        total_income = income_df['amount'].sum()
-    else:
-        monthly_income = 0
-        total_income = 0
-
-    net_worth = total_income - total_expenses
-    monthly_savings = monthly_income - monthly_expenses
-
-    # Display key metrics
-    col1, col2, col3, col4 = st.columns(4)
-
-    with col1:
-        st.markdown(create_metric_card(
-            "💰 Monthly Income",
-            f"${monthly_income:,.2f}",
-            f"+${monthly_income - (monthly_income * 0.9):,.2f}" if monthly_income > 0 else None
-        ), unsafe_allow_html=True)
-
-    with col2:
-        st.markdown(create_metric_card(
-            "💸 Monthly Expenses",
-            f"${monthly_expenses:,.2f}",
-            f"+${monthly_expenses - (monthly_expenses * 0.9):,.2f}" if monthly_expenses > 0 else None,
-            "inverse" if monthly_expenses > monthly_income else "normal"
-        ), unsafe_allow_html=True)
-
-    with col3:
-        st.markdown(create_metric_card(
-            "💎 Monthly Savings",
-            f"${monthly_savings:,.2f}",
-            "🎯 Great job!" if monthly_savings > 0 else "⚠️ Overspending"
-        ), unsafe_allow_html=True)
-
-    with col4:
-        st.markdown(create_metric_card(
-            "🏦 Net Worth",
-            f"${net_worth:,.2f}",
-            "📈 Growing" if net_worth > 0 else "📉 Deficit"
-        ), unsafe_allow_html=True)
+    metrics_panel()
 
     # Charts Section
     st.markdown("""
@@ -641,130 +1142,7 @@ def main():
         </div>
     """, unsafe_allow_html=True)
 
-    # Charts Row 1
-    col1, col2 = st.columns(2)
-
-    with col1:
-        st.markdown('<div class="chart-container">', unsafe_allow_html=True)
-        if not expenses_df.empty:
-            st.markdown("### 🍕 Expense Distribution")
-            # Clean category names for display
-            expenses_display = expenses_df.copy()
-            expenses_display['category'] = expenses_display['category'].str.replace(r'[🛒⚡🎬✈️🏠🚗👕🏥📚🍽️📱🔧]', '',
-                                                                                    regex=True).str.strip()
-
-            fig_pie = px.pie(
-                expenses_display,
-                names="category",
-                values="amount",
-                title="",
-                color_discrete_sequence=px.colors.qualitative.Set3,
-                hole=0.4
-            )
-            fig_pie.update_layout(
-                paper_bgcolor='rgba(0,0,0,0)',
-                plot_bgcolor='rgba(0,0,0,0)',
-                font=dict(color='white', size=12),
-                showlegend=True,
-                legend=dict(orientation="v", x=1.05, y=0.5)
-            )
-            st.plotly_chart(fig_pie, use_container_width=True)
-        else:
-            st.info("💡 Add some expenses to see the distribution chart")
-        st.markdown('</div>', unsafe_allow_html=True)
-
-    with col2:
-        st.markdown('<div class="chart-container">', unsafe_allow_html=True)
-        if not income_df.empty:
-            st.markdown("### 💰 Income Sources")
-            income_display = income_df.copy()
-            income_display['source'] = income_display['source'].str.replace(r'[💼🏢📈🎁💸🏠💰🔧]', '', regex=True).str.strip()
-
-            fig_income = px.bar(
-                income_display.groupby('source')['amount'].sum().reset_index(),
-                x='source',
-                y='amount',
-                title="",
-                color='amount',
-                color_continuous_scale='Viridis'
-            )
-            fig_income.update_layout(
-                paper_bgcolor='rgba(0,0,0,0)',
-                plot_bgcolor='rgba(0,0,0,0)',
-                font=dict(color='white', size=12),
-                xaxis=dict(showgrid=False, color='white'),
-                yaxis=dict(showgrid=True, gridcolor='rgba(255,255,255,0.1)', color='white'),
-                showlegend=False
-            )
-            st.plotly_chart(fig_income, use_container_width=True)
-        else:
-            st.info("💡 Add some income to see the sources chart")
-        st.markdown('</div>', unsafe_allow_html=True)
-
-    # Charts Row 2
-    col1, col2 = st.columns(2)
-
-    with col1:
-        st.markdown('<div class="chart-container">', unsafe_allow_html=True)
-        if not expenses_df.empty:
-            st.markdown("### 📈 Spending Trends")
-            expenses_time = expenses_df.copy()
-            expenses_time['date'] = pd.to_datetime(expenses_time['date'])
-            expenses_time['month'] = expenses_time['date'].dt.to_period('M')
-            monthly_spending = expenses_time.groupby('month')['amount'].sum().reset_index()
-            monthly_spending['month'] = monthly_spending['month'].astype(str)
-
-            fig_trend = px.line(
-                monthly_spending,
-                x='month',
-                y='amount',
-                title="",
-                markers=True,
-                line_shape='spline'
-            )
-            fig_trend.update_traces(
-                line=dict(color='#8B5CF6', width=3),
-                marker=dict(size=8, color='#3B82F6')
-            )
-            fig_trend.update_layout(
-                paper_bgcolor='rgba(0,0,0,0)',
-                plot_bgcolor='rgba(0,0,0,0)',
-                font=dict(color='white', size=12),
-                xaxis=dict(showgrid=False, color='white'),
-                yaxis=dict(showgrid=True, gridcolor='rgba(255,255,255,0.1)', color='white')
-            )
-            st.plotly_chart(fig_trend, use_container_width=True)
-        else:
-            st.info("💡 Add expenses over time to see spending trends")
-        st.markdown('</div>', unsafe_allow_html=True)
-
-    with col2:
-        st.markdown('<div class="chart-container">', unsafe_allow_html=True)
-        st.markdown("### 🎯 Savings Goals Progress")
-        goals_df = get_savings_goals()
-        if not goals_df.empty:
-            for _, goal in goals_df.iterrows():
-                progress = min(goal['current_amount'] / goal['target_amount'], 1.0) * 100
-                days_left = (pd.to_datetime(goal['target_date']) - datetime.now()).days
-
-                # Progress bar with custom styling
-                st.markdown(f"""
-                    <div style="margin: 1rem 0; padding: 1rem; background: rgba(255,255,255,0.05); border-radius: 12px; border: 1px solid rgba(139,92,246,0.2);">
-                        <div style="display: flex; justify-content: space-between; margin-bottom: 0.5rem;">
-                            <span style="font-weight: 600; color: #8B5CF6;">{goal['goal_name']}</span>
-                            <span style="color: #D1D5DB;">${goal['current_amount']:,.0f} / ${goal['target_amount']:,.0f}</span>
-                        </div>
-                        <div style="background: rgba(255,255,255,0.1); border-radius: 8px; height: 8px; overflow: hidden;">
-                            <div style="background: linear-gradient(135deg, #8B5CF6 0%, #3B82F6 100%); height: 100%; width: {progress}%; transition: width 0.3s ease;"></div>
-                        </div>
-                        <div style="margin-top: 0.5rem; font-size: 0.85rem; color: #9CA3AF;">
-                            {progress:.1f}% complete • {days_left} days remaining
-                        </div>
-                    </div>
-                """, unsafe_allow_html=True)
-        else:
-            st.info("💡 Set up savings goals to track your progress")
-        st.markdown('</div>', unsafe_allow_html=True)
+    charts_panel()
 
     # Budget Analysis Section
     st.markdown("""
@@ -775,36 +1153,7 @@ def main():
         </div>
     """, unsafe_allow_html=True)
 
-    budget_limit = get_budget(current_month)
-    if budget_limit is not None:
-        budget_used = (monthly_expenses / budget_limit) * 100 if budget_limit > 0 else 0
-        remaining_budget = budget_limit - monthly_expenses
-
-        col1, col2, col3 = st.columns(3)
-
-        with col1:
-            st.markdown(create_metric_card(
-                "🏦 Monthly Budget",
-                f"${budget_limit:,.2f}",
-                "Set for this month"
-            ), unsafe_allow_html=True)
-
-        with col2:
-            color = "normal" if budget_used <= 80 else "inverse"
-            st.markdown(create_metric_card(
-                "📊 Budget Used",
-                f"{budget_used:.1f}%",
-                "🟢 On track" if budget_used <= 80 else "🔴 Over budget" if budget_used > 100 else "🟡 Close to limit"
-            ), unsafe_allow_html=True)
-
-        with col3:
-            st.markdown(create_metric_card(
-                "💰 Remaining Budget",
-                f"${remaining_budget:,.2f}",
-                "Available to spend" if remaining_budget > 0 else "Overspent!"
-            ), unsafe_allow_html=True)
-    else:
-        st.info("💡 Set a monthly budget to see detailed analysis and insights")
+    budget_panel()
 
     # AI Predictions Section
     st.markdown("""
@@ -815,59 +1164,7 @@ def main():
         </div>
     """, unsafe_allow_html=True)
 
-    col1, col2 = st.columns(2)
-
-    with col1:
-        predicted_spending = predict_spending()
-        predicted_income = predict_income()
-        predicted_savings = predicted_income - predicted_spending
-
-        st.markdown(create_metric_card(
-            "🔮 Predicted Spending (Next Month)",
-            f"${predicted_spending:,.2f}",
-            f"Based on {len(expenses_df)} transactions" if not expenses_df.empty else "Add more data for accuracy"
-        ), unsafe_allow_html=True)
-
-        st.markdown(create_metric_card(
-            "💰 Predicted Income (Next Month)",
-            f"${predicted_income:,.2f}",
-            f"Based on {len(income_df)} records" if not income_df.empty else "Add more data for accuracy"
-        ), unsafe_allow_html=True)
-
-    with col2:
-        st.markdown(create_metric_card(
-            "💎 Predicted Savings",
-            f"${predicted_savings:,.2f}",
-            "🎯 Excellent!" if predicted_savings > 0 else "⚠️ Consider reducing expenses"
-        ), unsafe_allow_html=True)
-
-        # AI Recommendations
-        st.markdown("""
-            <div style="
-                background: linear-gradient(135deg, rgba(139,92,246,0.1) 0%, rgba(59,130,246,0.1) 100%);
-                border: 1px solid rgba(139,92,246,0.3);
-                border-radius: 16px;
-                padding: 1.5rem;
-                margin: 1rem 0;
-            ">
-                <h4 style="color: #8B5CF6; margin: 0 0 1rem 0;">💡 AI Recommendations</h4>
-        """, unsafe_allow_html=True)
-
-        # Generate recommendations based on data
-        recommendations = []
-        if monthly_expenses > monthly_income:
-            recommendations.append("🔴 Reduce expenses by focusing on your largest spending categories")
-        if monthly_savings < monthly_income * 0.2:
-            recommendations.append("🟡 Try to save at least 20% of your income")
-        if budget_limit and monthly_expenses > budget_limit * 0.8:
-            recommendations.append("🟡 You're approaching your budget limit - monitor spending carefully")
-        if not recommendations:
-            recommendations.append("🟢 Your financial habits look healthy - keep it up!")
-
-        for rec in recommendations:
-            st.markdown(f"<p style='margin: 0.5rem 0; color: #D1D5DB;'>• {rec}</p>", unsafe_allow_html=True)
-
-        st.markdown("</div>", unsafe_allow_html=True)
+    predictions_panel()
 
     # Interactive AI Assistant
     st.markdown("""
@@ -878,30 +1175,7 @@ def main():
         </div>
     """, unsafe_allow_html=True)
 
-    user_question = st.text_input(
-        "💬 Ask your AI assistant anything about finance:",
-        placeholder="e.g., How can I save more money? What's the best way to pay off debt?",
-        key="ai_question"
-    )
-
-    if user_question:
-        with st.container():
-            response = get_chatbot_response(user_question)
-            st.markdown(f"""
-                <div style="
-                    background: linear-gradient(135deg, rgba(59,130,246,0.1) 0%, rgba(16,185,129,0.1) 100%);
-                    border: 1px solid rgba(59,130,246,0.3);
-                    border-radius: 16px;
-                    padding: 1.5rem;
-                    margin: 1rem 0;
-                ">
-                    <div style="display: flex; align-items: center; margin-bottom: 0.5rem;">
-                        <span style="font-size: 1.5rem; margin-right: 0.5rem;">🤖</span>
-                        <strong style="color: #3B82F6;">AI Assistant</strong>
-                    </div>
-                    <p style="margin: 0; color: #D1D5DB; line-height: 1.6;">{response}</p>
-                </div>
-            """, unsafe_allow_html=True)
+    assistant_panel()
 
     # Recent Transactions
     st.markdown("""
@@ -912,55 +1186,7 @@ def main():
         </div>
     """, unsafe_allow_html=True)
 
-    # Combine and display recent transactions
-    recent_transactions = []
-    if not expenses_df.empty:
-        recent_expenses = expenses_df.tail(5).copy()
-        recent_expenses['Type'] = '💸 Expense'
-        recent_expenses['Description'] = recent_expenses['category']
-        recent_transactions.append(recent_expenses[['date', 'amount', 'Description', 'Type']])
-
-    if not income_df.empty:
-        recent_income = income_df.tail(5).copy()
-        recent_income['Type'] = '💰 Income'
-        recent_income['Description'] = recent_income['source']
-        recent_transactions.append(recent_income[['date', 'amount', 'Description', 'Type']])
-
-    if recent_transactions:
-        all_recent = pd.concat(recent_transactions, ignore_index=True)
-        all_recent['date'] = pd.to_datetime(all_recent['date'])
-        all_recent = all_recent.sort_values('date', ascending=False).head(10)
-
-        # Display in a styled format
-        for _, transaction in all_recent.iterrows():
-            amount_color = "#10B981" if "Income" in transaction['Type'] else "#EF4444"
-            amount_prefix = "+" if "Income" in transaction['Type'] else "-"
-
-            st.markdown(f"""
-                <div style="
-                    display: flex;
-                    justify-content: space-between;
-                    align-items: center;
-                    background: rgba(255,255,255,0.05);
-                    border: 1px solid rgba(255,255,255,0.1);
-                    border-radius: 12px;
-                    padding: 1rem;
-                    margin: 0.5rem 0;
-                ">
-                    <div style="display: flex; align-items: center;">
-                        <span style="margin-right: 1rem;">{transaction['Type']}</span>
-                        <div>
-                            <div style="font-weight: 600; color: white;">{transaction['Description']}</div>
-                            <div style="font-size: 0.85rem; color: #9CA3AF;">{transaction['date'].strftime('%B %d, %Y')}</div>
-                        </div>
-                    </div>
-                    <div style="font-weight: 700; font-size: 1.1rem; color: {amount_color};">
-                        {amount_prefix}${transaction['amount']:,.2f}
-                    </div>
-                </div>
-            """, unsafe_allow_html=True)
-    else:
-        st.info("💡 Start by adding some income and expenses to see your transaction history")
+    transactions_panel()
 
     # Export Section
     st.markdown("""
@@ -971,24 +1197,7 @@ def main():
         </div>
     """, unsafe_allow_html=True)
 
-    col1, col2 = st.columns(2)
-    with col1:
-        if st.button("📊 Download Financial Report (CSV)", key="download_csv"):
-            csv_data = export_data()
-            if csv_data != "No data to export":
-                st.download_button(
-                    label="💾 Download CSV File",
-                    data=csv_data,
-                    file_name=f"financial_report_{datetime.now().strftime('%Y%m%d')}.csv",
-                    mime="text/csv",
-                    key="csv_download"
-                )
-                st.success("✅ Report ready for download!")
-            else:
-                st.warning("⚠️ No data available to export")
-
-    with col2:
-        st.info("💡 Your financial data will be exported in CSV format, perfect for Excel or Google Sheets analysis")
+    export_panel()
 
     st.markdown('</div>', unsafe_allow_html=True)
 
@@ -1013,4 +1222,16 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    command = sys.argv[1] if len(sys.argv) > 1 else None
+    if command == 'rebuild-rollup':
+        init_db()
+        print(f"Rebuilt monthly_rollup: {rebuild_monthly_rollup()} rows in {get_db_path()}")
+    elif command == 'import':
+        init_db()
+        for path in sys.argv[2:]:
+            report = import_csv(path)
+            print(f"{path}: {report['rows_read']:,} rows read, {report['inserted']:,} inserted, "
+                  f"{report['duplicates']:,} duplicates, {report['rejected']:,} rejected "
+                  f"in {report['seconds']:.2f}s ({report['rows_per_second']:,.0f} rows/s)")
+    else:
+        main()
\ No newline at end of file
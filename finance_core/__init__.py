@@ -0,0 +1,38 @@
+"""Headless core of the finance assistant: everything the dashboard does except drawing it.
+
+Importing it pulls in pandas and numpy only (scikit-learn, TextBlob and pyarrow load on first
+use), so scripts, batch jobs and other frontends can use the same storage, aggregates,
+forecasts and export as the Streamlit app without importing Streamlit.
+
+    import finance_core as fc
+    fc.configure_db('alice.db')
+    fc.init_db()
+    fc.build_report('2024-05')
+"""
+from .aggregates import (HISTORY_PAGE_SIZE, TRANSACTION_TYPES, get_category_totals, get_dashboard_totals,
+                         get_group_totals, get_monthly_rollup, get_monthly_total, get_recent_transactions,
+                         get_source_totals, get_total, get_transaction_page, rebuild_monthly_rollup)
+from .backtest import BACKTEST_MIN_TRAIN, BACKTEST_MODELS, backtest, backtest_summary, monthly_features
+from .charts import CHART_MAX_POINTS, expense_pie_figure, income_bar_figure, lttb, spending_trend_figure
+from .chatbot import get_chatbot_response
+from .export import (EXPORT_CHUNK_SIZE, EXPORT_COLUMNS, EXPORT_FORMATS, check_export_format, export_data, export_to_file,
+                     has_export_rows, iter_export_chunks)
+from .forecasts import (FORECAST_MODE, FORECAST_SEASONAL_MIN_MONTHS, MODEL_CACHE_DIR, MODEL_CACHE_MAX_ENTRIES, ModelCache,
+                        forecast_all, get_forecasts, load_monthly_matrix, model_cache, predict_income, predict_spending,
+                        refit_online_forecasts)
+from .ingest import IMPORT_CHUNK_SIZE, bulk_insert, import_csv
+from .profiling import PROFILE_LOG, PROFILE_MEMORY, Trace, current_trace, profiled, span, trace
+from .report import build_report
+from .sentiment import analyze_sentiment
+from .snapshot import (SNAPSHOT_MAX_LEDGERS, LedgerSnapshot, clear_snapshots, get_snapshot, snapshot_group_totals,
+                       snapshot_stats)
+from .storage import (DB_POOL_SIZE, EPOCH_ORDINAL, EXPENSE_CATEGORIES, INCOME_SOURCES, LABEL_TABLES,
+                      QUERY_CHUNK_SIZE, SCHEMA_VERSION, TRANSACTION_TABLES, VERSIONED_TABLES, WRITE_TIMEOUT,
+                      ConnectionPool, WriteQueue, add_expense, add_income, add_savings_goal, add_sentiment, close_db,
+                      configure_db, current_pool, flush_writes, get_budget, get_connection, get_data_version,
+                      get_db_path, get_expenses, get_income, get_label_ids, get_labels, get_savings_goals,
+                      get_schema_version, get_streaming_connection, get_table_versions, init_db, migrate, pool_stats,
+                      query_transactions, set_budget, set_pool_resolver, submit_write, to_cents, to_day,
+                      update_savings_goal, use_pool, write_queue_stats)
+from .tenants import (TENANT_DIR, ShardRegistry, admin_totals, check_tenant_id, shard_stats, shards, tenant_pool,
+                      use_tenant)
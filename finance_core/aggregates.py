@@ -0,0 +1,165 @@
+"""Aggregates over the monthly rollup and raw transactions, and keyset-paged history."""
+from datetime import datetime
+
+import pandas as pd
+
+from .profiling import profiled
+from .storage import (LABEL_TABLES, ROLLUP_TYPES, TRANSACTION_TABLES, _check_table, _label_key,
+                      _rebuild_monthly_rollup, _transaction_filter, get_connection, to_day)
+
+
+# Aggregate Queries
+def _month_range(month):
+    # 'YYYY-MM' -> half-open day-number range, so the filter is an index range scan on day
+    start = datetime.strptime(month, "%Y-%m")
+    end = datetime(start.year + start.month // 12, start.month % 12 + 1, 1)
+    return to_day(start), to_day(end)
+
+
+@profiled
+def rebuild_monthly_rollup():
+    # Regenerates the rollup from raw transactions, e.g. after editing the database by hand.
+    with get_connection() as conn:
+        return _rebuild_monthly_rollup(conn)
+
+
+@profiled
+def get_monthly_rollup(table, by_category=False, start_month=None, end_month=None):
+    # start_month/end_month are inclusive 'YYYY-MM' bounds
+    _check_table(table)
+    group = "month, r.label_id" if by_category else "month"
+    label = "IFNULL(l.name, '') AS category, " if by_category else ""
+    where, params = "WHERE type = ?", [ROLLUP_TYPES[table]]
+    if start_month:
+        where += " AND month >= ?"
+        params.append(start_month)
+    if end_month:
+        where += " AND month <= ?"
+        params.append(end_month)
+    with get_connection() as conn:
+        df = pd.read_sql_query(
+            f"SELECT month, {label}SUM(total_cents) / 100.0 AS amount, SUM(count) AS count, "
+            f"MIN(min_cents) / 100.0 AS min_amount, MAX(max_cents) / 100.0 AS max_amount "
+            f"FROM monthly_rollup r LEFT JOIN {LABEL_TABLES[table]} l ON l.id = r.label_id "
+            f"{where} GROUP BY {group} ORDER BY month{', category' if by_category else ''}",
+            conn, params=params)
+    return df
+
+
+@profiled
+def get_monthly_total(table, month):
+    _check_table(table)
+    start, end = _month_range(month)
+    with get_connection() as conn:
+        row = conn.execute(f"SELECT COALESCE(SUM(amount_cents), 0) FROM {table} WHERE day >= ? AND day < ?",
+                           (start, end)).fetchone()
+    return row[0] / 100
+
+
+@profiled
+def get_total(table):
+    _check_table(table)
+    with get_connection() as conn:
+        row = conn.execute(f"SELECT COALESCE(SUM(amount_cents), 0) FROM {table}").fetchone()
+    return row[0] / 100
+
+
+@profiled
+def get_group_totals(table, month=None, **filters):
+    # filters are those of query_transactions (start, end, labels, min_amount, max_amount).
+    # Sums are grouped on the integer label key; names, display names and icons join on afterwards.
+    group_col = _check_table(table)
+    key = _label_key(table)
+    if month:
+        filters['start'], filters['end'] = _month_range(month)
+    where, params = _transaction_filter(table, **filters)
+    with get_connection() as conn:
+        df = pd.read_sql_query(
+            f"SELECT l.name AS {group_col}, l.display_name, l.icon, t.amount, t.count "
+            f"FROM (SELECT {key}, SUM(amount_cents) / 100.0 AS amount, COUNT(*) AS count FROM {table}{where} "
+            f"GROUP BY {key}) t LEFT JOIN {LABEL_TABLES[table]} l ON l.id = t.{key} "
+            f"ORDER BY t.amount DESC", conn, params=params)
+    return df
+
+
+def get_category_totals(month=None, **filters):
+    return get_group_totals('expenses', month, **filters)
+
+
+def get_source_totals(month=None, **filters):
+    return get_group_totals('income', month, **filters)
+
+
+@profiled
+def get_dashboard_totals(month):
+    # Everything the metric cards need in one round trip: monthly and all-time sums plus row counts.
+    start, end = _month_range(month)
+    with get_connection() as conn:
+        row = conn.execute('''
+            SELECT
+                (SELECT COALESCE(SUM(amount_cents), 0) FROM expenses WHERE day >= ? AND day < ?),
+                (SELECT COALESCE(SUM(amount_cents), 0) FROM expenses),
+                (SELECT COUNT(*) FROM expenses),
+                (SELECT COALESCE(SUM(amount_cents), 0) FROM income WHERE day >= ? AND day < ?),
+                (SELECT COALESCE(SUM(amount_cents), 0) FROM income),
+                (SELECT COUNT(*) FROM income)
+        ''', (start, end, start, end)).fetchone()
+    monthly_expenses, total_expenses, expense_count, monthly_income, total_income, income_count = row
+    return {
+        'monthly_expenses': monthly_expenses / 100, 'total_expenses': total_expenses / 100,
+        'expense_count': expense_count,
+        'monthly_income': monthly_income / 100, 'total_income': total_income / 100,
+        'income_count': income_count,
+    }
+
+
+# Transaction History
+# Newest first by (date, id, type). Each side is read backwards along its (day, id) index and
+# SQLite merges the two streams, so a page costs O(page size) however deep it is.
+HISTORY_PAGE_SIZE = 25
+TRANSACTION_TYPES = {'expenses': 'Expense', 'income': 'Income'}
+
+
+def _history_query(cursor):
+    parts, params = [], []
+    for table in TRANSACTION_TABLES:
+        row_type = TRANSACTION_TYPES[table]
+        where = ""
+        if cursor is not None:
+            day, row_id, cursor_type = cursor
+            # Rows equal on (day, id) sort by type descending, so this side still has a row at the
+            # cursor position only if its type sorts below the cursor's.
+            op = "<=" if row_type < cursor_type else "<"
+            where = f"WHERE (day, id) {op} (?, ?)"
+            params += [day, row_id]
+        label = f"(SELECT name FROM {LABEL_TABLES[table]} WHERE id = {_label_key(table)})"
+        parts.append(f"SELECT day, id, amount_cents, {label} AS label, '{row_type}' AS type FROM {table} {where}")
+    return " UNION ALL ".join(parts) + " ORDER BY day DESC, id DESC, type DESC LIMIT ?", params
+
+
+def _history_frame(rows):
+    df = pd.DataFrame(rows, columns=['day', 'id', 'amount_cents', 'label', 'type'])
+    df.insert(0, 'date', pd.to_datetime(df.pop('day').astype('int64'), unit='D'))
+    df['amount'] = df['amount_cents'].astype('int64') / 100
+    return df
+
+
+@profiled
+def get_recent_transactions(limit=10):
+    query, params = _history_query(None)
+    with get_connection() as conn:
+        rows = conn.execute(query, params + [limit]).fetchall()
+    return _history_frame(rows)
+
+
+@profiled
+def get_transaction_page(cursor=None, page_size=HISTORY_PAGE_SIZE):
+    # Keyset pagination: `cursor` is the (day, id, type) of the last row of the previous page
+    # (None for the first page). Returns the page and the cursor for the next one, or None at the end.
+    query, params = _history_query(cursor)
+    with get_connection() as conn:
+        rows = conn.execute(query, params + [page_size + 1]).fetchall()
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    next_cursor = (rows[-1][0], rows[-1][1], rows[-1][4]) if has_more else None
+    return _history_frame(rows), next_cursor
@@ -0,0 +1,192 @@
+"""Rolling-origin backtests of the forecasting models: accuracy and fit/predict latency per model."""
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from .aggregates import ROLLUP_TYPES
+from .forecasts import (_fit_holt_winters, _fit_random_forest, _fit_trend, _forecast_design, _month_label,
+                        _online_predict, load_monthly_matrix)
+from .profiling import profiled
+from .storage import TRANSACTION_TABLES
+
+# Backtesting
+# History is replayed month by month: at every origin each model is fitted on the monthly
+# totals up to and including that month and forecasts the next `horizon` months, which are
+# scored against what was actually recorded. The monthly totals and the features derived from
+# them are computed once and handed to every worker process when it starts, so a fold only
+# slices arrays. Folds are spread over a process pool, interleaved so that every worker gets a
+# similar mix of short and long histories.
+BACKTEST_MIN_TRAIN = 12
+
+
+def _random_forest_fit(features, y, end):
+    # The model behind predict_spending() and predict_income().
+    return _fit_random_forest(features['calendar'].iloc[:end], y[:end])
+
+
+def _random_forest_predict(model, features, targets):
+    return model.predict(features['calendar'].iloc[targets])
+
+
+def _engine_fit(features, y, end):
+    # The trend and month-of-year fit forecast_all() runs for every series at once.
+    months = features['months'][:end]
+    X, coef, seasonal = _fit_trend(months, y[:end, None])
+    return months[0], seasonal, X.shape[1], coef
+
+
+def _engine_predict(state, features, targets):
+    first_month, seasonal, width, coef = state
+    X = _forecast_design(features['months'][targets], first_month, seasonal)[:, :width]
+    return np.clip(X @ coef, 0, None)[:, 0]
+
+
+def _holt_winters_fit(features, y, end):
+    # The full refit of the online mode (FINANCE_FORECAST_MODE=online); between refits it only
+    # folds in each month as it closes.
+    return _fit_holt_winters(int(features['months'][0]), y[:end])
+
+
+def _holt_winters_predict(state, features, targets):
+    return np.array([_online_predict(state, month) for month in features['months'][targets].tolist()])
+
+
+def _history(features, y, end):
+    return y[:end]
+
+
+def _last_month_predict(history, features, targets):
+    return np.full(len(targets), history[-1])
+
+
+def _seasonal_naive_predict(history, features, targets):
+    # The same month a year earlier; with less than a year of history, the last month.
+    year_ago = targets - 12
+    return np.where(year_ago >= 0, history[np.maximum(year_ago, 0)], history[-1])
+
+
+def _mean_12_predict(history, features, targets):
+    return np.full(len(targets), history[-12:].mean())
+
+
+# model name -> (fit(features, monthly totals, training months) -> state, predict(state, features, months))
+BACKTEST_MODELS = {
+    'random_forest': (_random_forest_fit, _random_forest_predict),
+    'engine': (_engine_fit, _engine_predict),
+    'holt_winters': (_holt_winters_fit, _holt_winters_predict),
+    'seasonal_naive': (_history, _seasonal_naive_predict),
+    'last_month': (_history, _last_month_predict),
+    'mean_12': (_history, _mean_12_predict),
+}
+
+
+@profiled
+def monthly_features(until=None):
+    # Monthly totals per table (0 for a month without rows) and the features every model needs;
+    # None when there is no history.
+    matrix = load_monthly_matrix(until)
+    if matrix.empty:
+        return None
+    months = np.asarray(matrix.columns, dtype=np.int64)
+    types = matrix.index.get_level_values('type')
+    is_total = matrix.index.get_level_values('category').isna()
+    values = matrix.to_numpy(dtype=np.float64)
+    totals = {}
+    for table in TRANSACTION_TABLES:
+        rows = values[(types == ROLLUP_TYPES[table]) & is_total]
+        totals[table] = rows[0] if len(rows) else np.zeros(len(months))
+    return {
+        'months': months,
+        'labels': [_month_label(month) for month in months],
+        'calendar': pd.DataFrame({'year': months // 12, 'month': months % 12 + 1}),
+        'totals': totals,
+    }
+
+
+_worker_features = None
+
+
+def _start_worker(features, models):
+    global _worker_features
+    _worker_features = features
+    if 'random_forest' in models:
+        import sklearn.ensemble  # noqa: F401  imported before the first fold, not timed with it
+
+
+def _run_folds(model, ends, horizon, features=None):
+    # One record per table, origin and forecast month; ends are training lengths in months.
+    features = features or _worker_features
+    fit, predict = BACKTEST_MODELS[model]
+    n_months = len(features['months'])
+    records = []
+    for end in ends:
+        targets = np.arange(end, min(end + horizon, n_months))
+        for table, y in features['totals'].items():
+            started = time.perf_counter()
+            state = fit(features, y, end)
+            fitted = time.perf_counter()
+            forecasts = predict(state, features, targets)
+            done = time.perf_counter()
+            for step, (target, forecast) in enumerate(zip(targets.tolist(), forecasts.tolist()), 1):
+                records.append({
+                    'model': model, 'series': table, 'origin': features['labels'][end - 1], 'horizon': step,
+                    'month': features['labels'][target], 'actual': float(y[target]), 'forecast': float(forecast),
+                    'fit_ms': (fitted - started) * 1000, 'predict_ms': (done - fitted) * 1000,
+                })
+    return records
+
+
+@profiled
+def backtest(models=None, horizon=1, min_train=BACKTEST_MIN_TRAIN, last=None, workers=None, until=None):
+    # Replays the current database's history; returns one row per model, series, origin and
+    # forecast month. last limits the run to the latest `last` origins.
+    if not 1 <= horizon <= 12:
+        raise ValueError("horizon must be between 1 and 12 months")
+    models = list(models or BACKTEST_MODELS)
+    unknown = [model for model in models if model not in BACKTEST_MODELS]
+    if unknown:
+        raise ValueError(f"unknown model: {', '.join(unknown)}")
+    columns = ['model', 'series', 'origin', 'horizon', 'month', 'actual', 'forecast', 'fit_ms', 'predict_ms']
+    features = monthly_features(until)
+    if features is None:
+        return pd.DataFrame(columns=columns)
+    ends = list(range(max(min_train, 1), len(features['months'])))  # every origin with a month after it
+    if last:
+        ends = ends[-last:]
+    workers = max(1, min(workers or os.cpu_count() or 1, len(ends) or 1))
+
+    if workers == 1:
+        _start_worker(features, models)
+        records = [record for model in models for record in _run_folds(model, ends, horizon, features)]
+    else:
+        tasks = [(model, ends[offset::workers]) for model in models for offset in range(workers)]
+        with ProcessPoolExecutor(max_workers=workers, initializer=_start_worker,
+                                 initargs=(features, models)) as pool:
+            futures = [pool.submit(_run_folds, model, chunk, horizon) for model, chunk in tasks if chunk]
+            records = [record for future in futures for record in future.result()]
+    return pd.DataFrame.from_records(records, columns=columns).sort_values(
+        ['model', 'series', 'origin', 'horizon'], ignore_index=True)
+
+
+def backtest_summary(results):
+    # Per model and series: folds, MAE, MAPE (over months with a non-zero actual), bias and
+    # fit/predict latency percentiles per fold; sorted by series, then MAE.
+    columns = ['series', 'model', 'folds', 'mae', 'mape', 'bias', 'fit_ms_p50', 'fit_ms_p95', 'predict_ms_p50']
+    if results.empty:
+        return pd.DataFrame(columns=columns)
+    results = results.assign(error=results['forecast'] - results['actual'])
+    results['ape'] = (results['error'].abs() / results['actual'].where(results['actual'] > 0)) * 100
+    folds = results[results['horizon'] == 1].groupby(['series', 'model'])  # one latency sample per fit
+    summary = pd.DataFrame({
+        'folds': folds.size(),
+        'mae': results.groupby(['series', 'model'])['error'].apply(lambda error: error.abs().mean()),
+        'mape': results.groupby(['series', 'model'])['ape'].mean(),
+        'bias': results.groupby(['series', 'model'])['error'].mean(),
+        'fit_ms_p50': folds['fit_ms'].median(),
+        'fit_ms_p95': folds['fit_ms'].quantile(0.95),
+        'predict_ms_p50': folds['predict_ms'].median(),
+    }).reset_index()
+    return summary.sort_values(['series', 'mae'], ignore_index=True)[columns]
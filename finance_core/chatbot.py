@@ -0,0 +1,34 @@
+"""Rule-based answers to personal-finance questions."""
+from .profiling import profiled
+
+
+# Enhanced AI Chatbot with better responses
+@profiled
+def get_chatbot_response(user_input):
+    user_input = user_input.lower().strip()
+
+    # Savings advice
+    if any(word in user_input for word in ['save', 'saving', 'emergency fund']):
+        return "💡 Build an emergency fund first (3-6 months expenses), then save 20% of income. Automate transfers to savings accounts for consistency."
+
+    # Budget advice
+    elif any(word in user_input for word in ['budget', 'spending', 'expenses']):
+        return "📊 Follow the 50/30/20 rule: 50% needs, 30% wants, 20% savings. Track every expense and review monthly to identify spending patterns."
+
+    # Investment advice
+    elif 'invest' in user_input:
+        return "📈 Start with low-cost index funds or ETFs. Diversify across asset classes and invest consistently over time. Consider your risk tolerance and timeline."
+
+    # Debt management
+    elif any(word in user_input for word in ['debt', 'loan', 'credit']):
+        return "💳 Pay minimums on all debts, then focus extra payments on highest interest rate debt (avalanche method). Consider debt consolidation if beneficial."
+
+    # Retirement planning
+    elif any(word in user_input for word in ['retirement', '401k', 'pension']):
+        return "🏖️ Start early! Contribute enough to get employer match, then maximize tax-advantaged accounts. Aim to save 10-15% of income for retirement."
+
+    # General financial health
+    elif any(word in user_input for word in ['financial health', 'money management', 'financial tips']):
+        return "💪 Focus on: 1) Building emergency fund, 2) Paying off high-interest debt, 3) Budgeting effectively, 4) Investing for long-term goals, 5) Protecting with insurance."
+
+    return "🤖 I can help with saving strategies, budgeting tips, investment guidance, debt management, and retirement planning. What specific area interests you?"
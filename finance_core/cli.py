@@ -0,0 +1,210 @@
+"""Run core operations over many database files on a process pool and report throughput.
+
+    python -m finance_core report data/*.db --month 2024-05 --out reports/
+    python -m finance_core export data/ --format parquet --out exports/ --workers 8
+    python -m finance_core forecast data/*.db --horizon 6 --out forecasts/
+    python -m finance_core refit-forecasts tenants/
+    python -m finance_core migrate data/*.db
+    python -m finance_core rebuild-rollup data/*.db
+    python -m finance_core totals tenants/ --month 2024-05 --json
+
+Paths may be database files or directories (every *.db below them, e.g. a tenant shard
+directory). Each database is handled by one worker process start to finish, so databases
+never share a connection or a write lock.
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+from . import aggregates, export, forecasts, report, storage
+from .tenants import REGISTRY_FILE
+
+
+def _output_path(options, db_path, suffix):
+    os.makedirs(options['out'], exist_ok=True)
+    return os.path.join(options['out'], f"{os.path.splitext(os.path.basename(db_path))[0]}{suffix}")
+
+
+def _write_json(path, payload):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(payload, f, indent=2, ensure_ascii=False, default=str)
+
+
+def _run_migrate(db_path, options):
+    with storage.get_connection() as conn:
+        applied = storage.migrate(conn)
+    return {'output': f"schema v{storage.SCHEMA_VERSION} ({len(applied)} applied)"}
+
+
+def _run_rebuild_rollup(db_path, options):
+    return {'output': f"{aggregates.rebuild_monthly_rollup():,} rollup rows"}
+
+
+def _run_totals(db_path, options):
+    totals = aggregates.get_dashboard_totals(options['month'] or datetime.now().strftime("%Y-%m"))
+    return {'output': f"income {totals['monthly_income']:,.2f}, expenses {totals['monthly_expenses']:,.2f}",
+            'totals': totals}
+
+
+def _run_report(db_path, options):
+    path = _output_path(options, db_path, '.report.json')
+    _write_json(path, report.build_report(options['month'], options['horizon']))
+    return {'output': path}
+
+
+def _run_forecast(db_path, options):
+    path = _output_path(options, db_path, '.forecast.csv')
+    forecasts.forecast_all(options['horizon'], origin=options['month']).to_csv(path, index=False)
+    return {'output': path}
+
+
+def _run_refit_forecasts(db_path, options):
+    # The nightly full refit of the online forecast state (FINANCE_FORECAST_MODE=online).
+    states = forecasts.refit_online_forecasts()
+    return {'output': ', '.join(f"{table} weights {state['weights']}" for table, state in states.items()
+                                if state['through'] is not None) or "no closed month yet"}
+
+
+def _run_export(db_path, options):
+    path = _output_path(options, db_path, f".{export.EXPORT_FORMATS[options['format']][0]}")
+    with open(path, 'wb') as f:
+        rows = export.export_to_file(f, options['format'])
+    return {'output': path, 'rows_written': rows}
+
+
+# operation -> function(db_path, options) run inside a worker with the database configured
+OPERATIONS = {
+    'migrate': _run_migrate,
+    'rebuild-rollup': _run_rebuild_rollup,
+    'totals': _run_totals,
+    'report': _run_report,
+    'forecast': _run_forecast,
+    'refit-forecasts': _run_refit_forecasts,
+    'export': _run_export,
+}
+
+
+def run_one(operation, db_path, options):
+    # Worker entry point: never raises, so one bad file does not take the batch down.
+    started = time.perf_counter()
+    result = {'path': db_path, 'bytes': os.path.getsize(db_path), 'transactions': 0, 'ok': True}
+    try:
+        # Bound explicitly: a forked worker inherits whichever pool its parent thread had bound.
+        with storage.use_pool(storage.configure_db(db_path, max_size=1)):
+            if operation != 'migrate':
+                storage.init_db()
+            result.update(OPERATIONS[operation](db_path, options))
+            with storage.get_connection() as conn:
+                result['transactions'] = conn.execute(
+                    "SELECT IFNULL(SUM(count), 0) FROM monthly_rollup").fetchone()[0]
+    except Exception as exc:
+        result.update(ok=False, error=f"{type(exc).__name__}: {exc}", traceback=traceback.format_exc())
+    finally:
+        storage.close_db()
+    result['seconds'] = time.perf_counter() - started
+    return result
+
+
+def find_databases(paths):
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            found += sorted(match for match in glob.glob(os.path.join(path, '**', '*.db'), recursive=True)
+                            if os.path.basename(match) != REGISTRY_FILE)
+        else:
+            found += sorted(glob.glob(path)) or [path]
+    return list(dict.fromkeys(os.path.abspath(path) for path in found))
+
+
+def run_batch(operation, paths, options, workers=None, on_result=None):
+    # Returns (per-database results in completion order, wall-clock seconds).
+    workers = workers or os.cpu_count() or 1
+    started = time.perf_counter()
+    results = []
+    with ProcessPoolExecutor(max_workers=min(workers, len(paths)) or 1) as pool:
+        futures = [pool.submit(run_one, operation, path, options) for path in paths]
+        for future in as_completed(futures):
+            results.append(future.result())
+            if on_result:
+                on_result(results[-1])
+    return results, time.perf_counter() - started
+
+
+def _percentile(samples, q):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(q * len(samples)))] if samples else 0.0
+
+
+def throughput_stats(results, wall_seconds, workers):
+    seconds = [r['seconds'] for r in results]
+    busy = sum(seconds)
+    return {
+        'databases': len(results),
+        'failed': sum(not r['ok'] for r in results),
+        'workers': workers,
+        'wall_seconds': wall_seconds,
+        'databases_per_second': len(results) / wall_seconds if wall_seconds else 0.0,
+        'transactions': sum(r['transactions'] for r in results),
+        'transactions_per_second': sum(r['transactions'] for r in results) / wall_seconds if wall_seconds else 0.0,
+        'mb_per_second': sum(r['bytes'] for r in results) / 1e6 / wall_seconds if wall_seconds else 0.0,
+        'p50_seconds': _percentile(seconds, 0.50),
+        'p95_seconds': _percentile(seconds, 0.95),
+        'max_seconds': max(seconds, default=0.0),
+        # Share of the pool's worker time spent on databases rather than idle or starting up.
+        'utilization': busy / (wall_seconds * workers) if wall_seconds and workers else 0.0,
+    }
+
+
+def print_stats(operation, stats, file=sys.stdout):
+    print(f"{operation}: {stats['databases']:,} databases ({stats['failed']:,} failed) "
+          f"on {stats['workers']} worker{'s' if stats['workers'] != 1 else ''} in {stats['wall_seconds']:.2f}s", file=file)
+    print(f"  {stats['databases_per_second']:,.1f} databases/s, {stats['transactions_per_second']:,.0f} "
+          f"transactions/s, {stats['mb_per_second']:,.1f} MB/s", file=file)
+    print(f"  per database: p50 {stats['p50_seconds']:.3f}s, p95 {stats['p95_seconds']:.3f}s, "
+          f"max {stats['max_seconds']:.3f}s; worker utilization {stats['utilization']:.0%}", file=file)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m finance_core', description=__doc__.splitlines()[0])
+    parser.add_argument('operation', choices=OPERATIONS)
+    parser.add_argument('paths', nargs='+', help="database files, globs or directories of *.db files")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="worker processes (default: CPUs)")
+    parser.add_argument('--out', default='.', help="directory for reports, forecasts and exports")
+    parser.add_argument('--month', default=None, help="report/forecast month as YYYY-MM (default: current)")
+    parser.add_argument('--horizon', type=int, default=3, help="months to forecast")
+    parser.add_argument('--format', default='csv', choices=export.EXPORT_FORMATS, help="export format")
+    parser.add_argument('--json', action='store_true', help="print per-database results and stats as JSON lines")
+    parser.add_argument('--quiet', action='store_true', help="only print the summary")
+    args = parser.parse_args(argv)
+
+    paths = find_databases(args.paths)
+    if not paths:
+        parser.error("no databases found")
+    missing = [path for path in paths if not os.path.isfile(path)]
+    if missing:
+        parser.error(f"no such database: {', '.join(missing)}")
+    options = {'out': args.out, 'month': args.month, 'horizon': args.horizon, 'format': args.format}
+
+    def on_result(result):
+        if args.json:
+            print(json.dumps({k: v for k, v in result.items() if k != 'traceback'}), flush=True)
+        elif not result['ok']:
+            print(f"FAILED {result['path']}: {result['error']}", file=sys.stderr, flush=True)
+        elif not args.quiet:
+            print(f"{result['path']}: {result['transactions']:,} transactions in {result['seconds']:.3f}s "
+                  f"-> {result['output']}", flush=True)
+
+    workers = max(1, min(args.workers or 1, len(paths)))
+    results, wall_seconds = run_batch(args.operation, paths, options, workers, on_result)
+    stats = throughput_stats(results, wall_seconds, workers)
+    if args.json:
+        print(json.dumps({'operation': args.operation, **stats}))
+    else:
+        print_stats(args.operation, stats)
+    return 1 if stats['failed'] else 0
@@ -0,0 +1,140 @@
+"""Streaming export of the merged expense and income ledger."""
+import csv
+import gzip
+import io
+from datetime import datetime
+
+import numpy as np
+
+from .profiling import profiled
+from .storage import EPOCH_ORDINAL, get_streaming_connection
+
+
+# Export enhanced data
+EXPORT_CHUNK_SIZE = 50_000
+EXPORT_COLUMNS = ['id', 'date', 'amount', 'category', 'Type', 'source']
+EXPORT_FORMATS = {
+    # format: (file extension, mime type)
+    'csv': ('csv', 'text/csv'),
+    'csv.gz': ('csv.gz', 'application/gzip'),
+    'parquet': ('parquet', 'application/vnd.apache.parquet'),
+    'arrow': ('arrow', 'application/vnd.apache.arrow.file'),
+}
+
+# Both sides are read in day order from their day indexes and merged by SQLite
+# (MERGE (UNION ALL)), so rows stream out in date order without a sort or temp table.
+_EXPORT_QUERY = '''
+    SELECT id, day, amount_cents, label, 'Expense' AS type, label AS source
+        FROM (SELECT id, day, amount_cents, (SELECT name FROM categories WHERE id = category_id) AS label FROM expenses)
+    UNION ALL
+    SELECT id, day, amount_cents, label, 'Income', label
+        FROM (SELECT id, day, amount_cents, (SELECT name FROM sources WHERE id = source_id) AS label FROM income)
+    ORDER BY day'''
+
+
+def iter_export_chunks(chunk_size=EXPORT_CHUNK_SIZE):
+    # Yields lists of (id, day, amount_cents, category, type, source); only one chunk is held at a time.
+    with get_streaming_connection() as conn:
+        cursor = conn.execute(_EXPORT_QUERY)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield rows
+
+
+def _day_to_iso(day):
+    return datetime.fromordinal(day + EPOCH_ORDINAL).strftime('%Y-%m-%d')
+
+
+def _write_csv(chunks, fileobj):
+    writer = csv.writer(fileobj, lineterminator='\n')
+    writer.writerow(EXPORT_COLUMNS)
+    written = 0
+    iso_days = {}
+    for rows in chunks:
+        for row_id, day, cents, category, row_type, source in rows:
+            if day not in iso_days:
+                iso_days[day] = _day_to_iso(day)
+            writer.writerow((row_id, iso_days[day], cents / 100, category, row_type, source))
+        written += len(rows)
+    return written
+
+
+def _arrow_batches(chunks):
+    import pyarrow as pa
+
+    schema = pa.schema([('id', pa.int64()), ('date', pa.date32()), ('amount', pa.float64()),
+                        ('amount_cents', pa.int64()), ('category', pa.string()), ('Type', pa.string()),
+                        ('source', pa.string())])
+    for rows in chunks:
+        ids, days, cents, categories, types, sources = zip(*rows)
+        cents = np.asarray(cents, dtype=np.int64)
+        yield schema, pa.record_batch([
+            pa.array(ids, pa.int64()), pa.array(days, pa.int32()).cast(pa.date32()),
+            pa.array(cents / 100), pa.array(cents),
+            pa.array(categories, pa.string()), pa.array(types, pa.string()), pa.array(sources, pa.string()),
+        ], schema=schema)
+
+
+def has_export_rows():
+    chunks = iter_export_chunks(1)
+    try:
+        return next(chunks, None) is not None
+    finally:
+        chunks.close()
+
+
+def check_export_format(fmt):
+    # Raises what export_to_file() would for fmt before any row is read: ValueError for an
+    # unknown format, RuntimeError when pyarrow is needed and missing.
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format: {fmt}")
+    if fmt in ('parquet', 'arrow'):
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError as exc:
+            raise RuntimeError(f"Exporting to {fmt} requires pyarrow (pip install pyarrow)") from exc
+
+
+@profiled
+def export_to_file(fileobj, fmt='csv', chunk_size=EXPORT_CHUNK_SIZE):
+    # Streams the merged ledger into a binary file object (or path for parquet/arrow) with
+    # memory bounded by chunk_size. Returns the number of data rows written.
+    check_export_format(fmt)
+    chunks = iter_export_chunks(chunk_size)
+    if fmt in ('csv', 'csv.gz'):
+        raw = gzip.GzipFile(fileobj=fileobj, mode='wb') if fmt == 'csv.gz' else fileobj
+        text = io.TextIOWrapper(raw, encoding='utf-8', newline='')
+        try:
+            return _write_csv(chunks, text)
+        finally:
+            text.flush()
+            text.detach()
+            if raw is not fileobj:
+                raw.close()
+
+    import pyarrow.ipc
+    import pyarrow.parquet as pq
+
+    writer = None
+    written = 0
+    try:
+        for schema, batch in _arrow_batches(chunks):
+            if writer is None:
+                writer = (pq.ParquetWriter(fileobj, schema, compression='zstd') if fmt == 'parquet'
+                          else pyarrow.ipc.new_file(fileobj, schema))
+            writer.write_batch(batch)
+            written += batch.num_rows
+    finally:
+        if writer is not None:
+            writer.close()
+    return written
+
+
+@profiled
+def export_data():
+    buffer = io.BytesIO()
+    if not export_to_file(buffer, 'csv'):
+        return "No data to export"
+    return buffer.getvalue().decode('utf-8')
@@ -0,0 +1,441 @@
+"""Spending and income forecasts: the cached per-table model and the batched forecasting engine."""
+import collections
+import hashlib
+import itertools
+import os
+import pickle
+import threading
+from datetime import date, datetime
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+from .aggregates import get_monthly_rollup, get_monthly_total
+from .profiling import profiled
+from .storage import ROLLUP_TYPES, TRANSACTION_TABLES, get_connection, get_data_version, get_db_path, to_day
+
+
+# Forecast Model Cache
+MODEL_CACHE_DIR = os.environ.get('FINANCE_MODEL_CACHE_DIR', '.model_cache')
+# Entries kept in memory, least recently used dropped first: a ledger has up to five (two
+# RandomForests, the engine's forecasts and two online states), and a dropped one is read back
+# from its pickle on the next lookup.
+MODEL_CACHE_MAX_ENTRIES = int(os.environ.get('FINANCE_MODEL_CACHE_MAX_ENTRIES', '64'))
+
+
+class ModelCache:
+    # Keeps the latest (key, (model, prediction)) per model name in memory and as a pickle on
+    # disk, so a restarted server or a new session does not refit unchanged data. self._lock only
+    # guards the dicts; a name is read from disk and fitted under that name's own lock, so a fit
+    # holds up callers of the same name alone and only one of them fits.
+    def __init__(self, cache_dir=MODEL_CACHE_DIR, max_entries=MODEL_CACHE_MAX_ENTRIES):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self._memory = collections.OrderedDict()  # name -> (key, value), least recent first
+        self._name_locks = {}
+        self._lock = threading.Lock()
+        self._stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'updates': 0, 'disk_errors': 0}
+
+    def _path(self, name):
+        return os.path.join(self.cache_dir, f"{name}.pkl")
+
+    def _count(self, stat):
+        with self._lock:
+            self._stats[stat] += 1
+
+    def _name_lock(self, name):
+        with self._lock:
+            return self._name_locks.setdefault(name, threading.Lock())
+
+    def _memory_hit(self, name, key):
+        with self._lock:
+            entry = self._memory.get(name)
+            if entry is None or entry[0] != key:
+                return None
+            self._memory.move_to_end(name)
+            self._stats['memory_hits'] += 1
+            return entry
+
+    def _remember(self, name, entry):
+        with self._lock:
+            self._memory[name] = entry
+            self._memory.move_to_end(name)
+            while len(self._memory) > self.max_entries:
+                evicted, _ = self._memory.popitem(last=False)
+                name_lock = self._name_locks.get(evicted)
+                if name_lock is not None and not name_lock.locked():
+                    del self._name_locks[evicted]
+
+    def _load_entry(self, name):
+        try:
+            with open(self._path(name), 'rb') as f:
+                return pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception:
+            self._count('disk_errors')
+            return None
+
+    def _load(self, name, key):
+        entry = self._load_entry(name)
+        return entry[1] if entry is not None and entry[0] == key else None
+
+    def _store(self, name, key, value):
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_path = f"{self._path(name)}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                pickle.dump((key, value), f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self._path(name))
+        except OSError:
+            self._count('disk_errors')
+
+    def get_or_fit(self, name, key, fit):
+        entry = self._memory_hit(name, key)
+        if entry is not None:
+            return entry[1]
+        with self._name_lock(name):
+            entry = self._memory_hit(name, key)  # fitted by another caller while this one waited
+            if entry is not None:
+                return entry[1]
+            value = self._load(name, key)
+            if value is not None:
+                self._count('disk_hits')
+            else:
+                self._count('misses')
+                value = fit()
+                self._store(name, key, value)
+            self._remember(name, (key, value))
+            return value
+
+    def update(self, name, key, step, force=False):
+        # Like get_or_fit for state that advances instead of being refitted: on a key change,
+        # step(previous value, or None if there is none) returns the value for the new key.
+        entry = None if force else self._memory_hit(name, key)
+        if entry is not None:
+            return entry[1]
+        with self._name_lock(name):
+            with self._lock:
+                entry = self._memory.get(name)
+            from_disk = entry is None
+            if from_disk:
+                entry = self._load_entry(name)
+            if entry is not None and entry[0] == key and not force:
+                self._count('disk_hits' if from_disk else 'memory_hits')
+                self._remember(name, entry)
+                return entry[1]
+            self._count('updates' if entry is not None else 'misses')
+            value = step(None if entry is None else entry[1])
+            self._store(name, key, value)
+            self._remember(name, (key, value))
+            return value
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            for name in os.listdir(self.cache_dir) if os.path.isdir(self.cache_dir) else []:
+                if name.endswith('.pkl'):
+                    os.remove(os.path.join(self.cache_dir, name))
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats['memory_hits'] + stats['disk_hits'] + stats['misses']
+        stats['hit_rate'] = (stats['memory_hits'] + stats['disk_hits']) / lookups if lookups else 0.0
+        return stats
+
+
+model_cache = ModelCache()
+
+
+def _next_month():
+    current_date = datetime.now()
+    return current_date.year, (current_date.month % 12) + 1
+
+
+def _fit_random_forest(X, y):
+    # X: DataFrame with 'year' and 'month' (1-12) columns, one row per month; y: that month's total
+    from sklearn.ensemble import RandomForestRegressor
+
+    model = RandomForestRegressor(n_estimators=100, random_state=42)
+    model.fit(X, y)
+    return model
+
+
+@profiled
+def _fit_monthly_forecast(table):
+    monthly = get_monthly_rollup(table)
+    if monthly.empty:
+        return None, 0.0
+    monthly['year'] = monthly['month'].str[:4].astype(int)
+    monthly['month'] = monthly['month'].str[5:7].astype(int)
+    model = _fit_random_forest(monthly[['year', 'month']], monthly['amount'])
+    year, month = _next_month()
+    next_month = pd.DataFrame({'year': [year], 'month': [month]})
+    return model, float(model.predict(next_month)[0])
+
+
+def _cached_forecast(table):
+    # The key changes only when the table is written to (or the target month rolls over).
+    db_key = hashlib.sha1(os.path.abspath(get_db_path()).encode()).hexdigest()[:12]
+    key = (get_data_version(table), _next_month())
+    model, prediction = model_cache.get_or_fit(f"forecast-{table}-{db_key}", key,
+                                               lambda: _fit_monthly_forecast(table))
+    return prediction
+
+
+def _predict(table):
+    return _online_forecast(table) if FORECAST_MODE == 'online' else _cached_forecast(table)
+
+
+# Enhanced Spending Prediction
+@profiled
+def predict_spending():
+    return _predict('expenses')
+
+
+# Enhanced Income Prediction
+@profiled
+def predict_income():
+    return _predict('income')
+
+
+# Forecasting Engine
+# Fits every expense category, income source and both totals in one least-squares solve:
+# all series share the same monthly design matrix (trend, plus month-of-year terms once there
+# are two years of history), so features are built once and the fit is a single lstsq call.
+FORECAST_SEASONAL_MIN_MONTHS = 24
+
+
+def _month_number(months):
+    # 'YYYY-MM' -> months since year 0, so consecutive months are consecutive integers
+    return months.str[:4].astype(int) * 12 + months.str[5:7].astype(int) - 1
+
+
+def _month_label(number):
+    return f"{number // 12:04d}-{number % 12 + 1:02d}"
+
+
+def _forecast_design(month_numbers, first_month, seasonal):
+    month_numbers = np.asarray(month_numbers)
+    t = (month_numbers - first_month).astype(float)
+    columns = [np.ones_like(t), t]
+    if seasonal:
+        month_of_year = month_numbers % 12
+        columns += [(month_of_year == k).astype(float) for k in range(1, 12)]
+    return np.column_stack(columns)
+
+
+def _fit_trend(month_numbers, Y):
+    # Least-squares fit of every column of Y (months x series) on the shared design matrix;
+    # returns (design matrix, coefficients, seasonal).
+    n_months = len(month_numbers)
+    seasonal = n_months >= FORECAST_SEASONAL_MIN_MONTHS
+    X = _forecast_design(month_numbers, month_numbers[0], seasonal)
+    if n_months < 2:
+        X = X[:, :1]  # a single month only supports a level
+    coef, _, _, _ = np.linalg.lstsq(X, Y, rcond=None)
+    return X, coef, seasonal
+
+
+@profiled
+def load_monthly_matrix(until=None):
+    # One row per series ('expense'/'income', category; category None = total), one column per
+    # month from the first recorded month to the last, missing months filled with 0.
+    query = ("SELECT month, type, COALESCE(c.name, s.name, '') AS category, total_cents / 100.0 AS total "
+             "FROM monthly_rollup r "
+             "LEFT JOIN categories c ON r.type = 'expense' AND c.id = r.label_id "
+             "LEFT JOIN sources s ON r.type = 'income' AND s.id = r.label_id")
+    params = ()
+    if until:
+        query += " WHERE month <= ?"
+        params = (until,)
+    with get_connection() as conn:
+        df = pd.read_sql_query(query, conn, params=params)
+    if df.empty:
+        return pd.DataFrame()
+    df['month'] = _month_number(df['month'])
+    matrix = df.pivot_table(index=['type', 'category'], columns='month', values='total', aggfunc='sum',
+                            fill_value=0.0)
+    matrix = matrix.reindex(columns=range(matrix.columns.min(), matrix.columns.max() + 1), fill_value=0.0)
+    totals = matrix.groupby(level='type').sum()
+    totals.index = pd.MultiIndex.from_arrays([totals.index, [None] * len(totals)], names=['type', 'category'])
+    return pd.concat([totals, matrix])
+
+
+@profiled
+def forecast_all(horizon=12, origin=None, interval=0.95):
+    if not 1 <= horizon <= 12:
+        raise ValueError("horizon must be between 1 and 12 months")
+    origin = origin or datetime.now().strftime("%Y-%m")
+    matrix = load_monthly_matrix(until=origin)
+    columns = ['type', 'category', 'horizon', 'month', 'forecast', 'lower', 'upper']
+    if matrix.empty:
+        return pd.DataFrame(columns=columns)
+
+    month_numbers = np.asarray(matrix.columns)
+    Y = matrix.to_numpy(dtype=float).T  # months x series
+    n_months = len(month_numbers)
+    X, coef, seasonal = _fit_trend(month_numbers, Y)
+    residuals = Y - X @ coef
+    dof = max(n_months - X.shape[1], 1)
+    sigma = np.sqrt((residuals ** 2).sum(axis=0) / dof)
+
+    origin_number = int(_month_number(pd.Series([origin]))[0])
+    future = np.arange(origin_number + 1, origin_number + horizon + 1)
+    X_future = _forecast_design(future, month_numbers[0], seasonal)[:, :X.shape[1]]
+    predictions = X_future @ coef  # horizon x series
+
+    # Prediction interval: residual spread widened by each future point's leverage.
+    leverage = np.einsum('ij,jk,ik->i', X_future, np.linalg.pinv(X.T @ X), X_future)
+    z = NormalDist().inv_cdf(0.5 + interval / 2)
+    half_width = z * np.sqrt(1 + leverage)[:, None] * sigma[None, :]
+
+    n_series = Y.shape[1]
+    result = pd.DataFrame({
+        'type': np.tile(matrix.index.get_level_values('type'), horizon),
+        'category': np.tile(matrix.index.get_level_values('category'), horizon),
+        'horizon': np.repeat(np.arange(1, horizon + 1), n_series),
+        'month': np.repeat([_month_label(m) for m in future], n_series),
+        'forecast': np.clip(predictions, 0, None).ravel(),
+        'lower': np.clip(predictions - half_width, 0, None).ravel(),
+        'upper': np.clip(predictions + half_width, 0, None).ravel(),
+    })
+    return result[columns]
+
+
+@profiled
+def get_forecasts(horizon=12):
+    db_key = hashlib.sha1(os.path.abspath(get_db_path()).encode()).hexdigest()[:12]
+    origin = datetime.now().strftime("%Y-%m")
+    key = (get_data_version('expenses'), get_data_version('income'), origin, horizon)
+    return model_cache.get_or_fit(f"forecast-engine-{db_key}", key, lambda: forecast_all(horizon, origin))
+
+
+# Online Forecast
+# FINANCE_FORECAST_MODE=online replaces the RandomForest refit after every write with additive
+# Holt-Winters smoothing (level, trend and a term per month of the year), kept per database
+# and table in the model cache. Only closed months are folded in: when a month closes the
+# state advances by that month's rollup total, O(1) however long the history, and new rows in
+# the open month only move the rowid watermark. A full refit replays every closed month and
+# re-estimates the smoothing weights by grid search; it runs on the first forecast of each day
+# (or refit_online_forecasts(), e.g. nightly from cron), and when rows were updated, deleted or
+# backdated into a month the state already holds.
+FORECAST_MODE = os.environ.get('FINANCE_FORECAST_MODE', 'random_forest')
+ONLINE_ALPHAS = (0.05, 0.1, 0.2, 0.3, 0.5, 0.7)  # level
+ONLINE_BETAS = (0.0, 0.02, 0.05, 0.1, 0.2)  # trend
+ONLINE_GAMMAS = (0.0, 0.05, 0.1, 0.2, 0.3)  # month of year
+ONLINE_DEFAULT_WEIGHTS = (0.3, 0.05, 0.1)  # until there is history past the warm-up to score on
+ONLINE_WARMUP_MONTHS = 12
+
+
+def _smooth(values, months, weights, state):
+    # Folds consecutive monthly totals into the state. weights (alpha, beta, gamma) and the state
+    # (level, trend, season) hold one entry (season: one row of 12) per candidate, so a full
+    # refit scores every candidate in one pass. Returns the new state and each candidate's
+    # squared one-step-ahead errors past the warm-up.
+    alpha, beta, gamma = (np.asarray(weight, dtype=np.float64) for weight in weights)
+    level, trend, season = (np.array(part, dtype=np.float64) for part in state)
+    candidates = np.arange(len(level))
+    sse = np.zeros(len(level))
+    for step, (value, month) in enumerate(zip(values, np.asarray(months) % 12)):
+        if step >= ONLINE_WARMUP_MONTHS:
+            sse += (value - (level + trend + season[candidates, month])) ** 2
+        previous = level
+        level = alpha * (value - season[candidates, month]) + (1 - alpha) * (level + trend)
+        trend = beta * (level - previous) + (1 - beta) * trend
+        season[candidates, month] = gamma * (value - level) + (1 - gamma) * season[candidates, month]
+    return (level, trend, season), sse
+
+
+def _online_predict(state, month):
+    # The forecast for month (a month number after state['through']).
+    steps = month - state['through']
+    return max(state['level'] + steps * state['trend'] + state['season'][month % 12], 0.0)
+
+
+def _closed_totals(table, first, last):
+    # Totals for months first..last (month numbers), 0 for a month without rows.
+    rollup = get_monthly_rollup(table, start_month=_month_label(first), end_month=_month_label(last))
+    values = np.zeros(last - first + 1)
+    values[_month_number(rollup['month']).to_numpy() - first] = rollup['amount'].to_numpy()
+    return values
+
+
+def _fit_holt_winters(first, values):
+    # Smooths totals for consecutive months from `first` with every weight candidate and keeps
+    # the one with the smallest one-step errors; returns the state through the last month.
+    grid = np.array(list(itertools.product(ONLINE_ALPHAS, ONLINE_BETAS, ONLINE_GAMMAS))).T
+    count = grid.shape[1]
+    (level, trend, season), sse = _smooth(values[1:], np.arange(first + 1, first + len(values)), grid,
+                                          (np.full(count, values[0]), np.zeros(count), np.zeros((count, 12))))
+    if len(values) - 1 > ONLINE_WARMUP_MONTHS:
+        best = int(np.argmin(sse))
+    else:
+        best = int(np.flatnonzero((grid.T == ONLINE_DEFAULT_WEIGHTS).all(axis=1))[0])
+    return {'through': first + len(values) - 1, 'weights': tuple(grid[:, best].tolist()),
+            'level': float(level[best]), 'trend': float(trend[best]), 'season': season[best].tolist()}
+
+
+def _fit_online(table, closed, watermark):
+    state = {'through': None, 'weights': ONLINE_DEFAULT_WEIGHTS, 'level': 0.0, 'trend': 0.0, 'season': [0.0] * 12,
+             'watermark': watermark, 'fitted_on': date.today().isoformat(), 'updates': 0}
+    with get_connection() as conn:
+        first = conn.execute("SELECT MIN(month) FROM monthly_rollup WHERE type = ?",
+                             (ROLLUP_TYPES[table],)).fetchone()[0]
+    first = None if first is None else int(_month_number(pd.Series([first]))[0])
+    if first is not None and first <= closed:
+        state.update(_fit_holt_winters(first, _closed_totals(table, first, closed)))
+    return state
+
+
+def _advance_online(table, state, closed, watermark):
+    # O(1) in the history: reads the rollup for months closed since the state was saved, if any.
+    if (state is None or state['through'] is None or state['fitted_on'] != date.today().isoformat()
+            or closed < state['through'] or watermark[1] != state['watermark'][1]):
+        return _fit_online(table, closed, watermark)
+    with get_connection() as conn:
+        backdated = conn.execute(
+            f"SELECT 1 FROM {table} WHERE rowid > ? AND +day < ? LIMIT 1",  # + keeps it a rowid range scan
+            (state['watermark'][0], to_day(f"{_month_label(state['through'] + 1)}-01"))).fetchone()
+    if backdated:
+        return _fit_online(table, closed, watermark)
+    state = {**state, 'watermark': watermark}
+    if closed > state['through']:
+        months = np.arange(state['through'] + 1, closed + 1)
+        weights = [[weight] for weight in state['weights']]
+        (level, trend, season), _ = _smooth(_closed_totals(table, months[0], closed), months, weights,
+                                            ([state['level']], [state['trend']], [state['season']]))
+        state.update(through=closed, level=float(level[0]), trend=float(trend[0]), season=season[0].tolist(),
+                     updates=state['updates'] + len(months))
+    return state
+
+
+def _online_state(table, force_refit=False):
+    db_key = hashlib.sha1(os.path.abspath(get_db_path()).encode()).hexdigest()[:12]
+    now = datetime.now()
+    closed = now.year * 12 + now.month - 2  # the month before this one
+    with get_connection() as conn:
+        watermark = conn.execute(
+            f"SELECT (SELECT IFNULL(MAX(rowid), 0) FROM {table}), rewrites FROM table_versions WHERE table_name = ?",
+            (table,)).fetchone()
+    key = (closed, tuple(watermark), date.today().isoformat())
+    step = ((lambda state: _fit_online(table, closed, tuple(watermark))) if force_refit else
+            (lambda state: _advance_online(table, state, closed, tuple(watermark))))
+    return model_cache.update(f"online-{table}-{db_key}", key, step, force=force_refit)
+
+
+@profiled
+def _online_forecast(table):
+    state = _online_state(table)
+    if state['through'] is None:  # no closed month yet: the open month so far
+        return get_monthly_total(table, datetime.now().strftime("%Y-%m"))
+    return _online_predict(state, state['through'] + 2)  # next month, past the open one
+
+
+@profiled
+def refit_online_forecasts():
+    # Full refit of every table's online state, re-estimating the smoothing weights; returns
+    # the refitted states.
+    return {table: _online_state(table, force_refit=True) for table in TRANSACTION_TABLES}
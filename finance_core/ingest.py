@@ -0,0 +1,189 @@
+"""Streaming CSV import with batched inserts and content-hash deduplication."""
+import time
+
+import numpy as np
+import pandas as pd
+
+from .aggregates import _month_range
+from .profiling import profiled
+from .storage import (ROLLUP_LAYOUT, ROLLUP_TYPES, TRANSACTION_TABLES, _check_table, _create_rollup_triggers,
+                      _create_version_triggers, _label_ids, _label_key, get_connection)
+
+
+# Bulk Import
+IMPORT_CHUNK_SIZE = 100_000
+BULK_CACHE_SIZE = -262144  # 256 MB, in KiB as PRAGMA cache_size expects
+# Columns tried, in order, for each field when the caller does not name one.
+IMPORT_COLUMN_CANDIDATES = {
+    'date': ('date', 'Date', 'transaction_date', 'Transaction Date', 'posted', 'Posted Date'),
+    'amount': ('amount', 'Amount', 'value', 'Value'),
+    'label': ('category', 'source', 'Category', 'Source', 'description', 'Description', 'memo', 'Memo'),
+    'type': ('Type', 'type'),
+}
+
+
+def _pick_column(columns, field, requested):
+    if requested:
+        if requested not in columns:
+            raise ValueError(f"Column '{requested}' not found in import file")
+        return requested
+    return next((c for c in IMPORT_COLUMN_CANDIDATES[field] if c in columns), None)
+
+
+def _normalize_import_chunk(chunk, columns, table, default_label, date_format):
+    # Vectorized: parse dates to day numbers and amounts to signed cents, then route each row
+    # to expenses or income. Returns {table: DataFrame[day, amount_cents, label]} and the reject count.
+    dates = pd.to_datetime(chunk[columns['date']], format=date_format, errors='coerce')
+    amounts = chunk[columns['amount']]
+    if amounts.dtype == object or pd.api.types.is_string_dtype(amounts):
+        text = amounts.astype(str).str.strip()
+        negative = text.str.startswith('(') & text.str.endswith(')')
+        amounts = pd.to_numeric(text.str.replace(r'[^\d.\-]', '', regex=True), errors='coerce')
+        amounts = amounts.where(~negative, -amounts.abs())
+    valid = dates.notna() & amounts.notna()
+    frame = pd.DataFrame({
+        'day': (dates[valid].to_numpy(dtype='datetime64[D]').astype('int64')),
+        'amount_cents': (amounts[valid] * 100).round().astype('int64').to_numpy(),
+        'label': (chunk.loc[valid, columns['label']].fillna(default_label).astype(str).to_numpy()
+                  if columns['label'] else default_label),
+    })
+    if table:
+        routes = {table: frame.assign(amount_cents=frame['amount_cents'].abs())}
+    elif columns['type']:
+        kind = chunk.loc[valid, columns['type']].astype(str).str.lower().str.startswith('inc').to_numpy()
+        routes = {'income': frame[kind], 'expenses': frame[~kind]}
+        routes = {name: part.assign(amount_cents=part['amount_cents'].abs()) for name, part in routes.items()}
+    else:
+        # Bank-statement convention: money out is negative, money in is positive.
+        outgoing = frame['amount_cents'] < 0
+        routes = {'expenses': frame[outgoing].assign(amount_cents=-frame['amount_cents'][outgoing]),
+                  'income': frame[~outgoing]}
+    return routes, int((~valid).sum())
+
+
+def _content_hashes(frame, seen):
+    # Hash of (day, cents, label, occurrence). The occurrence number keeps genuinely repeated
+    # transactions in one file (two identical coffees on the same day) while re-importing the
+    # same file maps every row onto its existing hash. `seen` carries counts across chunks.
+    base = pd.util.hash_pandas_object(frame[['day', 'amount_cents', 'label']], index=False).to_numpy()
+    occurrence = pd.Series(base).groupby(base).cumcount().to_numpy()
+    counts = pd.Series(base).value_counts()
+    if len(seen['counts']):
+        occurrence = occurrence + seen['counts'].reindex(base, fill_value=0).to_numpy()
+        counts = seen['counts'].add(counts, fill_value=0).astype('int64')
+    seen['counts'] = counts
+    keyed = pd.DataFrame({'base': base, 'occurrence': occurrence})
+    return pd.util.hash_pandas_object(keyed, index=False).to_numpy().view('int64')
+
+
+def _refresh_rollup_months(conn, table, months):
+    key = _label_key(table)
+    for month in months:
+        start, end = _month_range(month)
+        conn.execute("DELETE FROM monthly_rollup WHERE type = ? AND month = ?", (ROLLUP_TYPES[table], month))
+        conn.execute(f'''
+            INSERT INTO monthly_rollup (month, type, label_id, total_cents, count, min_cents, max_cents)
+            SELECT ?, ?, IFNULL({key}, 0), SUM(amount_cents), COUNT(*), MIN(amount_cents), MAX(amount_cents)
+            FROM {table} WHERE day >= ? AND day < ? GROUP BY {key}''',
+                     (month, ROLLUP_TYPES[table], start, end))
+
+
+def _merge_rollup_delta(conn, table, frame):
+    # Same upsert the insert trigger does per row, but once per (month, label) of the batch.
+    months = frame['day'].to_numpy().astype('datetime64[D]').astype('datetime64[M]').astype('int64')
+    delta = frame.assign(month=months).groupby(['month', 'label_id'])['amount_cents'].agg(
+        ['sum', 'count', 'min', 'max']).reset_index()
+    # months since 1970-01 -> 'YYYY-MM', formatted once per group rather than per row
+    delta['month'] = [f"{1970 + m // 12:04d}-{m % 12 + 1:02d}" for m in delta['month']]
+    conn.executemany('''
+        INSERT INTO monthly_rollup (month, type, label_id, total_cents, count, min_cents, max_cents)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (month, type, label_id) DO UPDATE SET
+            total_cents = total_cents + excluded.total_cents,
+            count = count + excluded.count,
+            min_cents = MIN(min_cents, excluded.min_cents),
+            max_cents = MAX(max_cents, excluded.max_cents)''',
+                     ((month, ROLLUP_TYPES[table], int(label_id), int(total), int(count), int(low), int(high))
+                      for month, label_id, total, count, low, high in delta.itertuples(index=False)))
+
+
+@profiled
+def bulk_insert(table, frame):
+    # Inserts DataFrame[day, amount_cents, label, content_hash] in one write transaction and
+    # returns the number of new rows (duplicates by content_hash are skipped). The per-row
+    # rollup and version triggers are dropped for the transaction and their work is done once
+    # per batch instead; DDL is transactional, so other connections never see them missing.
+    _check_table(table)
+    if frame.empty:
+        return 0
+    frame = frame.sort_values('day', kind='stable')
+    with get_connection() as conn:
+        # A larger page cache for the batch keeps the index B-trees being appended to in memory.
+        cache_size = conn.execute("PRAGMA cache_size").fetchone()[0]
+        conn.execute(f"PRAGMA cache_size = {BULK_CACHE_SIZE}")
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(f"DROP TRIGGER IF EXISTS trg_{table}_rollup_insert")
+            conn.execute(f"DROP TRIGGER IF EXISTS trg_{table}_version_insert")
+            # Labels resolve once per distinct value, then map onto the rows as integer ids.
+            codes, names = pd.factorize(frame['label'])
+            ids = _label_ids(conn, table, names.tolist())
+            frame = frame.assign(label_id=np.array([ids[name] for name in names], dtype='int64')[codes])
+            before = conn.total_changes
+            conn.executemany(
+                f"INSERT OR IGNORE INTO {table} (day, amount_cents, {_label_key(table)}, content_hash) "
+                f"VALUES (?, ?, ?, ?)",
+                zip(frame['day'].tolist(), frame['amount_cents'].tolist(), frame['label_id'].tolist(),
+                    frame['content_hash'].tolist()))
+            inserted = conn.total_changes - before
+            if inserted == len(frame):
+                _merge_rollup_delta(conn, table, frame)
+            elif inserted:
+                # Some rows were duplicates; recompute the touched months from what actually landed.
+                months = pd.Series(frame['day'].to_numpy().astype('datetime64[D]').astype('datetime64[M]'))
+                _refresh_rollup_months(conn, table, sorted(months.dt.strftime('%Y-%m').unique()))
+            if inserted:
+                conn.execute("UPDATE table_versions SET version = version + 1 WHERE table_name = ?", (table,))
+            _create_rollup_triggers(conn, table, ROLLUP_LAYOUT)
+            _create_version_triggers(conn, table)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.execute(f"PRAGMA cache_size = {cache_size}")
+    return inserted
+
+
+@profiled
+def import_csv(source, table=None, date_col=None, amount_col=None, label_col=None, type_col=None,
+               date_format=None, default_label="🔧 Other", chunk_size=IMPORT_CHUNK_SIZE):
+    # Streams a CSV (path or file object) in chunks. Rows go to `table` if given, else by a
+    # Type column (Expense/Income, as written by export), else by the sign of the amount.
+    started = time.perf_counter()
+    report = {'rows_read': 0, 'inserted': 0, 'duplicates': 0, 'rejected': 0}
+    seen = {name: {'counts': pd.Series(dtype='int64')} for name in TRANSACTION_TABLES}
+    if table is not None:
+        _check_table(table)
+    columns = None
+    for chunk in pd.read_csv(source, chunksize=chunk_size, dtype=str, keep_default_na=False, na_values=['']):
+        if columns is None:
+            columns = {
+                'date': _pick_column(chunk.columns, 'date', date_col),
+                'amount': _pick_column(chunk.columns, 'amount', amount_col),
+                'label': _pick_column(chunk.columns, 'label', label_col),
+                'type': _pick_column(chunk.columns, 'type', type_col),
+            }
+            if not columns['date'] or not columns['amount']:
+                raise ValueError("Import file needs a date and an amount column")
+        routes, rejected = _normalize_import_chunk(chunk, columns, table, default_label, date_format)
+        report['rows_read'] += len(chunk)
+        report['rejected'] += rejected
+        for name, frame in routes.items():
+            frame = frame.assign(content_hash=_content_hashes(frame, seen[name]))
+            inserted = bulk_insert(name, frame)
+            report['inserted'] += inserted
+            report['duplicates'] += len(frame) - inserted
+    report['seconds'] = time.perf_counter() - started
+    report['rows_per_second'] = report['rows_read'] / report['seconds'] if report['seconds'] else 0.0
+    return report
@@ -0,0 +1,245 @@
+"""Timing spans, SQL statement timing and optional memory tracing for one run at a time.
+
+    with fc.trace('report', memory=True) as run:
+        fc.build_report('2024-05')
+    run.summary(), run.spans, run.queries
+
+Outside a trace every hook is a context variable lookup, so instrumented code costs nothing
+measurable when nobody is profiling.
+"""
+import contextvars
+import functools
+import json
+import os
+import sqlite3
+import threading
+import time
+import tracemalloc
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+
+# Profiling
+# A trace collects a tree of timed spans (sections of a run, data functions) and every SQL
+# statement executed inside it, with execute + fetch time and the rows it returned. With
+# memory=True each span also records the memory it left allocated and its peak, via
+# tracemalloc. Finished traces can be appended to a JSON lines file, one record per span or
+# statement, for offline analysis (FINANCE_PROFILE_LOG sets the default file).
+PROFILE_LOG = os.environ.get('FINANCE_PROFILE_LOG') or None
+PROFILE_MEMORY = os.environ.get('FINANCE_PROFILE_MEMORY', '0') == '1'
+PROFILE_MAX_QUERIES = int(os.environ.get('FINANCE_PROFILE_MAX_QUERIES', '5000'))
+PROFILE_SQL_CHARS = 240
+
+_active_trace = contextvars.ContextVar('finance_active_trace', default=None)
+_log_lock = threading.Lock()
+
+
+class Trace:
+    def __init__(self, name, memory=False, **attrs):
+        self.id = uuid.uuid4().hex[:12]
+        self.name = name
+        self.attrs = attrs
+        self.memory = memory
+        self.started_at = datetime.now().isoformat(timespec='milliseconds')
+        self.spans = []  # finished spans, children before their parents
+        self.queries = []
+        self.dropped_queries = 0
+        self._started = time.perf_counter()
+        self._stack = []
+
+    def _elapsed_ms(self, since=None):
+        return (time.perf_counter() - (self._started if since is None else since)) * 1000
+
+    def summary(self):
+        root = self.spans[-1] if self.spans else None
+        summary = {
+            'trace': self.id, 'name': self.name, 'started_at': self.started_at,
+            'ms': root['ms'] if root else self._elapsed_ms(),
+            'spans': len(self.spans),
+            'queries': len(self.queries) + self.dropped_queries,
+            'sql_ms': sum(query['ms'] for query in self.queries),
+            'rows': sum(query['rows'] for query in self.queries),
+        }
+        if self.memory and root:
+            summary['peak_kib'] = root['peak_kib']
+        return summary
+
+    def records(self):
+        # JSON-able dicts, one per span and per statement, tagged with the trace they belong to.
+        base = {'trace': self.id, 'run': self.name, 'started_at': self.started_at, **self.attrs}
+        for span in self.spans:
+            yield {**base, 'kind': 'span', **span}
+        for query in self.queries:
+            yield {**base, 'kind': 'sql', **query}
+
+    def write_jsonl(self, path):
+        lines = ''.join(json.dumps(record, default=str) + '\n' for record in self.records())
+        with _log_lock, open(path, 'a', encoding='utf-8') as log:
+            log.write(lines)
+
+
+def current_trace():
+    return _active_trace.get()
+
+
+@contextmanager
+def trace(name, memory=PROFILE_MEMORY, log=PROFILE_LOG, **attrs):
+    # Profiles everything run in the block (on this thread or context) as the trace `name`.
+    run = Trace(name, memory, **attrs)
+    started_tracing = memory and not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    token = _active_trace.set(run)
+    try:
+        with span(name):
+            yield run
+    finally:
+        _active_trace.reset(token)
+        if started_tracing:
+            tracemalloc.stop()
+        if log:
+            run.write_jsonl(log)
+
+
+@contextmanager
+def span(name, **attrs):
+    run = _active_trace.get()
+    if run is None:
+        yield
+        return
+    parent = run._stack[-1] if run._stack else None
+    frame = {'name': name, 'path': f"{parent['path']}/{name}" if parent else name, 'child_ms': 0.0,
+             'peak_seen': 0}
+    if run.memory:
+        current, peak = tracemalloc.get_traced_memory()
+        if parent:
+            parent['peak_seen'] = max(parent['peak_seen'], peak)
+        tracemalloc.reset_peak()
+        frame['memory_at_start'] = current
+    run._stack.append(frame)
+    started = time.perf_counter()
+    error = None
+    try:
+        yield
+    except BaseException as exc:
+        error = type(exc).__name__
+        raise
+    finally:
+        ms = (time.perf_counter() - started) * 1000
+        run._stack.pop()
+        record = {'name': name, 'path': frame['path'], 'depth': len(run._stack),
+                  'start_ms': round((started - run._started) * 1000, 3), 'ms': round(ms, 3),
+                  'self_ms': round(ms - frame['child_ms'], 3), **attrs}
+        if run.memory:
+            current, peak = tracemalloc.get_traced_memory()
+            record['mem_kib'] = round((current - frame['memory_at_start']) / 1024, 1)
+            record['peak_kib'] = round((max(peak, frame['peak_seen']) - frame['memory_at_start']) / 1024, 1)
+            if parent:
+                parent['peak_seen'] = max(parent['peak_seen'], peak, frame['peak_seen'])
+        if error:
+            record['error'] = error
+        if parent:
+            parent['child_ms'] += ms
+        run.spans.append(record)
+
+
+def profiled(fn=None, *, name=None):
+    # Decorator: calls to fn become spans named module.function while a trace is active.
+    if fn is None:
+        return functools.partial(profiled, name=name)
+    label = name or f"{fn.__module__.rsplit('.', 1)[-1]}.{fn.__qualname__}"
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        if _active_trace.get() is None:
+            return fn(*args, **kwargs)
+        with span(label):
+            return fn(*args, **kwargs)
+    return wrapper
+
+
+# SQL Timing
+# Pool connections are ProfiledConnections. Outside a trace they hand out plain cursors; inside
+# one, cursors time execute and every fetch and count the rows fetched, adding both to the
+# statement's record (pandas' read_sql_query fetches through the same cursor).
+class ProfiledCursor(sqlite3.Cursor):
+    _record = None
+
+    def _begin(self, sql):
+        run = _active_trace.get()
+        if run is None:
+            self._record = None
+            return
+        if len(run.queries) >= PROFILE_MAX_QUERIES:
+            run.dropped_queries += 1
+            self._record = None
+            return
+        self._record = {'sql': ' '.join(sql.split())[:PROFILE_SQL_CHARS], 'ms': 0.0, 'rows': 0,
+                        'span': run._stack[-1]['path'] if run._stack else None}
+        run.queries.append(self._record)
+
+    def _add(self, started, rows):
+        if self._record is not None:
+            self._record['ms'] = round(self._record['ms'] + (time.perf_counter() - started) * 1000, 3)
+            self._record['rows'] += rows
+
+    def execute(self, sql, parameters=()):
+        self._begin(sql)
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._add(started, 0)
+
+    def executemany(self, sql, seq_of_parameters):
+        self._begin(sql)
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self._add(started, max(self.rowcount, 0))
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = super().fetchone()
+        self._add(started, row is not None)
+        return row
+
+    def fetchmany(self, size=None):
+        started = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._add(started, len(rows))
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = super().fetchall()
+        self._add(started, len(rows))
+        return rows
+
+    def __next__(self):
+        started = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._add(started, 0)
+            raise
+        self._add(started, 1)
+        return row
+
+
+class ProfiledConnection(sqlite3.Connection):
+    def cursor(self, factory=None):
+        if factory is None:
+            factory = ProfiledCursor if _active_trace.get() is not None else sqlite3.Cursor
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        if _active_trace.get() is None:
+            return super().execute(sql, parameters)
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        if _active_trace.get() is None:
+            return super().executemany(sql, seq_of_parameters)
+        return self.cursor().executemany(sql, seq_of_parameters)
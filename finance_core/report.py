@@ -0,0 +1,39 @@
+"""Monthly summary of one database, as plain data for batch jobs and other frontends."""
+from datetime import datetime
+
+from .aggregates import get_category_totals, get_dashboard_totals, get_source_totals
+from .forecasts import forecast_all
+from .profiling import profiled
+from .storage import get_budget, get_savings_goals
+
+
+@profiled
+def build_report(month=None, horizon=3, top=5):
+    # Everything the dashboard's metric cards, budget panel and predictions show for `month`
+    # ('YYYY-MM', default the current month), as JSON-serializable dicts and lists.
+    month = month or datetime.now().strftime("%Y-%m")
+    totals = get_dashboard_totals(month)
+    budget = get_budget(month)
+    categories = get_category_totals(month)
+    sources = get_source_totals(month)
+    goals = get_savings_goals()
+    forecasts = forecast_all(horizon, origin=month)
+    forecasts = forecasts[forecasts['category'].isna()]
+
+    return {
+        'month': month,
+        'income': totals['monthly_income'],
+        'expenses': totals['monthly_expenses'],
+        'net': round(totals['monthly_income'] - totals['monthly_expenses'], 2),
+        'savings_rate': ((totals['monthly_income'] - totals['monthly_expenses']) / totals['monthly_income']
+                         if totals['monthly_income'] else None),
+        'all_time': {'income': totals['total_income'], 'expenses': totals['total_expenses'],
+                     'transactions': totals['income_count'] + totals['expense_count']},
+        'budget': {'limit': budget, 'used': totals['monthly_expenses'] / budget if budget else None},
+        'top_categories': categories.head(top)[['category', 'amount', 'count']].to_dict('records'),
+        'top_sources': sources.head(top)[['source', 'amount', 'count']].to_dict('records'),
+        'goals': [{'name': goal.goal_name, 'target': goal.target_amount, 'saved': goal.current_amount,
+                   'target_date': goal.target_date} for goal in goals.itertuples()],
+        'forecast': [{'type': row.type, 'month': row.month, 'forecast': row.forecast, 'lower': row.lower,
+                      'upper': row.upper} for row in forecasts.itertuples()],
+    }
@@ -0,0 +1,13 @@
+"""Sentiment scoring of free-text mood entries."""
+from .profiling import profiled
+
+
+# Enhanced Sentiment Analysis
+@profiled
+def analyze_sentiment(text):
+    if not text or not text.strip():
+        return 0.0
+    from textblob import TextBlob
+
+    blob = TextBlob(text)
+    return blob.sentiment.polarity
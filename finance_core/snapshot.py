@@ -0,0 +1,177 @@
+"""Process-wide, read-only columnar copies of the ledger tables, shared by every session."""
+import collections
+import itertools
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from .profiling import profiled
+from .storage import LABEL_TABLES, TRANSACTION_TABLES, _check_table, _label_key, get_connection, get_db_path, to_day
+
+# Ledger Snapshot
+# One set of NumPy columns per database and table (day, amount in cents, label id) instead of a
+# DataFrame per session and rerun. Rows past the rowid watermark are appended on refresh; only an
+# update or delete (the `rewrites` counter) or a rebuilt table forces a full reload. Columns start
+# at the smallest dtype that holds them and widen if a value ever outgrows it. Readers get
+# read-only views of the filled prefix, so every session aggregates the same memory.
+SNAPSHOT_MAX_LEDGERS = int(os.environ.get('FINANCE_SNAPSHOT_MAX_LEDGERS', '64'))
+SNAPSHOT_COLUMNS = {'day': np.int32, 'amount_cents': np.int32, 'label_id': np.int16}
+SNAPSHOT_MIN_CAPACITY = 1024
+
+
+class LedgerSnapshot:
+    def __init__(self, table):
+        self.table = table
+        self.label_key = _label_key(table)
+        self._reset()
+        self._state = None  # (max rowid, version, rewrites) the columns reflect
+        self._lock = threading.Lock()
+        self._stats = {'refreshes': 0, 'appends': 0, 'appended_rows': 0, 'reloads': 0}
+
+    def _reset(self):
+        # Fresh buffers rather than overwriting the old ones, which readers may still be viewing.
+        self._columns = {name: np.empty(0, dtype) for name, dtype in SNAPSHOT_COLUMNS.items()}
+        self._size = 0
+        self._sorted = True  # day is non-decreasing, so date ranges can use searchsorted
+
+    def _read_state(self, conn):
+        return conn.execute(
+            f"SELECT (SELECT IFNULL(MAX(rowid), 0) FROM {self.table}), version, rewrites "
+            f"FROM table_versions WHERE table_name = ?", (self.table,)).fetchone()
+
+    def refresh(self):
+        with self._lock, get_connection() as conn:
+            state = self._read_state(conn)
+            if state == self._state:
+                return self
+            self._stats['refreshes'] += 1
+            if self._state is not None and state[2] == self._state[2] and state[0] >= self._state[0]:
+                self._load(conn, self._state[0], state[0])
+                self._stats['appends'] += 1
+            else:
+                self._reset()
+                self._load(conn, 0, state[0])
+                self._stats['reloads'] += 1
+            self._state = state
+        return self
+
+    def _load(self, conn, watermark, max_rowid):
+        # Rows up to the max rowid the state was read with: one committed since then is left for
+        # the next refresh, which would otherwise append it a second time.
+        cursor = conn.execute(
+            f"SELECT day, amount_cents, IFNULL({self.label_key}, 0) FROM {self.table} "
+            f"WHERE rowid > ? AND rowid <= ? ORDER BY rowid", (watermark, max_rowid))
+        new = np.fromiter(itertools.chain.from_iterable(cursor), np.int64).reshape(-1, 3).T
+        count = new.shape[1]
+        if not count:
+            return
+        size = self._size + count
+        for name, values in zip(SNAPSHOT_COLUMNS, new):
+            column = self._columns[name]
+            dtype = column.dtype
+            while values.min() < np.iinfo(dtype).min or values.max() > np.iinfo(dtype).max:
+                dtype = np.dtype(f'int{dtype.itemsize * 16}')
+            if size > len(column) or dtype != column.dtype:
+                grown = np.empty(max(size, 2 * len(column), SNAPSHOT_MIN_CAPACITY), dtype)
+                grown[:self._size] = column[:self._size]
+                self._columns[name] = column = grown
+            column[self._size:size] = values
+        days = self._columns['day']
+        if self._sorted and size > 1:
+            self._sorted = bool(np.all(np.diff(days[max(self._size - 1, 0):size]) >= 0))
+        self._size = size
+        self._stats['appended_rows'] += count
+
+    def columns(self):
+        # Zero-copy, read-only views of the filled rows: {'day', 'amount_cents', 'label_id'}.
+        with self._lock:
+            views = {}
+            for name, column in self._columns.items():
+                view = column[:self._size]
+                view.flags.writeable = False
+                views[name] = view
+            return views, self._sorted
+
+    def select(self, start=None, end=None):
+        # Views (or, for an unsorted table, masked copies) of the rows with start <= day < end.
+        columns, is_sorted = self.columns()
+        if start is None and end is None:
+            return columns
+        days = columns['day']
+        low = -np.inf if start is None else to_day(start)
+        high = np.inf if end is None else to_day(end)
+        if is_sorted:
+            lo = 0 if start is None else int(np.searchsorted(days, low, 'left'))
+            hi = len(days) if end is None else int(np.searchsorted(days, high, 'left'))
+            return {name: column[lo:hi] for name, column in columns.items()}
+        mask = (days >= low) & (days < high)
+        return {name: column[mask] for name, column in columns.items()}
+
+    @property
+    def nbytes(self):
+        return sum(column.nbytes for column in self._columns.values())
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update(table=self.table, rows=self._size, nbytes=self.nbytes,
+                         dtypes={name: column.dtype.name for name, column in self._columns.items()})
+        return stats
+
+
+_snapshots = collections.OrderedDict()  # (db path, table) -> LedgerSnapshot, least recent first
+_snapshots_lock = threading.Lock()
+
+
+@profiled
+def get_snapshot(table):
+    # The current database's snapshot of `table`, brought up to date with any new rows.
+    _check_table(table)
+    key = (os.path.abspath(get_db_path()), table)
+    with _snapshots_lock:
+        snapshot = _snapshots.get(key)
+        if snapshot is None:
+            snapshot = _snapshots[key] = LedgerSnapshot(table)
+            while len(_snapshots) > SNAPSHOT_MAX_LEDGERS:
+                _snapshots.popitem(last=False)
+        _snapshots.move_to_end(key)
+    return snapshot.refresh()
+
+
+@profiled
+def snapshot_group_totals(table, start=None, end=None):
+    # get_group_totals for a date range, summed over the shared snapshot instead of in SQL.
+    group_col = TRANSACTION_TABLES[table]
+    rows = get_snapshot(table).select(start, end)
+    labels = rows['label_id']
+    if not len(labels):
+        return pd.DataFrame(columns=[group_col, 'display_name', 'icon', 'amount', 'count'])
+    counts = np.bincount(labels)
+    cents = np.bincount(labels, weights=rows['amount_cents'])
+    ids = np.flatnonzero(counts)
+    ids = ids[np.argsort(-cents[ids], kind='stable')]
+    with get_connection() as conn:
+        names = {row[0]: row[1:] for row in conn.execute(
+            f"SELECT id, name, display_name, icon FROM {LABEL_TABLES[table]}")}
+    missing = (None, None, None)
+    labels = [names.get(label_id, missing) for label_id in ids.tolist()]
+    return pd.DataFrame({
+        group_col: [label[0] for label in labels],
+        'display_name': [label[1] for label in labels],
+        'icon': [label[2] for label in labels],
+        'amount': cents[ids] / 100,
+        'count': counts[ids],
+    })
+
+
+def snapshot_stats():
+    with _snapshots_lock:
+        snapshots = list(_snapshots.items())
+    return [{'db_path': path, **snapshot.stats()} for (path, _), snapshot in snapshots]
+
+
+def clear_snapshots():
+    with _snapshots_lock:
+        _snapshots.clear()
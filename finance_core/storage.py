@@ -0,0 +1,946 @@
+"""SQLite storage: connection pool, schema migrations, writes and transaction queries."""
+import atexit
+import collections
+import contextvars
+import os
+import queue
+import sqlite3
+import sys
+import threading
+import time
+import weakref
+from concurrent.futures import Future
+from contextlib import contextmanager
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from .profiling import ProfiledConnection, profiled
+
+
+# Database Connection Pool
+DB_PATH = os.environ.get('FINANCE_DB_PATH', 'finance.db')
+DB_POOL_SIZE = int(os.environ.get('FINANCE_DB_POOL_SIZE', '8'))
+
+# Applied to every new connection: WAL lets readers run alongside a writer, and busy_timeout
+# waits on the write lock instead of failing immediately. NORMAL sync keeps the database
+# consistent but only syncs the WAL at checkpoints, so the latest commits can be lost on a power
+# loss or OS crash (not on an application crash). The write queue commits with FULL instead.
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA cache_size = -16000",
+    "PRAGMA mmap_size = 268435456",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA busy_timeout = 5000",
+    "PRAGMA foreign_keys = ON",
+)
+
+
+class ConnectionPool:
+    def __init__(self, db_path, max_size=DB_POOL_SIZE, pragmas=SQLITE_PRAGMAS):
+        self.db_path = db_path
+        self.max_size = max_size
+        self.pragmas = pragmas
+        self._idle = queue.LifoQueue(maxsize=max_size)
+        self._local = threading.local()
+        self._writes = None
+        self._lock = threading.Lock()
+        self._stats = {'opened': 0, 'reused': 0, 'closed': 0, 'checked_out': 0, 'peak_checked_out': 0}
+
+    def _open(self):
+        # Streamlit runs every rerun on a fresh thread, so connections are handed between threads.
+        conn = sqlite3.connect(self.db_path, timeout=5.0, check_same_thread=False, factory=ProfiledConnection)
+        for pragma in self.pragmas:
+            conn.execute(pragma)
+        with self._lock:
+            self._stats['opened'] += 1
+        return conn
+
+    def _checkout(self):
+        try:
+            conn = self._idle.get_nowait()
+            reused = True
+        except queue.Empty:
+            conn = self._open()
+            reused = False
+        with self._lock:
+            if reused:
+                self._stats['reused'] += 1
+            self._stats['checked_out'] += 1
+            self._stats['peak_checked_out'] = max(self._stats['peak_checked_out'], self._stats['checked_out'])
+        return conn
+
+    def _checkin(self, conn):
+        with self._lock:
+            self._stats['checked_out'] -= 1
+        if conn.in_transaction:
+            conn.rollback()
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+            with self._lock:
+                self._stats['closed'] += 1
+
+    @contextmanager
+    def connection(self):
+        # Nested calls on the same thread share the outer connection, so a helper called
+        # inside a transaction does not deadlock against it or commit it early. The frame
+        # running the outer `with` must still be on the stack: one paused in a generator
+        # would otherwise take the call's writes into a transaction nobody commits.
+        held = getattr(self._local, 'conn', None)
+        if held is not None:
+            frame = sys._getframe(2)  # the frame running this `with`, past contextlib's __enter__
+            while frame is not None and frame is not self._local.holder:
+                frame = frame.f_back
+            if frame is None:
+                raise RuntimeError("get_connection() called while a paused generator holds this thread's "
+                                   "connection; generators should read through get_streaming_connection()")
+            yield held
+            return
+        conn = self._checkout()
+        self._local.conn, self._local.holder = conn, sys._getframe(2)
+        try:
+            with conn:
+                yield conn
+        finally:
+            self._local.conn = self._local.holder = None
+            self._checkin(conn)
+
+    @contextmanager
+    def streaming_connection(self):
+        # A connection for a generator that yields while it reads. It is never bound to the
+        # thread, so calls made while the generator is paused use connections of their own.
+        conn = self._checkout()
+        try:
+            yield conn
+        finally:
+            self._checkin(conn)
+
+    @property
+    def writes(self):
+        # The pool's write queue, one writer per database file; its thread starts on first submit.
+        with self._lock:
+            if self._writes is None:
+                self._writes = WriteQueue(self)
+            return self._writes
+
+    def close(self):
+        # Commits writes still queued for this database, then closes the idle connections.
+        if self._writes is not None:
+            self._writes.close()
+        self.close_all()
+
+    def close_all(self):
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._stats['closed'] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats['idle'] = self._idle.qsize()
+        stats['db_path'] = self.db_path
+        stats['max_size'] = self.max_size
+        return stats
+
+
+_pool = ConnectionPool(DB_PATH)
+_pool_lock = threading.Lock()
+# Pool that get_connection() uses instead of the default one: bound for a block of code with
+# use_pool(), or else returned by the resolver, e.g. the tenant of the current dashboard session.
+_active_pool = contextvars.ContextVar('active_pool', default=None)
+_pool_resolver = None
+
+
+def configure_db(db_path=None, max_size=None):
+    global _pool, DB_PATH
+    with _pool_lock:
+        _pool.close()  # writes already queued belong to the database they were submitted against
+        DB_PATH = db_path or DB_PATH
+        _pool = ConnectionPool(DB_PATH, max_size or DB_POOL_SIZE)
+    return _pool
+
+
+def set_pool_resolver(resolver):
+    # resolver() -> ConnectionPool or None (use the default database); called on every lookup.
+    global _pool_resolver
+    _pool_resolver = resolver
+
+
+@contextmanager
+def use_pool(pool):
+    token = _active_pool.set(pool)
+    try:
+        yield pool
+    finally:
+        _active_pool.reset(token)
+
+
+def current_pool():
+    pool = _active_pool.get()
+    if pool is None and _pool_resolver is not None:
+        pool = _pool_resolver()
+    return pool or _pool
+
+
+def get_connection():
+    return current_pool().connection()
+
+
+def get_streaming_connection():
+    return current_pool().streaming_connection()
+
+
+def get_db_path():
+    return current_pool().db_path
+
+
+def close_db():
+    # Commits queued writes and closes the idle connections, e.g. once a batch job is done with a file.
+    _pool.close()
+
+
+def pool_stats():
+    return current_pool().stats()
+
+
+# Schema Migrations
+# Transaction tables and the column each one is grouped by on the dashboard.
+TRANSACTION_TABLES = {'expenses': 'category', 'income': 'source'}
+# Lookup table holding each transaction table's labels; transactions store its integer id
+# in {category,source}_id.
+LABEL_TABLES = {'expenses': 'categories', 'income': 'sources'}
+EXPENSE_CATEGORIES = ["🛒 Groceries", "⚡ Utilities", "🎬 Entertainment", "✈️ Travel", "🏠 Housing", "🚗 Transportation",
+                      "👕 Clothing", "🏥 Healthcare", "📚 Education", "🍽️ Dining", "📱 Technology", "🔧 Other"]
+INCOME_SOURCES = ["💼 Salary", "🏢 Freelance", "📈 Investment", "🎁 Gift", "💸 Bonus", "🏠 Rental", "💰 Side Hustle",
+                  "🔧 Other"]
+
+
+def _label_key(table):
+    return f"{TRANSACTION_TABLES[table]}_id"
+
+
+def _split_label(name):
+    # "🛒 Groceries" -> ("🛒", "Groceries"); a leading token with no letters or digits is the icon.
+    icon, _, rest = name.strip().partition(' ')
+    if rest and not any(ch.isalnum() for ch in icon):
+        return icon, rest.strip()
+    return '', name.strip()
+
+
+def _migration_base_tables(conn):
+    conn.execute('''CREATE TABLE IF NOT EXISTS expenses (id INTEGER PRIMARY KEY, date TEXT, amount REAL, category TEXT)''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS income (id INTEGER PRIMARY KEY, date TEXT, amount REAL, source TEXT)''')
+    conn.execute(
+        '''CREATE TABLE IF NOT EXISTS sentiment (id INTEGER PRIMARY KEY, date TEXT, sentiment_score REAL, source TEXT)''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS budget (id INTEGER PRIMARY KEY, month TEXT, budget_limit REAL)''')
+    conn.execute(
+        '''CREATE TABLE IF NOT EXISTS savings_goals (id INTEGER PRIMARY KEY, goal_name TEXT, target_amount REAL, current_amount REAL, target_date TEXT)''')
+
+
+def _migration_lookup_indexes(conn):
+    # Older databases may hold several rows per month/goal; keep the most recent one
+    # so the unique indexes can be built. Contributions were added to every row with the goal's
+    # name, so the oldest duplicate holds the most saved: the kept goal takes the largest saved
+    # and target amounts before the others go.
+    conn.execute("DELETE FROM budget WHERE id NOT IN (SELECT MAX(id) FROM budget GROUP BY month)")
+    conn.execute('''UPDATE savings_goals
+                    SET current_amount = (SELECT MAX(current_amount) FROM savings_goals dup
+                                          WHERE dup.goal_name = savings_goals.goal_name),
+                        target_amount = (SELECT MAX(target_amount) FROM savings_goals dup
+                                         WHERE dup.goal_name = savings_goals.goal_name)
+                    WHERE id IN (SELECT MAX(id) FROM savings_goals GROUP BY goal_name HAVING COUNT(*) > 1)''')
+    conn.execute("DELETE FROM savings_goals WHERE id NOT IN (SELECT MAX(id) FROM savings_goals GROUP BY goal_name)")
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_budget_month ON budget (month)")
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_savings_goals_name ON savings_goals (goal_name)")
+    # Covering indexes: date range sums and per-category/source sums read only the index.
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_expenses_date ON expenses (date, amount)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_income_date ON income (date, amount)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_expenses_category ON expenses (category, amount)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_income_source ON income (source, amount)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_sentiment_date ON sentiment (date)")
+
+
+# Maintained by triggers on expenses/income: one row per (month, type, category) with
+# sum/count/min/max, so time-series views read O(months) rows instead of O(transactions).
+ROLLUP_TYPES = {'expenses': 'expense', 'income': 'income'}
+
+# Column layouts the rollup SQL is generated for. Migration 3 built the rollup over the original
+# TEXT date / REAL amount columns; migration 5 regenerates it over day numbers and cents.
+# Migration 8 keys both transactions and rollup rows on integer label ids.
+# {row} is 'NEW.', 'OLD.' or '' and {month} a 'YYYY-MM' expression; 'key' is the transaction
+# column rows are grouped by, 'label' the rollup column it lands in and 'null' its value for NULL.
+_TEXT_ROLLUP_LAYOUT = {
+    'month': "substr({row}date, 1, 7)",
+    # 'YYYY-MM-32' sorts after every day of the month, so the range stays an index scan
+    'range': "date >= {month} || '-01' AND date < {month} || '-32'",
+    'amount': 'amount', 'total': 'total', 'min': 'min_amount', 'max': 'max_amount',
+    'key': '{group_col}', 'label': 'category', 'null': "''",
+}
+_COMPACT_ROLLUP_LAYOUT = {
+    'month': "strftime('%Y-%m', {row}day * 86400, 'unixepoch')",
+    'range': "day >= CAST(strftime('%s', {month} || '-01') AS INTEGER) / 86400 "
+             "AND day < CAST(strftime('%s', {month} || '-01', '+1 month') AS INTEGER) / 86400",
+    'amount': 'amount_cents', 'total': 'total_cents', 'min': 'min_cents', 'max': 'max_cents',
+    'key': '{group_col}', 'label': 'category', 'null': "''",
+}
+_KEYED_ROLLUP_LAYOUT = dict(_COMPACT_ROLLUP_LAYOUT, key='{group_col}_id', label='label_id', null='0')
+ROLLUP_LAYOUT = _KEYED_ROLLUP_LAYOUT
+
+
+def _rollup_refresh_sql(table, row, layout):
+    # Recompute one (month, category) group from raw rows. Used when a row leaves a group,
+    # since MIN/MAX cannot be decremented.
+    key = layout['key'].format(group_col=TRANSACTION_TABLES[table])
+    label, null = layout['label'], layout['null']
+    month = layout['month'].format(row=f"{row}.")
+    amount = layout['amount']
+    return f'''
+            DELETE FROM monthly_rollup
+                WHERE month = {month} AND type = '{ROLLUP_TYPES[table]}' AND {label} = IFNULL({row}.{key}, {null});
+            INSERT INTO monthly_rollup (month, type, {label}, {layout['total']}, count, {layout['min']}, {layout['max']})
+                SELECT {month}, '{ROLLUP_TYPES[table]}', IFNULL({row}.{key}, {null}),
+                       SUM({amount}), COUNT(*), MIN({amount}), MAX({amount})
+                FROM {table}
+                WHERE {layout['range'].format(month=month)} AND {key} IS {row}.{key}
+                HAVING COUNT(*) > 0;'''
+
+
+def _rollup_insert_sql(table, layout):
+    key = layout['key'].format(group_col=TRANSACTION_TABLES[table])
+    label, null = layout['label'], layout['null']
+    total, low, high = layout['total'], layout['min'], layout['max']
+    amount = f"NEW.{layout['amount']}"
+    return f'''
+            INSERT INTO monthly_rollup (month, type, {label}, {total}, count, {low}, {high})
+                VALUES ({layout['month'].format(row='NEW.')}, '{ROLLUP_TYPES[table]}', IFNULL(NEW.{key}, {null}),
+                        {amount}, 1, {amount}, {amount})
+                ON CONFLICT (month, type, {label}) DO UPDATE SET
+                    {total} = {total} + excluded.{total},
+                    count = count + 1,
+                    {low} = MIN({low}, excluded.{low}),
+                    {high} = MAX({high}, excluded.{high});'''
+
+
+def _create_rollup_triggers(conn, table, layout):
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_{table}_rollup_insert AFTER INSERT ON {table}
+        BEGIN{_rollup_insert_sql(table, layout)}
+        END''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_{table}_rollup_delete AFTER DELETE ON {table}
+        BEGIN{_rollup_refresh_sql(table, 'OLD', layout)}
+        END''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_{table}_rollup_update AFTER UPDATE ON {table}
+        BEGIN{_rollup_refresh_sql(table, 'OLD', layout)}{_rollup_refresh_sql(table, 'NEW', layout)}
+        END''')
+
+
+def _rebuild_monthly_rollup(conn, layout=ROLLUP_LAYOUT):
+    conn.execute("DELETE FROM monthly_rollup")
+    month = layout['month'].format(row='')
+    amount = layout['amount']
+    label, null = layout['label'], layout['null']
+    for table, rollup_type in ROLLUP_TYPES.items():
+        key = layout['key'].format(group_col=TRANSACTION_TABLES[table])
+        conn.execute(f'''
+            INSERT INTO monthly_rollup (month, type, {label}, {layout['total']}, count, {layout['min']}, {layout['max']})
+            SELECT {month}, '{rollup_type}', IFNULL({key}, {null}), SUM({amount}), COUNT(*), MIN({amount}), MAX({amount})
+            FROM {table} GROUP BY {month}, {key}''')
+    return conn.execute("SELECT COUNT(*) FROM monthly_rollup").fetchone()[0]
+
+
+def _migration_monthly_rollup(conn):
+    conn.execute('''CREATE TABLE IF NOT EXISTS monthly_rollup (
+        month TEXT NOT NULL, type TEXT NOT NULL, category TEXT NOT NULL,
+        total REAL NOT NULL, count INTEGER NOT NULL, min_amount REAL, max_amount REAL,
+        PRIMARY KEY (month, type, category))''')
+    for table in ROLLUP_TYPES:
+        _create_rollup_triggers(conn, table, _TEXT_ROLLUP_LAYOUT)
+    _rebuild_monthly_rollup(conn, _TEXT_ROLLUP_LAYOUT)
+
+
+# Every write to a data table bumps its counter; together with MAX(rowid) this gives a cheap
+# fingerprint that caches use to tell whether a table changed.
+VERSIONED_TABLES = ('expenses', 'income', 'sentiment', 'budget', 'savings_goals')
+
+
+def _create_version_triggers(conn, table, track_rewrites=False):
+    # With track_rewrites (migration 9 on), updates and deletes also bump `rewrites`, so a reader
+    # holding rows up to a rowid watermark can tell appends, which it can read incrementally, from
+    # changes to rows it already has.
+    for event in ('INSERT', 'UPDATE', 'DELETE'):
+        bump = "version = version + 1"
+        if track_rewrites and event != 'INSERT':
+            bump += ", rewrites = rewrites + 1"
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_version_{event.lower()} AFTER {event} ON {table}
+            BEGIN
+                UPDATE table_versions SET {bump} WHERE table_name = '{table}';
+            END''')
+
+
+def _migration_table_versions(conn):
+    conn.execute('''CREATE TABLE IF NOT EXISTS table_versions (table_name TEXT PRIMARY KEY, version INTEGER NOT NULL DEFAULT 0)''')
+    for table in VERSIONED_TABLES:
+        conn.execute("INSERT OR IGNORE INTO table_versions (table_name, version) VALUES (?, 0)", (table,))
+        _create_version_triggers(conn, table)
+
+
+def _migration_compact_storage(conn):
+    # Transactions move to integer day numbers (days since 1970-01-01) and integer cents:
+    # smaller rows and indexes, exact sums, and reads that need no date parsing.
+    for table, group_col in TRANSACTION_TABLES.items():
+        conn.execute(f'''CREATE TABLE {table}_compact (id INTEGER PRIMARY KEY, day INTEGER NOT NULL,
+                        amount_cents INTEGER NOT NULL, {group_col} TEXT)''')
+        conn.execute(f'''INSERT INTO {table}_compact (id, day, amount_cents, {group_col})
+                        SELECT id, CAST(julianday(date) - 2440587.5 AS INTEGER), CAST(ROUND(amount * 100) AS INTEGER),
+                               {group_col}
+                        FROM {table}''')
+        conn.execute(f"DROP TABLE {table}")  # also drops its indexes and triggers
+        conn.execute(f"ALTER TABLE {table}_compact RENAME TO {table}")
+        conn.execute(f"CREATE INDEX idx_{table}_day ON {table} (day, amount_cents)")
+        conn.execute(f"CREATE INDEX idx_{table}_{group_col} ON {table} ({group_col}, amount_cents)")
+        conn.execute("UPDATE table_versions SET version = version + 1 WHERE table_name = ?", (table,))
+
+    conn.execute("DROP TABLE monthly_rollup")
+    conn.execute('''CREATE TABLE monthly_rollup (
+        month TEXT NOT NULL, type TEXT NOT NULL, category TEXT NOT NULL,
+        total_cents INTEGER NOT NULL, count INTEGER NOT NULL, min_cents INTEGER, max_cents INTEGER,
+        PRIMARY KEY (month, type, category))''')
+    for table in TRANSACTION_TABLES:
+        _create_rollup_triggers(conn, table, _COMPACT_ROLLUP_LAYOUT)
+        _create_version_triggers(conn, table)
+    _rebuild_monthly_rollup(conn, _COMPACT_ROLLUP_LAYOUT)
+
+
+def _migration_content_hash(conn):
+    # Imported rows carry a content hash so re-importing a statement skips rows already loaded.
+    # Rows entered by hand leave it NULL and are not constrained.
+    for table in TRANSACTION_TABLES:
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN content_hash INTEGER")
+        conn.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS idx_{table}_content_hash ON {table} (content_hash) "
+                     f"WHERE content_hash IS NOT NULL")
+
+
+def _migration_day_id_index(conn):
+    # (day, id, amount_cents): still covers date-range sums, and its order matches the
+    # (date, id) ordering used by the recent-transactions and history queries.
+    for table in TRANSACTION_TABLES:
+        conn.execute(f"DROP INDEX IF EXISTS idx_{table}_day")
+        conn.execute(f"CREATE INDEX idx_{table}_day ON {table} (day, id, amount_cents)")
+
+
+def _migration_label_tables(conn):
+    # Categories and sources move to small lookup tables (name, display name, icon) and each
+    # transaction stores an integer key: group-bys run on ints and display text is a join on a
+    # few rows rather than string work per transaction.
+    for table, group_col in TRANSACTION_TABLES.items():
+        lookup = LABEL_TABLES[table]
+        conn.execute(f'''CREATE TABLE {lookup} (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE,
+                        display_name TEXT NOT NULL, icon TEXT NOT NULL DEFAULT '')''')
+        defaults = EXPENSE_CATEGORIES if table == 'expenses' else INCOME_SOURCES
+        existing = [row[0] for row in conn.execute(
+            f"SELECT DISTINCT {group_col} FROM {table} WHERE {group_col} IS NOT NULL ORDER BY {group_col}")]
+        _label_ids(conn, table, defaults + existing)
+
+        key = _label_key(table)
+        conn.execute(f'''CREATE TABLE {table}_keyed (id INTEGER PRIMARY KEY, day INTEGER NOT NULL,
+                        amount_cents INTEGER NOT NULL, {key} INTEGER REFERENCES {lookup} (id), content_hash INTEGER)''')
+        conn.execute(f'''INSERT INTO {table}_keyed (id, day, amount_cents, {key}, content_hash)
+                        SELECT t.id, t.day, t.amount_cents, l.id, t.content_hash
+                        FROM {table} t LEFT JOIN {lookup} l ON l.name = t.{group_col}''')
+        conn.execute(f"DROP TABLE {table}")
+        conn.execute(f"ALTER TABLE {table}_keyed RENAME TO {table}")
+        conn.execute(f"CREATE INDEX idx_{table}_day ON {table} (day, id, amount_cents)")
+        conn.execute(f"CREATE INDEX idx_{table}_{key} ON {table} ({key}, amount_cents)")
+        conn.execute(f"CREATE UNIQUE INDEX idx_{table}_content_hash ON {table} (content_hash) "
+                     f"WHERE content_hash IS NOT NULL")
+        conn.execute("UPDATE table_versions SET version = version + 1 WHERE table_name = ?", (table,))
+
+    conn.execute("DROP TABLE monthly_rollup")
+    conn.execute('''CREATE TABLE monthly_rollup (
+        month TEXT NOT NULL, type TEXT NOT NULL, label_id INTEGER NOT NULL,
+        total_cents INTEGER NOT NULL, count INTEGER NOT NULL, min_cents INTEGER, max_cents INTEGER,
+        PRIMARY KEY (month, type, label_id))''')
+    for table in TRANSACTION_TABLES:
+        _create_rollup_triggers(conn, table, _KEYED_ROLLUP_LAYOUT)
+        _create_version_triggers(conn, table)
+    _rebuild_monthly_rollup(conn, _KEYED_ROLLUP_LAYOUT)
+
+
+def _migration_rewrite_counters(conn):
+    conn.execute("ALTER TABLE table_versions ADD COLUMN rewrites INTEGER NOT NULL DEFAULT 0")
+    for table in VERSIONED_TABLES:
+        conn.execute(f"DROP TRIGGER IF EXISTS trg_{table}_version_update")
+        conn.execute(f"DROP TRIGGER IF EXISTS trg_{table}_version_delete")
+        _create_version_triggers(conn, table, track_rewrites=True)
+
+
+# (version, description, function) - append new migrations, never edit applied ones
+MIGRATIONS = [
+    (1, "base tables", _migration_base_tables),
+    (2, "lookup, date and covering indexes", _migration_lookup_indexes),
+    (3, "monthly rollup table and triggers", _migration_monthly_rollup),
+    (4, "per-table write counters", _migration_table_versions),
+    (5, "integer day and cents storage for transactions", _migration_compact_storage),
+    (6, "content hash for import de-duplication", _migration_content_hash),
+    (7, "transaction (day, id) ordering index", _migration_day_id_index),
+    (8, "category and source lookup tables", _migration_label_tables),
+    (9, "update/delete counters for append-only readers", _migration_rewrite_counters),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+_migrated_paths = set()
+_migrate_lock = threading.Lock()
+
+
+def get_schema_version(conn):
+    conn.execute('''CREATE TABLE IF NOT EXISTS schema_version (version INTEGER PRIMARY KEY, description TEXT, applied_at TEXT)''')
+    row = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    return row[0] or 0
+
+
+def migrate(conn):
+    applied = []
+    for version, description, migration in MIGRATIONS:
+        if version <= get_schema_version(conn):
+            continue
+        # IMMEDIATE takes the write lock up front, so a concurrent session that lost the
+        # race sees the new version on re-check instead of applying it twice.
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if version > get_schema_version(conn):
+                migration(conn)
+                conn.execute("INSERT INTO schema_version (version, description, applied_at) VALUES (?, ?, ?)",
+                             (version, description, datetime.now().isoformat(timespec='seconds')))
+                applied.append(version)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    return applied
+
+
+# Database Setup
+@profiled
+def init_db():
+    db_path = get_db_path()
+    with _migrate_lock:
+        if db_path in _migrated_paths:
+            return
+        with get_connection() as conn:
+            migrate(conn)
+        _migrated_paths.add(db_path)
+
+
+# Transactions store dates as days since 1970-01-01 and amounts as integer cents.
+EPOCH_ORDINAL = datetime(1970, 1, 1).toordinal()
+
+
+def to_day(value):
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    if isinstance(value, str):
+        value = datetime.strptime(value[:10], '%Y-%m-%d')
+    return value.toordinal() - EPOCH_ORDINAL
+
+
+def to_cents(amount):
+    return int(round(float(amount) * 100))
+
+
+def _label_ids(conn, table, names):
+    # {name: id} for the given label names, adding any the lookup table does not hold yet.
+    lookup = LABEL_TABLES[table]
+    names = [name for name in dict.fromkeys(names) if name is not None]
+    conn.executemany(f"INSERT OR IGNORE INTO {lookup} (name, icon, display_name) VALUES (?, ?, ?)",
+                     ((name, *_split_label(name)) for name in names))
+    ids = {}
+    for i in range(0, len(names), 500):
+        batch = names[i:i + 500]
+        ids.update(conn.execute(f"SELECT name, id FROM {lookup} WHERE name IN ({', '.join('?' * len(batch))})",
+                                batch).fetchall())
+    return ids
+
+
+def get_label_ids(table, names):
+    _check_table(table)
+    with get_connection() as conn:
+        return _label_ids(conn, table, names)
+
+
+@profiled
+def add_expense(date, amount, category):
+    with get_connection() as conn:
+        conn.execute("INSERT INTO expenses (day, amount_cents, category_id) VALUES (?, ?, ?)",
+                     (to_day(date), to_cents(amount), _label_ids(conn, 'expenses', [category]).get(category)))
+
+
+@profiled
+def add_income(date, amount, source):
+    with get_connection() as conn:
+        conn.execute("INSERT INTO income (day, amount_cents, source_id) VALUES (?, ?, ?)",
+                     (to_day(date), to_cents(amount), _label_ids(conn, 'income', [source]).get(source)))
+
+
+@profiled
+def add_sentiment(date, sentiment_score, source):
+    with get_connection() as conn:
+        conn.execute("INSERT INTO sentiment (date, sentiment_score, source) VALUES (?, ?, ?)",
+                     (date, sentiment_score, source))
+
+
+@profiled
+def set_budget(month, budget_limit):
+    with get_connection() as conn:
+        conn.execute(
+            "INSERT INTO budget (month, budget_limit) VALUES (?, ?) "
+            "ON CONFLICT (month) DO UPDATE SET budget_limit = excluded.budget_limit",
+            (month, budget_limit))
+
+
+@profiled
+def add_savings_goal(goal_name, target_amount, target_date):
+    with get_connection() as conn:
+        conn.execute(
+            "INSERT INTO savings_goals (goal_name, target_amount, current_amount, target_date) VALUES (?, ?, 0, ?) "
+            "ON CONFLICT (goal_name) DO UPDATE SET target_amount = excluded.target_amount, "
+            "target_date = excluded.target_date",
+            (goal_name, target_amount, target_date))
+
+
+@profiled
+def update_savings_goal(goal_name, amount):
+    with get_connection() as conn:
+        conn.execute("UPDATE savings_goals SET current_amount = current_amount + ? WHERE goal_name = ?",
+                     (amount, goal_name))
+
+
+# Write Queue
+# Session writes are handed to one writer thread instead of each taking SQLite's write lock.
+# Whatever queued up while the previous batch was committing goes into the next transaction
+# (group commit), applied in submission order with a savepoint per write so one failing write
+# rolls back alone. A write's future resolves only after the transaction holding it committed,
+# and batches commit with synchronous = FULL, so an acknowledged write survives a power loss:
+# the WAL is synced once per batch rather than once per write.
+WRITE_QUEUE_SIZE = int(os.environ.get('FINANCE_WRITE_QUEUE_SIZE', '10000'))
+WRITE_BATCH_SIZE = int(os.environ.get('FINANCE_WRITE_BATCH_SIZE', '500'))
+# Extra time the writer waits for a batch to fill; 0 only groups writes that are already queued.
+WRITE_BATCH_WAIT = float(os.environ.get('FINANCE_WRITE_BATCH_WAIT_MS', '0')) / 1000
+WRITE_TIMEOUT = float(os.environ.get('FINANCE_WRITE_TIMEOUT', '10'))
+_STOP = object()
+_running_queues = weakref.WeakSet()
+
+
+class WriteQueue:
+    def __init__(self, pool, max_depth=WRITE_QUEUE_SIZE, batch_size=WRITE_BATCH_SIZE, batch_wait=WRITE_BATCH_WAIT):
+        self.pool = pool
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self._queue = queue.Queue(maxsize=max_depth)
+        self._thread = None
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    def reset_stats(self):
+        with self._lock:
+            self._stats = {'submitted': 0, 'committed': 0, 'failed': 0, 'batches': 0, 'peak_depth': 0,
+                           'busy_errors': 0, 'lock_wait_ms_total': 0.0}
+            self._commit_ms = collections.deque(maxlen=1000)  # BEGIN to COMMIT, per batch
+            self._latency_ms = collections.deque(maxlen=1000)  # submit to acknowledgement, per write
+            self._queue_wait_ms = collections.deque(maxlen=1000)  # submit to its batch starting, per write
+            self._lock_wait_ms = collections.deque(maxlen=1000)  # waiting for SQLite's write lock, per batch
+
+    def submit(self, fn, *args, **kwargs):
+        # fn runs on the writer thread, where get_connection() returns the batch's connection;
+        # it must not begin, commit or roll back itself. Returns a concurrent.futures.Future.
+        future = Future()
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='write-queue', daemon=True)
+                self._thread.start()
+                _running_queues.add(self)
+        try:
+            # A full queue blocks the sender, so a burst slows writers down instead of growing memory.
+            self._queue.put((fn, args, kwargs, future, time.perf_counter()), timeout=WRITE_TIMEOUT)
+        except queue.Full:
+            raise RuntimeError(f"Write queue is full ({self._queue.maxsize} pending writes)") from None
+        with self._lock:
+            self._stats['submitted'] += 1
+            self._stats['peak_depth'] = max(self._stats['peak_depth'], self._queue.qsize())
+        return future
+
+    def _run(self):
+        _active_pool.set(self.pool)  # the writer thread's own context: every write goes to this database
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                self._queue.task_done()
+                return
+            batch = [item]
+            deadline = time.perf_counter() + self.batch_wait
+            stop = False
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.perf_counter()))
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+            self._commit(batch)
+            for _ in range(len(batch) + stop):
+                self._queue.task_done()
+            if stop:
+                return
+
+    def _commit(self, batch):
+        # Writes cancelled while queued are dropped; the rest can no longer be cancelled.
+        batch = [item for item in batch if item[3].set_running_or_notify_cancel()]
+        if not batch:
+            return
+        outcomes = []
+        started = time.perf_counter()
+        locked = None
+        busy = False
+        try:
+            with get_connection() as conn:
+                # The safety level can only change outside a transaction; the connection goes back
+                # to the pool with its own level.
+                synchronous = conn.execute("PRAGMA synchronous").fetchone()[0]
+                conn.execute("PRAGMA synchronous = FULL")
+                try:
+                    # Blocks (up to the connection timeout) while another connection or process holds the lock.
+                    conn.execute("BEGIN IMMEDIATE")
+                    locked = time.perf_counter()
+                    for fn, args, kwargs, _, _ in batch:
+                        conn.execute("SAVEPOINT queued_write")
+                        try:
+                            outcomes.append((fn(*args, **kwargs), None))
+                        except Exception as exc:
+                            conn.execute("ROLLBACK TO queued_write")
+                            outcomes.append((None, exc))
+                        conn.execute("RELEASE queued_write")
+                    conn.commit()
+                finally:
+                    if conn.in_transaction:
+                        conn.rollback()
+                    conn.execute(f"PRAGMA synchronous = {synchronous}")
+        except Exception as exc:
+            outcomes = [(None, exc)] * len(batch)  # nothing in the batch was committed
+            busy = isinstance(exc, sqlite3.OperationalError) and 'locked' in str(exc)
+        committed = time.perf_counter()
+        lock_wait_ms = ((locked or committed) - started) * 1000
+        failed = 0
+        for (_, _, _, future, submitted), (result, exc) in zip(batch, outcomes):
+            if exc is None:
+                future.set_result(result)
+            else:
+                future.set_exception(exc)
+                failed += 1
+            self._latency_ms.append((committed - submitted) * 1000)
+            self._queue_wait_ms.append((started - submitted) * 1000)
+        with self._lock:
+            self._stats['batches'] += 1
+            self._stats['committed'] += len(batch) - failed
+            self._stats['failed'] += failed
+            self._stats['busy_errors'] += busy
+            self._stats['lock_wait_ms_total'] += lock_wait_ms
+            self._commit_ms.append((committed - started) * 1000)
+            self._lock_wait_ms.append(lock_wait_ms)
+
+    def flush(self):
+        # Waits until every write submitted so far has been committed or failed.
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.join()
+
+    def close(self):
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None and thread.is_alive():
+            self._queue.put(_STOP)
+            thread.join()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            samples_by_name = {'commit_ms': sorted(self._commit_ms), 'latency_ms': sorted(self._latency_ms),
+                               'queue_wait_ms': sorted(self._queue_wait_ms), 'lock_wait_ms': sorted(self._lock_wait_ms)}
+        stats['depth'] = self._queue.qsize()
+        stats['mean_batch'] = (stats['committed'] + stats['failed']) / stats['batches'] if stats['batches'] else 0.0
+        for name, samples in samples_by_name.items():
+            for q in (50, 95, 99):
+                stats[f'{name}_p{q}'] = samples[min(len(samples) - 1, len(samples) * q // 100)] if samples else 0.0
+            stats[f'{name}_max'] = samples[-1] if samples else 0.0
+        return stats
+
+
+@atexit.register
+def _close_write_queues():
+    # Writes still queued at interpreter exit are committed rather than dropped with the daemon threads.
+    for write_queue in list(_running_queues):
+        write_queue.close()
+
+
+def submit_write(fn, *args, **kwargs):
+    return current_pool().writes.submit(fn, *args, **kwargs)
+
+
+def flush_writes():
+    current_pool().writes.flush()
+
+
+def write_queue_stats():
+    return current_pool().writes.stats()
+
+
+# Transaction Queries
+# Filters are pushed into parameterized SQL on the indexed columns, so memory and latency scale
+# with the slice requested rather than with total history.
+QUERY_CHUNK_SIZE = 50_000
+
+
+def _check_table(table):
+    if table not in TRANSACTION_TABLES:
+        raise ValueError(f"Unknown transaction table: {table}")
+    return TRANSACTION_TABLES[table]
+
+
+def _transaction_filter(table, start=None, end=None, labels=None, min_amount=None, max_amount=None):
+    # start is inclusive and end exclusive; both accept 'YYYY-MM-DD', date/datetime or day numbers.
+    # Amount bounds are in dollars, labels are categories (expenses) or sources (income).
+    _check_table(table)
+    clauses, params = [], []
+    if start is not None:
+        clauses.append("day >= ?")
+        params.append(to_day(start))
+    if end is not None:
+        clauses.append("day < ?")
+        params.append(to_day(end))
+    if labels is not None:
+        labels = list(labels)
+        clauses.append(f"{_label_key(table)} IN (SELECT id FROM {LABEL_TABLES[table]} "
+                       f"WHERE name IN ({', '.join('?' * len(labels))}))")
+        params += labels
+    if min_amount is not None:
+        clauses.append("amount_cents >= ?")
+        params.append(to_cents(min_amount))
+    if max_amount is not None:
+        clauses.append("amount_cents <= ?")
+        params.append(to_cents(max_amount))
+    return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+
+def _typed_transactions(df):
+    # Day numbers and cents convert arithmetically; no string parsing involved.
+    if 'date' in df:
+        df['date'] = pd.to_datetime(df['date'].astype('int64'), unit='D')
+    if 'amount_cents' in df:
+        df['amount_cents'] = df['amount_cents'].astype('int64')
+        if 'amount' in df:
+            df['amount'] = df['amount_cents'] / 100
+    return df
+
+
+@profiled
+def get_labels(table):
+    _check_table(table)
+    with get_connection() as conn:
+        return pd.read_sql_query(f"SELECT id, name, display_name, icon FROM {LABEL_TABLES[table]} ORDER BY id", conn)
+
+
+def _decode_labels(df, table, labels):
+    # Label ids -> Categorical over the lookup names; the strings exist once per label, not per row.
+    group_col = TRANSACTION_TABLES[table]
+    if group_col in df:
+        codes = pd.Index(labels['id']).get_indexer(df[group_col])
+        df[group_col] = pd.Categorical.from_codes(codes, categories=labels['name'])
+    return df
+
+
+def _iter_transaction_chunks(table, query, params, columns, chunksize):
+    labels = get_labels(table)
+    with get_streaming_connection() as conn:
+        for chunk in pd.read_sql_query(query, conn, params=params, chunksize=chunksize):
+            yield _decode_labels(_typed_transactions(chunk), table, labels)[columns]
+
+
+@profiled
+def query_transactions(table, start=None, end=None, labels=None, min_amount=None, max_amount=None,
+                       columns=None, limit=None, newest_first=False, chunksize=None):
+    # Returns a typed DataFrame (date: datetime64, amount_cents: int64, amount: float64, label:
+    # Categorical) in (date, id) order, or an iterator of such frames when chunksize is given.
+    group_col = _check_table(table)
+    available = {'id': 'id', 'date': 'day', 'amount': 'amount_cents', 'amount_cents': 'amount_cents',
+                 group_col: _label_key(table)}
+    columns = list(columns or ['id', 'date', 'amount', 'amount_cents', group_col])
+    unknown = [c for c in columns if c not in available]
+    if unknown:
+        raise ValueError(f"Unknown {table} columns: {', '.join(unknown)}")
+    # 'amount' is derived from amount_cents, so select the source column once under both names.
+    selected = dict.fromkeys('amount_cents' if c == 'amount' else c for c in columns)
+    select = ", ".join(f"{available[c]} AS {c}" if available[c] != c else c for c in selected)
+    if 'amount' in columns:
+        select += ", NULL AS amount"
+    where, params = _transaction_filter(table, start, end, labels, min_amount, max_amount)
+    direction = "DESC" if newest_first else "ASC"
+    query = f"SELECT {select} FROM {table}{where} ORDER BY day {direction}, id {direction}"
+    if limit is not None:
+        query += " LIMIT ?"
+        params.append(int(limit))
+    if chunksize:
+        return _iter_transaction_chunks(table, query, params, columns, chunksize)
+    with get_connection() as conn:
+        df = pd.read_sql_query(query, conn, params=params)
+    return _decode_labels(_typed_transactions(df), table, get_labels(table))[columns]
+
+
+def get_expenses(**filters):
+    return query_transactions('expenses', **filters)
+
+
+def get_income(**filters):
+    return query_transactions('income', **filters)
+
+
+@profiled
+def get_budget(month):
+    with get_connection() as conn:
+        result = conn.execute("SELECT budget_limit FROM budget WHERE month = ?", (month,)).fetchone()
+    return result[0] if result else None
+
+
+@profiled
+def get_savings_goals():
+    with get_connection() as conn:
+        df = pd.read_sql_query("SELECT * FROM savings_goals", conn)
+    return df
+
+
+@profiled
+def get_data_version(table):
+    if table not in VERSIONED_TABLES:
+        raise ValueError(f"Unknown versioned table: {table}")
+    with get_connection() as conn:
+        row = conn.execute(
+            f"SELECT (SELECT IFNULL(MAX(rowid), 0) FROM {table}), "
+            f"(SELECT version FROM table_versions WHERE table_name = ?)", (table,)).fetchone()
+    return row[0], row[1] or 0
+
+
+@profiled
+def get_table_versions():
+    with get_connection() as conn:
+        return dict(conn.execute("SELECT table_name, version FROM table_versions").fetchall())
@@ -0,0 +1,189 @@
+"""Per-tenant ledgers: one SQLite shard per user or household, found through a registry."""
+import collections
+import hashlib
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+import pandas as pd
+
+from .storage import ConnectionPool, init_db, use_pool
+
+# Tenant Shards
+# Every tenant's ledger is its own database file, so tenants never wait on each other's write
+# lock and a shard is as small as one ledger. registry.db maps tenant ids to shard files (spread
+# over 256 subdirectories so no directory grows too large). Shards are opened on first use,
+# migrated once, kept in LRU order, and closed when idle or when too many are open.
+TENANT_DIR = os.environ.get('FINANCE_TENANT_DIR', 'tenants')
+REGISTRY_FILE = 'registry.db'
+SHARD_POOL_SIZE = int(os.environ.get('FINANCE_SHARD_POOL_SIZE', '2'))
+SHARD_MAX_OPEN = int(os.environ.get('FINANCE_SHARD_MAX_OPEN', '256'))
+SHARD_IDLE_SECONDS = float(os.environ.get('FINANCE_SHARD_IDLE_SECONDS', '600'))
+TENANT_ID_PATTERN = re.compile(r'[A-Za-z0-9][A-Za-z0-9_.@-]{0,63}')
+
+
+def check_tenant_id(tenant_id):
+    if not isinstance(tenant_id, str) or not TENANT_ID_PATTERN.fullmatch(tenant_id):
+        raise ValueError(f"Invalid tenant id: {tenant_id!r} (letters, digits and _.@- only, up to 64)")
+    return tenant_id
+
+
+class ShardRegistry:
+    def __init__(self, root=TENANT_DIR, max_open=SHARD_MAX_OPEN, idle_seconds=SHARD_IDLE_SECONDS,
+                 pool_size=SHARD_POOL_SIZE):
+        self.root = root
+        self.max_open = max_open
+        self.idle_seconds = idle_seconds
+        self.pool_size = pool_size
+        self._registry = None
+        self._registry_lock = threading.Lock()
+        self._open = collections.OrderedDict()  # tenant id -> [pool, last used], least recent first
+        self._lock = threading.Lock()
+        self._last_sweep = time.monotonic()
+        self._stats = {'opened': 0, 'hits': 0, 'evicted_idle': 0, 'evicted_lru': 0}
+
+    def _registry_connection(self):
+        with self._registry_lock:
+            if self._registry is None:
+                os.makedirs(self.root, exist_ok=True)
+                registry = ConnectionPool(os.path.join(self.root, REGISTRY_FILE), max_size=4)
+                with registry.connection() as conn:
+                    conn.execute('''CREATE TABLE IF NOT EXISTS tenants (
+                        tenant_id TEXT PRIMARY KEY, shard TEXT NOT NULL, display_name TEXT, created_at TEXT)''')
+                self._registry = registry
+        return self._registry.connection()
+
+    def register(self, tenant_id, display_name=None):
+        # Adds the tenant if it is new; returns its shard path either way.
+        check_tenant_id(tenant_id)
+        digest = hashlib.sha1(tenant_id.encode()).hexdigest()
+        with self._registry_connection() as conn:
+            conn.execute("INSERT OR IGNORE INTO tenants (tenant_id, shard, display_name, created_at) "
+                         "VALUES (?, ?, ?, ?)",
+                         (tenant_id, os.path.join(digest[:2], f"{digest[2:14]}.db"), display_name,
+                          datetime.now().isoformat(timespec='seconds')))
+        return self.shard_path(tenant_id)
+
+    def shard_path(self, tenant_id):
+        with self._registry_connection() as conn:
+            row = conn.execute("SELECT shard FROM tenants WHERE tenant_id = ?", (tenant_id,)).fetchone()
+        return os.path.join(self.root, row[0]) if row else None
+
+    def tenants(self):
+        with self._registry_connection() as conn:
+            df = pd.read_sql_query(
+                "SELECT tenant_id, display_name, created_at, shard FROM tenants ORDER BY tenant_id", conn)
+        df['shard'] = [os.path.join(self.root, shard) for shard in df['shard']]
+        return df
+
+    def pool(self, tenant_id):
+        # The tenant's connection pool, opening (and on first use creating and migrating) its shard.
+        now = time.monotonic()
+        with self._lock:
+            entry = self._open.get(tenant_id)
+            if entry is not None:
+                entry[1] = now
+                self._open.move_to_end(tenant_id)
+                self._stats['hits'] += 1
+                pool = entry[0]
+            else:
+                pool = None
+        if now - self._last_sweep > min(self.idle_seconds, 60):
+            self.evict_idle()
+        if pool is not None:
+            return pool
+
+        path = self.shard_path(tenant_id) or self.register(tenant_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        pool = ConnectionPool(path, self.pool_size)
+        with use_pool(pool):
+            init_db()
+        with self._lock:
+            if tenant_id in self._open:  # another session opened it meanwhile
+                pool.close_all()
+                return self._open[tenant_id][0]
+            self._open[tenant_id] = [pool, now]
+            self._stats['opened'] += 1
+            overflow = [tenant for tenant in self._open if tenant != tenant_id and not self._busy(tenant)]
+            overflow = overflow[:max(0, len(self._open) - self.max_open)]
+            closing = [self._open.pop(tenant)[0] for tenant in overflow]
+            self._stats['evicted_lru'] += len(closing)
+        for stale in closing:
+            stale.close()
+        return pool
+
+    def _busy(self, tenant_id):
+        # A shard is kept open while a connection is checked out or writes are queued for it.
+        pool = self._open[tenant_id][0]
+        writes = pool._writes
+        return pool.stats()['checked_out'] > 0 or (writes is not None and writes.stats()['depth'] > 0)
+
+    def evict_idle(self, now=None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._last_sweep = now
+            idle = [tenant for tenant, (_, used) in self._open.items()
+                    if now - used > self.idle_seconds and not self._busy(tenant)]
+            closing = [self._open.pop(tenant)[0] for tenant in idle]
+            self._stats['evicted_idle'] += len(closing)
+        for pool in closing:
+            pool.close()
+        return len(closing)
+
+    def close_all(self):
+        with self._lock:
+            closing = [pool for pool, _ in self._open.values()]
+            self._open.clear()
+        for pool in closing:
+            pool.close()
+        if self._registry is not None:
+            self._registry.close_all()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['open'] = len(self._open)
+        stats['root'] = self.root
+        stats['max_open'] = self.max_open
+        return stats
+
+
+shards = ShardRegistry()
+
+
+def tenant_pool(tenant_id):
+    return shards.pool(tenant_id)
+
+
+@contextmanager
+def use_tenant(tenant_id):
+    # Every storage call in the block (reads, writes, queued writes) goes to the tenant's shard.
+    with use_pool(tenant_pool(tenant_id)) as pool:
+        yield pool
+
+
+def shard_stats():
+    return shards.stats()
+
+
+def admin_totals(month=None, workers=None, registry=None):
+    # Income, expenses and transaction counts for `month` per tenant, computed across all
+    # shards in parallel on a process pool. Returns (per-tenant DataFrame, batch throughput stats).
+    from .cli import run_batch, throughput_stats
+
+    registry = registry or shards
+    month = month or datetime.now().strftime("%Y-%m")
+    tenants = registry.tenants()
+    tenants = tenants[[os.path.exists(path) for path in tenants['shard']]]
+    workers = max(1, min(workers or os.cpu_count() or 1, len(tenants)))
+    paths = [os.path.abspath(path) for path in tenants['shard']]
+    results, wall_seconds = run_batch('totals', paths, {'month': month}, workers)
+    by_path = {result['path']: result for result in results}
+    rows = []
+    for tenant_id, path in zip(tenants['tenant_id'], paths):
+        result = by_path[path]
+        rows.append({'tenant_id': tenant_id, 'ok': result['ok'], **result.get('totals', {})})
+    return pd.DataFrame(rows), throughput_stats(results, wall_seconds, workers)